@@ -0,0 +1,96 @@
+"""
+Concurrent avatar uploads: resizing in the image pool versus on the event loop.
+
+    python -m benchmarks.bench_avatar --uploads 100 --concurrency 8
+    python -m benchmarks.bench_avatar --inline       # Pillow on the event loop
+    python -m benchmarks.bench_avatar --duplicates   # every upload is the same image
+
+Uploads go through PATCH /api/users/avatar into a temporary LocalStorage. While
+they run, a second client polls GET / to show how much the uploads stall the
+event loop.
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import tempfile
+import time
+
+import httpx
+from PIL import Image
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import create_schema, seed_user, auth_headers, run_load, summarize
+from hw11.services import avatars
+
+EMAIL = "bench_avatar@example.com"
+
+
+def make_image(seed: int, size=(1600, 1200)) -> bytes:
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+    for _ in range(50):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        image.paste(tuple(rng.randrange(256) for _ in range(3)), (x, y, x + 200, y + 200))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+async def main(args):
+    engine = await create_schema(args.database_url)
+    await seed_user(engine, EMAIL)
+    headers = await auth_headers(EMAIL)
+    images = [make_image(0 if args.duplicates else i) for i in range(args.uploads)]
+    avatars.storage = avatars.LocalStorage(tempfile.mkdtemp(prefix="bench-avatars-"), "/media/avatars")
+    if args.inline:
+        async def inline(func, *func_args):
+            return func(*func_args)
+        avatars.image_pool.run = inline
+
+    from main import app
+    from hw11.database.db import get_db
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    remaining = iter(images)
+    latencies = []
+    errors = 0
+
+    async def uploader(client):
+        nonlocal errors
+        for image in remaining:
+            start = time.perf_counter()
+            response = await client.patch("/api/users/avatar", headers=headers,
+                                          files={"file": ("avatar.jpg", image, "image/jpeg")})
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+
+    async def uploads(client):
+        start = time.perf_counter()
+        await asyncio.gather(*(uploader(client) for _ in range(args.concurrency)))
+        return {**summarize(latencies, time.perf_counter() - start), "errors": errors}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=120) as client:
+        result, probe = await asyncio.gather(uploads(client), run_load(client, "GET", "/", 1, args.uploads * 5))
+    await engine.dispose()
+    print(json.dumps({"mode": "inline" if args.inline else "pool", "duplicates": args.duplicates,
+                      "image_kb": round(sum(map(len, images)) / len(images) / 1024, 1), "uploads": result,
+                      "concurrent_root_requests": probe,
+                      "image_pool": None if args.inline else avatars.image_pool.stats()}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./bench.db")
+    parser.add_argument("--uploads", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--inline", action="store_true", help="Resize on the event loop")
+    parser.add_argument("--duplicates", action="store_true", help="Upload the same image every time")
+    asyncio.run(main(parser.parse_args()))
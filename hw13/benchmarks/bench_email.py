@@ -0,0 +1,91 @@
+"""
+Mail delivery throughput against a local aiosmtpd server.
+
+    python -m benchmarks.bench_email --messages 2000
+
+Compares the pooled MailWorker with opening a new SMTP connection for every
+message, which is what send_email did through fastapi_mail. The local server
+has no TLS or AUTH, so real servers widen the gap.
+"""
+import argparse
+import asyncio
+import json
+import socket
+import time
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+from hw11.services.email import render_message
+from hw11.services.mailer import MailWorker, MemoryMailQueue, SMTPPool
+
+
+class Sink:
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def make_job(i: int) -> str:
+    return json.dumps({"id": str(i), "to": f"user{i}@example.com", "subject": "Confirm your email",
+                       "template": "email_template.html", "attempts": 0,
+                       "body": {"host": "http://bench/", "username": f"user{i}", "token": "token"}})
+
+
+async def pooled(port: int, args) -> float:
+    queue = MemoryMailQueue()
+    for i in range(args.messages):
+        await queue.push(make_job(i))
+    pool = SMTPPool(args.pool_size, hostname="127.0.0.1", port=port, local_hostname="localhost", start_tls=False)
+    worker = MailWorker(queue, pool, render_message, batch_size=args.batch_size)
+    start = time.perf_counter()
+    while await queue.size():
+        await worker.run_once(timeout=0)
+    elapsed = time.perf_counter() - start
+    await pool.close()
+    return elapsed
+
+
+async def connection_per_message(port: int, args) -> float:
+    semaphore = asyncio.Semaphore(args.pool_size)
+
+    async def send(i):
+        async with semaphore:
+            smtp = aiosmtplib.SMTP(hostname="127.0.0.1", port=port, local_hostname="localhost", start_tls=False)
+            await smtp.connect()
+            await smtp.send_message(render_message(json.loads(make_job(i))))
+            await smtp.quit()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(args.messages)))
+    return time.perf_counter() - start
+
+
+async def main(args):
+    sink = Sink()
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = Controller(sink, hostname="127.0.0.1", port=port)
+    server.start()
+    try:
+        results = {}
+        for name, run in (("connection_per_message", connection_per_message), ("pooled", pooled)):
+            elapsed = await run(port, args)
+            results[name] = {"seconds": round(elapsed, 3), "messages_per_second": round(args.messages / elapsed, 1)}
+    finally:
+        server.stop()
+    print(json.dumps({"messages": args.messages, "pool_size": args.pool_size, "received": sink.received,
+                      **results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+"""
+Throughput and memory of the streaming contacts export.
+
+    python -m benchmarks.bench_export --contacts 1000000
+
+By default the exporter generator is driven directly, which measures the
+database cursor plus serialization. With --url the export endpoint of a running
+server is streamed over HTTP (the server must use --database-url too).
+--trace-memory reports the peak Python allocation during each export; it
+slows the run down, so throughput numbers from that run are not comparable.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import time
+import tracemalloc
+
+import httpx
+
+from benchmarks.common import create_schema, seed_user, auth_headers
+from hw11.services import exporter
+
+EMAIL = "bench_export@example.com"
+
+
+async def drain(chunks) -> dict:
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+    async for chunk in chunks:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    return {"seconds": time.perf_counter() - start, "first_byte_ms": round((first_byte or 0) * 1000, 3),
+            "megabytes": round(size / 2 ** 20, 2)}
+
+
+async def main(args):
+    engine = await create_schema(args.database_url)
+    user = await seed_user(engine, EMAIL, args.contacts)
+    headers = await auth_headers(EMAIL)
+
+    results = {}
+    for fmt in exporter.MEDIA_TYPES:
+        if args.trace_memory:
+            tracemalloc.start()
+        if args.url:
+            async with httpx.AsyncClient(base_url=args.url, headers=headers, timeout=None) as client:
+                async with client.stream("GET", "/api/contacts/export", params={"format": fmt}) as response:
+                    result = await drain(response.aiter_bytes())
+        else:
+            result = await drain(exporter.export_contacts(fmt, user, engine, args.batch_size))
+        if args.trace_memory:
+            result["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+            tracemalloc.stop()
+        result["rows_per_second"] = round(args.contacts / result["seconds"], 1)
+        result["seconds"] = round(result["seconds"], 3)
+        results[fmt] = result
+    await engine.dispose()
+    print(json.dumps({"contacts": args.contacts, "batch_size": args.batch_size,
+                      "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Base URL of a running server (default: call the exporter directly)")
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./bench.db")
+    parser.add_argument("--contacts", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--trace-memory", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+"""
+Throughput and latency percentiles of the contacts API under concurrent clients.
+
+    python -m benchmarks.bench_load --users 20 --contacts 2000 > baseline.json
+    python -m benchmarks.bench_load --users 20 --contacts 2000 --baseline baseline.json
+    python -m benchmarks.bench_load --scenario list_contacts get_contact --concurrency 1 10 100
+
+The app runs in-process behind httpx.ASGITransport with the rate limiter
+lifted and mail going to an in-memory queue (see stub_services()). Requests
+are spread over --users seeded users, each request carrying the token of the
+next user and, where the path has one, an ID of one of that user's contacts.
+Every scenario sends --requests requests at each --concurrency level. With
+--baseline the exit status is 1 if a latency grew or a throughput dropped by
+more than --tolerance.
+"""
+import argparse
+import asyncio
+import random
+import sys
+from datetime import date
+from itertools import cycle
+from typing import Dict, List, Tuple
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import auth_headers, create_schema, report, run_load, seed_users, stub_services
+from hw11.database.models import Contact
+
+CONTACT = {"first_name": "Load", "last_name": "Test", "email": "load@example.com", "phone": "0000000000",
+           "birthday": date(1990, 6, 1).isoformat()}
+SCENARIOS: Dict[str, Tuple[str, str, dict]] = {
+    "me": ("GET", "/api/users/me/", {}),
+    "list_contacts": ("GET", "/api/contacts/?limit=50", {}),
+    "page_contacts": ("GET", "/api/contacts/?limit=50&cursor=", {}),
+    "get_contact": ("GET", "/api/contacts/{contact_id}", {}),
+    "search_contacts": ("GET", "/api/contacts/search?q=Last1", {}),
+    "upcoming_birthdays": ("GET", "/api/contacts/upcoming-birthdays", {}),
+    "changes": ("GET", "/api/contacts/changes", {}),
+    "create_contact": ("POST", "/api/contacts/", {"json": CONTACT}),
+    "update_contact": ("PUT", "/api/contacts/{contact_id}", {"json": CONTACT}),
+}
+
+
+class SeededUsers(httpx.AsyncClient):
+    """
+    Client sending every request as the next seeded user, about one of that user's contacts.
+    """
+
+    def __init__(self, users: List[Tuple[dict, List[int]]], **kwargs):
+        super().__init__(**kwargs)
+        self.users = cycle(users)
+        self.random = random.Random(0)
+
+    async def request(self, method, url, **kwargs):
+        headers, contact_ids = next(self.users)
+        url = url.format(contact_id=self.random.choice(contact_ids))
+        return await super().request(method, url, headers=headers, **kwargs)
+
+
+async def main(args) -> int:
+    engine = await create_schema(args.database_url)
+    users = await seed_users(engine, args.users, args.contacts)
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    seeded = []
+    async with session_factory() as db:
+        for user in users:
+            contact_ids = await db.execute(select(Contact.id).filter(Contact.user_id == user.id).limit(1000))
+            seeded.append((await auth_headers(user.email), contact_ids.scalars().all()))
+
+    stub_services()
+    from main import app
+    from hw11.database.db import get_db
+
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    results = {}
+    async with SeededUsers(seeded, transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for name in args.scenario:
+            method, path, kwargs = SCENARIOS[name]
+            results[name] = {}
+            for concurrency in args.concurrency:
+                results[name][concurrency] = await run_load(client, method, path, concurrency, args.requests,
+                                                            **kwargs)
+    await engine.dispose()
+    return report({"database": engine.dialect.name, "users": args.users, "contacts": args.contacts,
+                   "results": results}, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./bench.db")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--contacts", type=int, default=2000, help="Contacts of every user")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--baseline", help="A report of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,66 @@
+"""
+Login throughput with bcrypt in the hashing pool versus inline on the event loop.
+
+    python -m benchmarks.bench_login
+    python -m benchmarks.bench_login --inline    # the old behaviour
+
+While logins run, a second client polls GET / and reports its latency: with
+inline hashing every poll waits behind a bcrypt call.
+"""
+import argparse
+import asyncio
+import json
+
+import httpx
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import create_schema, seed_user, run_load
+from hw11.database.models import User
+from hw11.services.auth import auth_service
+
+EMAIL = "bench_login@example.com"
+PASSWORD = "123456789"
+
+
+async def main(args):
+    engine = await create_schema(args.database_url)
+    await seed_user(engine, EMAIL)
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    async with session_factory() as db:
+        hashed = await auth_service.get_password_hash(PASSWORD)
+        await db.execute(update(User).where(User.email == EMAIL).values(password=hashed))
+        await db.commit()
+
+    if args.inline:
+        async def inline(func, *func_args):
+            return func(*func_args)
+        auth_service.hash_pool.run = inline
+
+    from main import app
+    from hw11.database.db import get_db
+
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    form = {"username": EMAIL, "password": PASSWORD}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        login, probe = await asyncio.gather(
+            run_load(client, "POST", "/api/auth/login", args.concurrency, args.requests, data=form),
+            run_load(client, "GET", "/", 1, args.requests * 5),
+        )
+    await engine.dispose()
+    print(json.dumps({"mode": "inline" if args.inline else "pool", "bcrypt_rounds": auth_service.pwd_context
+                      .to_dict().get("bcrypt__rounds"), "login": login, "concurrent_root_requests": probe,
+                      "hash_pool": auth_service.hash_pool.stats() if not args.inline else None}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./bench.db")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--inline", action="store_true", help="Hash on the event loop like before")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,75 @@
+"""
+Per-request cost of the metrics: MetricsMiddleware and the SQL statement hooks.
+
+    python -m benchmarks.bench_metrics --requests 100000
+
+A minimal ASGI app is called directly, without a server or HTTP client, once
+bare and once wrapped in MetricsMiddleware, so the difference is the
+middleware alone. The statement hooks are timed the same way, calling
+SELECT 1 on an SQLite connection with and without instrument_engine().
+"""
+import argparse
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from hw11.services.metrics import MetricsMiddleware, instrument_engine
+
+SCOPE = {"type": "http", "method": "GET", "path": "/api/contacts/1"}
+ROUTE = SimpleNamespace(path="/api/contacts/{contact_id}")
+
+
+async def app(scope, receive, send):
+    scope["route"] = ROUTE
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def send(message):
+    pass
+
+
+async def time_requests(asgi, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        await asgi(dict(SCOPE), None, send)
+    return (time.perf_counter() - started) / requests
+
+
+async def time_statements(instrumented: bool, statements: int) -> float:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    if instrumented:
+        instrument_engine(engine)
+    async with engine.connect() as conn:
+        statement = text("SELECT 1")
+        await conn.execute(statement)
+        started = time.perf_counter()
+        for _ in range(statements):
+            await conn.execute(statement)
+        elapsed = time.perf_counter() - started
+    await engine.dispose()
+    return elapsed / statements
+
+
+async def main(args):
+    bare = await time_requests(app, args.requests)
+    measured = await time_requests(MetricsMiddleware(app), args.requests)
+    plain_statement = await time_statements(False, args.statements)
+    measured_statement = await time_statements(True, args.statements)
+    print(json.dumps({
+        "request_us": {"bare": round(bare * 1e6, 2), "with_metrics": round(measured * 1e6, 2),
+                       "overhead": round((measured - bare) * 1e6, 2)},
+        "statement_us": {"bare": round(plain_statement * 1e6, 2), "with_metrics": round(measured_statement * 1e6, 2),
+                         "overhead": round((measured_statement - plain_statement) * 1e6, 2)},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--statements", type=int, default=5_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,58 @@
+"""
+Latency of a deep page: skip/limit versus keyset (cursor) pagination.
+
+    python -m benchmarks.bench_pagination --contacts 200000 --page 1000 --limit 100
+
+Use --database-url postgresql+asyncpg://... to measure against Postgres.
+"""
+import argparse
+import asyncio
+import json
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import create_schema, measure, seed_user
+from hw11.database.models import Contact
+from hw11.repository import contacts as repository_contacts
+
+EMAIL = "bench_pagination@example.com"
+
+
+async def main(args):
+    engine = await create_schema(args.database_url)
+    # A second user keeps the index honest: the seek has to skip foreign rows.
+    await seed_user(engine, "noise_" + EMAIL, args.contacts // 10)
+    user = await seed_user(engine, EMAIL, args.contacts)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    skip = args.page * args.limit
+
+    results = {}
+    async with session_factory() as db:
+        for order_by, columns in repository_contacts.CURSOR_ORDERS.items():
+            stmt = select(Contact).filter(Contact.user_id == user.id).order_by(*columns).offset(skip - 1).limit(1)
+            anchor = (await db.execute(stmt)).scalars().one()
+            cursor = repository_contacts.encode_cursor(anchor, order_by)
+
+            async def by_cursor(_):
+                await repository_contacts.get_contacts_page(args.limit, user, db, cursor, order_by)
+
+            results[f"cursor_{order_by}"] = await measure(by_cursor, args.repeat)
+
+        async def by_offset(_):
+            await repository_contacts.get_contacts(skip, args.limit, user, db)
+
+        results["offset"] = await measure(by_offset, args.repeat)
+    await engine.dispose()
+    print(json.dumps({"page": args.page, "limit": args.limit, "contacts": args.contacts,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./bench.db")
+    parser.add_argument("--contacts", type=int, default=200_000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,122 @@
+"""
+Latency a rate limit adds to each request, local buckets versus a Redis check per request.
+
+    python -m benchmarks.bench_rate_limit --redis-url redis://localhost:6379/15
+    python -m benchmarks.bench_rate_limit --rtt-ms 0.5    # no Redis at hand
+
+The RateLimit dependency is called directly with requests from --users clients
+at --concurrency, so the numbers are the limiter's own cost. Without
+--redis-url an in-process fakeredis is used and every command is delayed by
+--rtt-ms to stand in for the network round-trip.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import time
+from types import SimpleNamespace
+
+import fakeredis
+import redis.asyncio as redis
+from starlette.requests import Request
+from starlette.responses import Response
+
+from benchmarks.common import summarize
+from hw11.services import rate_limit
+from hw11.services.auth import auth_service
+
+
+class DelayedRedis:
+    """
+    Wraps a client and sleeps before every command or pipeline, like a network hop would.
+    """
+
+    def __init__(self, client, rtt: float):
+        self.client = client
+        self.rtt = rtt
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name == "pipeline":
+            def pipeline(*args, **kwargs):
+                pipe = attr(*args, **kwargs)
+                execute = pipe.execute
+
+                async def delayed_execute(*a, **kw):
+                    await asyncio.sleep(self.rtt)
+                    return await execute(*a, **kw)
+                pipe.execute = delayed_execute
+                return pipe
+            return pipeline
+        if not callable(attr):
+            return attr
+
+        def command(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if not inspect.isawaitable(result):
+                return result
+
+            async def delayed():
+                await asyncio.sleep(self.rtt)
+                return await result
+            return delayed()
+        return command
+
+
+async def make_requests(users: int) -> list:
+    requests = []
+    for i in range(users):
+        token = await auth_service.create_access_token(data={"sub": f"user{i}@example.com"})
+        requests.append(Request({"type": "http", "method": "GET", "path": "/api/contacts/", "client": ("10.0.0.1", 1),
+                                 "headers": [(b"authorization", f"Bearer {token}".encode())],
+                                 "route": SimpleNamespace(path="/api/contacts/")}))
+    return requests
+
+
+async def run(backend, requests: list, args) -> dict:
+    rate_limit.backend = backend
+    limiter = rate_limit.RateLimit(times=10 ** 9, seconds=60)
+    latencies = []
+    remaining = iter(range(args.requests))
+
+    async def worker():
+        for i in remaining:
+            start = time.perf_counter()
+            await limiter(requests[i % len(requests)], Response())
+            latencies.append(time.perf_counter() - start)
+            # let other tasks (and the background sync) run, like a real handler would
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def main(args):
+    if args.redis_url:
+        client = redis.from_url(args.redis_url)
+        await client.flushdb()
+    else:
+        client = DelayedRedis(fakeredis.FakeAsyncRedis(), args.rtt_ms / 1000)
+    requests = await make_requests(args.users)
+
+    results = {}
+    redis_backend = rate_limit.RedisBackend()
+    redis_backend.redis = client
+    results["redis_per_request"] = await run(redis_backend, requests, args)
+    local_backend = rate_limit.LocalBackend(sync_interval=args.sync_interval)
+    local_backend.redis = client
+    results["local_gcra"] = await run(local_backend, requests, args)
+    results["local_gcra"]["syncs"] = local_backend.syncs
+    print(json.dumps({"redis": args.redis_url or f"fakeredis +{args.rtt_ms}ms", **results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redis-url", help="A Redis database the benchmark may flush")
+    parser.add_argument("--rtt-ms", type=float, default=0.3, help="Simulated round-trip with fakeredis")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--sync-interval", type=float, default=1.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,145 @@
+"""
+Microbenchmarks of every repository_contacts and repository_users function.
+
+    python -m benchmarks.bench_repository --users 10 --contacts 10000 > baseline.json
+    python -m benchmarks.bench_repository --users 10 --contacts 10000 --baseline baseline.json
+
+The database is seeded with --users users of --contacts contacts each, and
+every call acts for the first of them, so its queries have to skip the rows
+of the others. Each function is called --repeat times, every call in a fresh
+session; reads run before writes. With --baseline the exit status is 1 if a
+latency grew or a throughput dropped by more than --tolerance.
+"""
+import argparse
+import asyncio
+import sys
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from benchmarks.common import create_schema, measure, report, seed_users
+from hw11.database.models import Contact, User
+from hw11.repository import contacts as repository_contacts
+from hw11.repository import users as repository_users
+from hw11.schemas import ContactModel, ContactUpdateItem, UserModel
+
+
+def body(i: int) -> ContactModel:
+    return ContactModel(first_name=f"Bench{i}", last_name=f"Repository{i}", email=f"bench{i}@example.com",
+                        phone=f"{i:010d}", birthday=date(1990, 1, 1) + timedelta(days=i % 365))
+
+
+def calls(user: User, spare_ids: List[int], batch: int) -> List[Tuple[str, Callable[[AsyncSession, int], Awaitable]]]:
+    """
+    The benchmarked calls, reads first; every call gets a session and the iteration number.
+
+    Parameters:
+    - user (User): The user the calls act for.
+    - spare_ids (List[int]): IDs of the user's contacts; every update or removal takes its own from the end.
+    - batch (int): The number of contacts in batch writes.
+
+    Returns:
+    - List[Tuple[str, Callable]]: Labels (module.function) and calls.
+    """
+    async def stream(db, i):
+        async for _ in repository_contacts.stream_contacts(user, db):
+            pass
+
+    async def page(db, i):
+        _, cursor = await repository_contacts.get_contacts_page(100, user, db)
+        return await repository_contacts.get_contacts_page(100, user, db, cursor)
+
+    async def update_password(db, i):
+        # the route passes a user loaded in the same session
+        await repository_users.update_password(await db.merge(user, load=False), f"hash{i}", db)
+
+    def take(count: int) -> List[int]:
+        return [spare_ids.pop() for _ in range(count)]
+
+    return [
+        ("users.get_user_by_email", lambda db, i: repository_users.get_user_by_email(user.email.upper(), db)),
+        ("contacts.get_contacts", lambda db, i: repository_contacts.get_contacts(100, 100, user, db)),
+        ("contacts.get_contacts_page", page),
+        ("contacts.stream_contacts", stream),
+        ("contacts.get_contact", lambda db, i: repository_contacts.get_contact(db, user, last_name="Last12")),
+        ("contacts.search_contacts", lambda db, i: repository_contacts.search_contacts("Last12", user, db)),
+        ("contacts.upcoming_birthdays", lambda db, i: repository_contacts.upcoming_birthdays(
+            user, db, 7, date(2026, 6, 1))),
+        ("contacts.get_changes", lambda db, i: repository_contacts.get_changes(user, db, "", 100)),
+        ("contacts.next_change_seq", lambda db, i: repository_contacts.next_change_seq(user, db)),
+        ("contacts.create_contact", lambda db, i: repository_contacts.create_contact(body(i), user, db)),
+        ("contacts.update_contact", lambda db, i: repository_contacts.update_contact(take(1)[0], body(i), user, db)),
+        ("contacts.create_contacts", lambda db, i: repository_contacts.create_contacts(
+            [body(j) for j in range(batch)], user, db)),
+        ("contacts.update_contacts", lambda db, i: repository_contacts.update_contacts(
+            [ContactUpdateItem(id=contact_id, **body(i).model_dump()) for contact_id in take(batch)], user, db)),
+        ("contacts.copy_contacts", lambda db, i: repository_contacts.copy_contacts(
+            [body(j) for j in range(batch)], user, db)),
+        ("contacts.remove_contact", lambda db, i: repository_contacts.remove_contact(take(1)[0], user, db)),
+        ("contacts.remove_contacts", lambda db, i: repository_contacts.remove_contacts(
+            take(batch), user, db)),
+        ("contacts.purge_tombstones", lambda db, i: repository_contacts.purge_tombstones(
+            datetime.now() + timedelta(days=1), db)),
+        ("users.create_user", lambda db, i: repository_users.create_user(
+            UserModel(username=f"bench{i}", email=f"bench{i}@bench.example.com", password="123456789"), db)),
+        ("users.update_password", update_password),
+        ("users.confirmed_email", lambda db, i: repository_users.confirmed_email(user.email, db)),
+        ("users.update_avatar", lambda db, i: repository_users.update_avatar(user.email, f"avatar{i}", db)),
+    ]
+
+
+async def run(engine: AsyncEngine, users: int, contacts: int, repeat: int, batch: int) -> dict:
+    """
+    Seed the database and measure every call of calls().
+
+    Parameters:
+    - engine (AsyncEngine): A fresh schema.
+    - users (int): The number of users to seed.
+    - contacts (int): The number of contacts of every user.
+    - repeat (int): The number of calls of every function.
+    - batch (int): The number of contacts in batch writes.
+
+    Returns:
+    - dict: The summary of every call, keyed by its label.
+    """
+    user = (await seed_users(engine, users, contacts))[0]
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as db:
+        contact_ids = (await db.execute(select(Contact.id).filter(Contact.user_id == user.id)
+                                        .order_by(Contact.id))).scalars().all()
+    needed = repeat * (2 * batch + 2)
+    if len(contact_ids) < needed:
+        raise SystemExit(f"--contacts must be at least {needed} for --repeat {repeat} and --batch {batch}")
+
+    results = {}
+    for label, call in calls(user, list(contact_ids), batch):
+        async def in_session(i, call=call):
+            async with session_factory() as db:
+                await call(db, i)
+
+        results[label] = await measure(in_session, repeat)
+    return results
+
+
+async def main(args) -> int:
+    engine = await create_schema(args.database_url)
+    try:
+        results = await run(engine, args.users, args.contacts, args.repeat, args.batch)
+    finally:
+        await engine.dispose()
+    return report({"database": engine.dialect.name, "users": args.users, "contacts": args.contacts,
+                   "results": results}, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./bench.db")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--contacts", type=int, default=10_000, help="Contacts of every user")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=20, help="Contacts in batch writes")
+    parser.add_argument("--baseline", help="A report of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,72 @@
+"""
+Cost of serializing contact lists, FastAPI's default response path versus FastJSONRoute.
+
+    python -m benchmarks.bench_serialization --rows 1 100 1000
+
+The same ORM rows, loaded once from a seeded database, are returned by two
+copies of an endpoint: one on a plain APIRouter, one on a router with
+route_class=FastJSONRoute. Requests go through the ASGI app in process, so
+the difference is serialization alone; no database work happens per request.
+"""
+import argparse
+import asyncio
+import json
+from typing import List
+
+import httpx
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import create_schema, run_load, seed_user
+from hw11.database.models import Contact
+from hw11.schemas import ContactResponse
+from hw11.services.fast_json import FastJSONRoute
+
+EMAIL = "bench_serialization@example.com"
+
+
+def create_app(rows: list) -> FastAPI:
+    app = FastAPI()
+    for prefix, route_class in (("/default", APIRoute), ("/fast", FastJSONRoute)):
+        router = APIRouter(prefix=prefix, route_class=route_class)
+
+        @router.get("/contacts", response_model=List[ContactResponse])
+        async def read_contacts(response: Response, limit: int = 100):
+            response.headers["X-Next-Cursor"] = "next"
+            return rows[:limit]
+
+        app.include_router(router)
+    return app
+
+
+async def main(args):
+    engine = await create_schema(args.database_url)
+    user = await seed_user(engine, EMAIL, max(args.rows))
+    async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+        rows = list(await db.scalars(select(Contact).where(Contact.user_id == user.id).order_by(Contact.id)))
+    await engine.dispose()
+
+    transport = httpx.ASGITransport(app=create_app(rows))
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for count in args.rows:
+            default, fast = [(await client.get(f"/{mode}/contacts", params={"limit": count})).content
+                             for mode in ("default", "fast")]
+            assert default == fast, "the fast path must produce the same bytes"
+            results[count] = {mode: await run_load(client, "GET", f"/{mode}/contacts", 1, args.requests,
+                                                   params={"limit": count})
+                              for mode in ("default", "fast")}
+            results[count]["bytes"] = len(fast)
+            results[count]["speedup_p50"] = round(results[count]["default"]["p50_ms"]
+                                                  / results[count]["fast"]["p50_ms"], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./bench.db")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--requests", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,88 @@
+"""
+Signup throughput: what POST /api/auth/signup costs besides the password hash.
+
+    python -m benchmarks.bench_signup --signups 200 --concurrency 8
+    python -m benchmarks.bench_signup --before    # Gravatar lookup, pre-check and refresh like before
+
+Confirmation mail goes to an in-memory queue. --rounds sets the bcrypt cost
+(4 by default) so the database work is not hidden behind hashing; the
+"queries_per_signup" field counts SQL statements.
+"""
+import argparse
+import asyncio
+import json
+
+import httpx
+from libgravatar import Gravatar
+from passlib.context import CryptContext
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import create_schema, run_load
+from hw11.repository import users as repository_users
+from hw11.services import email
+from hw11.services.auth import auth_service
+from hw11.services.mailer import MemoryMailQueue
+
+
+def patch_before():
+    create_user = repository_users.create_user
+
+    async def old_create_user(body, db):
+        # what signup did before: look the email up, build the Gravatar URL inline, re-read the row
+        await repository_users.get_user_by_email(body.email, db)
+        avatar = Gravatar(body.email).get_image()
+        user = await create_user(body, db)
+        await db.refresh(user)
+        user.avatar = avatar
+        return user
+    repository_users.create_user = old_create_user
+
+
+async def main(args):
+    engine = await create_schema(args.database_url)
+    statements = 0
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    email.mail_queue = MemoryMailQueue()
+    auth_service.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=args.rounds)
+    if args.before:
+        patch_before()
+
+    from main import app
+    from hw11.database.db import get_db
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    counter = iter(range(args.signups))
+
+    class Signups(httpx.AsyncClient):
+        async def request(self, method, url, **kwargs):
+            i = next(counter)
+            kwargs["json"] = {"username": f"user{i}", "email": f"user{i}@example.com", "password": "123456789"}
+            return await super().request(method, url, **kwargs)
+
+    async with Signups(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        result = await run_load(client, "POST", "/api/auth/signup", args.concurrency, args.signups)
+    await engine.dispose()
+    result["queries_per_signup"] = round(statements / args.signups, 2)
+    print(json.dumps({"mode": "before" if args.before else "after", "bcrypt_rounds": args.rounds,
+                      "signup": result, "queued_mails": await email.mail_queue.size()}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./bench.db")
+    parser.add_argument("--signups", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--before", action="store_true", help="Replay the old signup path")
+    asyncio.run(main(parser.parse_args()))
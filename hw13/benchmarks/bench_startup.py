@@ -0,0 +1,110 @@
+"""
+Cold-start cost of a worker: import time of the app, measured with python -X importtime.
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --budget-ms 1500 --top 15
+
+Every run imports main in a fresh interpreter, so nothing is cached but the
+bytecode. The report has the median import time of main, the slowest modules
+it imports directly (cumulative time, median over the runs), and the modules
+that should only be loaded on first use but were imported at startup (LAZY).
+The exit status is 1 if the median is over --budget-ms or a LAZY module was
+imported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Loaded on first use: the Cloudinary SDK (and httpx) by CloudinaryStorage, Jinja by the mail worker,
+# passlib by the first password hashed or verified.
+LAZY = ("cloudinary", "httpx", "jinja2", "passlib")
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_importtime(output: str) -> List[Tuple[int, str, int]]:
+    """
+    Parse the report of python -X importtime.
+
+    Parameters:
+    - output (str): The stderr of the interpreter.
+
+    Returns:
+    - List[Tuple[int, str, int]]: Depth (0 for top-level imports), module and cumulative microseconds.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "| cumulative |" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((depth, name.strip(), int(cumulative)))
+    return imports
+
+
+def import_main() -> List[Tuple[int, str, int]]:
+    """
+    Import main in a fresh interpreter under -X importtime.
+
+    Returns:
+    - List[Tuple[int, str, int]]: The parsed report, see parse_importtime().
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                            env=dict(os.environ, PYTHONPATH=str(ROOT)), capture_output=True, text=True, check=True)
+    return parse_importtime(result.stderr)
+
+
+def measure(runs: int, top: int) -> dict:
+    """
+    Import main a number of times and summarize.
+
+    Parameters:
+    - runs (int): The number of fresh interpreters.
+    - top (int): How many of the modules imported by main to list.
+
+    Returns:
+    - dict: main_ms (median), slowest modules imported by main and imported LAZY modules.
+    """
+    totals = []
+    children: Dict[str, List[int]] = defaultdict(list)
+    imported = set()
+    for _ in range(runs):
+        imports = import_main()
+        main_index = next(i for i, (_, name, _) in enumerate(imports) if name == "main")
+        main_depth, _, main_us = imports[main_index]
+        totals.append(main_us)
+        # main is reported after its imports, one level shallower
+        for depth, name, cumulative in reversed(imports[:main_index]):
+            if depth <= main_depth:
+                break
+            if depth == main_depth + 1:
+                children[name].append(cumulative)
+        imported.update(name.split(".")[0] for _, name, _ in imports)
+    slowest = sorted(((name, statistics.median(times)) for name, times in children.items()),
+                     key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "runs": runs,
+        "main_ms": round(statistics.median(totals) / 1000, 1),
+        "slowest_imports_ms": {name: round(us / 1000, 1) for name, us in slowest},
+        "lazy_modules_imported": sorted(imported.intersection(LAZY)),
+    }
+
+
+def main(args) -> int:
+    result = measure(args.runs, args.top)
+    result["budget_ms"] = args.budget_ms
+    print(json.dumps(result, indent=2))
+    return 1 if result["main_ms"] > args.budget_ms or result["lazy_modules_imported"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=2000)
+    sys.exit(main(parser.parse_args()))
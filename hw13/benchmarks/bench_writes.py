@@ -0,0 +1,141 @@
+"""
+Latency of single-contact writes: create_contact, update_contact and remove_contact.
+
+    python -m benchmarks.bench_writes --writes 500 --rtt-ms 0.5
+    python -m benchmarks.bench_writes --before    # SELECT, mutate, commit, refresh like before
+    python -m benchmarks.bench_writes --database-url postgresql+asyncpg://... --rtt-ms 0
+
+The repository functions are called one at a time, so the numbers are
+per-write latency. SQLite answers in microseconds and runs with fsync off
+here, so --rtt-ms adds a simulated network round-trip to every statement
+sent; leave it at 0 against a real server. "statements_per_write" counts
+SQL statements, COMMIT included.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import and_, event, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import create_schema, seed_user, summarize
+from hw11.database.models import Contact
+from hw11.repository import contacts as repository_contacts
+from hw11.schemas import ContactModel
+from hw11.services.response_cache import contact_cache
+
+EMAIL = "bench_writes@example.com"
+
+
+def patch_before():
+    next_change_seq = repository_contacts.next_change_seq
+
+    async def load(contact_id, user, db):
+        stmt = select(Contact).filter(
+            and_(Contact.id == contact_id, Contact.user_id == user.id, Contact.deleted_at.is_(None)))
+        return (await db.execute(stmt)).scalar_one_or_none()
+
+    async def old_create_contact(body, user, db):
+        contact = Contact(**body.model_dump(), user_id=user.id)
+        contact.change_seq = await next_change_seq(user, db)
+        db.add(contact)
+        await db.commit()
+        await contact_cache.bump(user.id)
+        await db.refresh(contact)
+        return contact
+
+    async def old_update_contact(contact_id, body, user, db):
+        contact = await load(contact_id, user, db)
+        if contact:
+            contact.change_seq = await next_change_seq(user, db)
+            for name, value in body.model_dump().items():
+                setattr(contact, name, value)
+            await db.commit()
+            await contact_cache.bump(user.id)
+        return contact
+
+    async def old_remove_contact(contact_id, user, db):
+        contact = await load(contact_id, user, db)
+        if contact:
+            contact.change_seq = await next_change_seq(user, db)
+            contact.deleted_at = func.now()
+            await db.commit()
+            await contact_cache.bump(user.id)
+        return contact
+
+    repository_contacts.create_contact = old_create_contact
+    repository_contacts.update_contact = old_update_contact
+    repository_contacts.remove_contact = old_remove_contact
+
+
+def body(i: int) -> ContactModel:
+    return ContactModel(first_name=f"Write{i}", last_name=f"Bench{i}", email=f"write{i}@example.com",
+                        phone=f"{i:010d}", birthday=date(1990, 1, 1) + timedelta(days=i % 365))
+
+
+async def main(args):
+    engine = await create_schema(args.database_url)
+    user = await seed_user(engine, EMAIL, args.contacts)
+    statements = 0
+    if engine.dialect.name == "sqlite":
+        await engine.dispose()
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def no_fsync(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA synchronous = OFF")
+            cursor.close()
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def round_trip(*_):
+        nonlocal statements
+        statements += 1
+        if args.rtt_ms:
+            time.sleep(args.rtt_ms / 1000)
+
+    # COMMIT does not go through a cursor
+    @event.listens_for(engine.sync_engine, "commit")
+    def commit(*_):
+        round_trip()
+
+    if args.before:
+        patch_before()
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    ids = []
+
+    async def create(i, db):
+        ids.append((await repository_contacts.create_contact(body(i), user, db)).id)
+
+    async def update(i, db):
+        await repository_contacts.update_contact(ids[i], body(i + 1), user, db)
+
+    async def remove(i, db):
+        await repository_contacts.remove_contact(ids[i], user, db)
+
+    results = {}
+    for name, write in (("create", create), ("update", update), ("remove", remove)):
+        latencies = []
+        statements = 0
+        start = time.perf_counter()
+        for i in range(args.writes):
+            async with session_factory() as db:
+                started = time.perf_counter()
+                await write(i, db)
+                latencies.append(time.perf_counter() - started)
+        results[name] = summarize(latencies, time.perf_counter() - start)
+        results[name]["statements_per_write"] = round(statements / args.writes, 2)
+    await engine.dispose()
+    print(json.dumps({"mode": "before" if args.before else "after", "database": engine.dialect.name,
+                      "rtt_ms": args.rtt_ms, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./bench.db")
+    parser.add_argument("--contacts", type=int, default=10_000)
+    parser.add_argument("--writes", type=int, default=500)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    parser.add_argument("--before", action="store_true", help="Replay the old write path")
+    asyncio.run(main(parser.parse_args()))
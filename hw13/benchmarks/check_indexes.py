@@ -0,0 +1,222 @@
+"""
+Fail if a hot-path repository query scans a whole table instead of using an index.
+
+    python -m benchmarks.check_indexes --contacts 200000
+    python -m benchmarks.check_indexes --database-url postgresql+asyncpg://... --contacts 1000000
+
+A database is seeded with many users and contacts and analyzed. Then every
+repository call in hot_paths() runs while the SQL it sends is recorded, and
+each recorded statement is EXPLAINed with its own parameters (EXPLAIN QUERY
+PLAN on SQLite, EXPLAIN (FORMAT JSON) on Postgres). The exit status is 1 if
+any plan has a sequential scan of one of the checked tables.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, List, Tuple
+
+from sqlalchemy import event, insert, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from benchmarks.common import create_schema, seed_user
+from hw11.database.models import Contact, User
+from hw11.repository import contacts as repository_contacts
+from hw11.repository import users as repository_users
+from hw11.schemas import ContactModel, ContactUpdateItem
+from hw11.services.sql_profiler import explain
+
+EMAIL = "check_indexes@example.com"
+CHECKED_TABLES = ("contacts", "users")
+# Statements with nothing to explain.
+SKIPPED_PREFIXES = ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "SELECT pg_", "SELECT 1",
+                    "ANALYZE", "EXPLAIN", "show ", "select pg_", "select current_schema")
+
+
+class StatementRecorder:
+    """
+    Records the statements an engine sends, tagged with the call that sent them.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine.sync_engine
+        self.call = None
+        self.statements: List[Tuple[str, str, object]] = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.call is None or statement.lstrip().startswith(SKIPPED_PREFIXES):
+            return
+        if statement.lstrip().upper().startswith("INSERT") and "SELECT" not in statement.upper():
+            return
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        self.statements.append((self.call, statement, parameters))
+
+    @contextmanager
+    def recording(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        try:
+            yield self
+        finally:
+            event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+def sequential_scans(dialect: str, plan) -> List[str]:
+    """
+    List the checked tables a query plan reads in full.
+
+    Parameters:
+    - dialect (str): "sqlite" or "postgresql".
+    - plan: The EXPLAIN QUERY PLAN rows (SQLite) or the EXPLAIN (FORMAT JSON) document (Postgres).
+
+    Returns:
+    - List[str]: The plan lines or nodes that scan a checked table.
+    """
+    found = []
+    if dialect == "sqlite":
+        for row in plan:
+            detail = row[-1]
+            words = detail.split()
+            if len(words) > 1 and words[0] == "SCAN" and words[1] in CHECKED_TABLES and "VIRTUAL TABLE" not in detail:
+                found.append(detail)
+        return found
+
+    def walk(node):
+        if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in CHECKED_TABLES:
+            found.append(f"Seq Scan on {node['Relation Name']} (rows={node.get('Plan Rows')})")
+        for child in node.get("Plans", []):
+            walk(child)
+    walk(plan[0]["Plan"])
+    return found
+
+
+def body(i: int) -> ContactModel:
+    return ContactModel(first_name=f"Check{i}", last_name=f"Indexes{i}", email=f"check{i}@example.com",
+                        phone=f"{i:010d}", birthday=date(1990, 1, 1) + timedelta(days=i))
+
+
+def hot_paths(user: User) -> List[Tuple[str, Callable[[AsyncSession], Awaitable]]]:
+    """
+    The repository calls served by the API and workers, in an order where writes come last.
+
+    Parameters:
+    - user (User): The seeded user the calls act for.
+
+    Returns:
+    - List[Tuple[str, Callable]]: Labels and calls taking a session.
+    """
+    async def page_after_cursor(db, order_by):
+        _, cursor = await repository_contacts.get_contacts_page(100, user, db, "", order_by)
+        return await repository_contacts.get_contacts_page(100, user, db, cursor, order_by)
+
+    async def changes_after_token(db):
+        changes = await repository_contacts.get_changes(user, db, "", 100)
+        return await repository_contacts.get_changes(user, db, changes["token"], 100)
+
+    async def stream_first_batch(db):
+        async for _ in repository_contacts.stream_contacts(user, db, 100):
+            break
+
+    async def update_one(db):
+        created = await repository_contacts.create_contact(body(1), user, db)
+        await repository_contacts.update_contact(created.id, body(2), user, db)
+        await repository_contacts.remove_contact(created.id, user, db)
+
+    async def update_many(db):
+        created = await repository_contacts.create_contacts([body(i) for i in range(3)], user, db)
+        ids = [result["contact"].id for result in created]
+        await repository_contacts.update_contacts(
+            [ContactUpdateItem(id=contact_id, **body(9).model_dump()) for contact_id in ids], user, db)
+        await repository_contacts.remove_contacts(ids, user, db)
+
+    return [
+        ("users.get_user_by_email", lambda db: repository_users.get_user_by_email(EMAIL.upper(), db)),
+        ("contacts.get_contacts", lambda db: repository_contacts.get_contacts(100, 100, user, db)),
+        ("contacts.get_contacts_page(id)", lambda db: page_after_cursor(db, "id")),
+        ("contacts.get_contacts_page(last_name)", lambda db: page_after_cursor(db, "last_name")),
+        ("contacts.get_contact", lambda db: repository_contacts.get_contact(db, user, last_name="Last12")),
+        ("contacts.search_contacts", lambda db: repository_contacts.search_contacts("Last12", user, db)),
+        ("contacts.upcoming_birthdays", lambda db: repository_contacts.upcoming_birthdays(
+            user, db, 7, date(2026, 6, 1))),
+        ("contacts.upcoming_birthdays(new year)", lambda db: repository_contacts.upcoming_birthdays(
+            user, db, 7, date(2026, 12, 28))),
+        ("contacts.get_changes", changes_after_token),
+        ("contacts.stream_contacts", stream_first_batch),
+        ("contacts.create/update/remove_contact", update_one),
+        ("contacts.create/update/remove_contacts", update_many),
+        ("contacts.purge_tombstones", lambda db: repository_contacts.purge_tombstones(
+            datetime.now() - timedelta(days=30), db)),
+    ]
+
+
+async def seed(engine: AsyncEngine, users: int, contacts: int) -> User:
+    """
+    Seed the target user, noise users sharing the contacts, some tombstones, and analyze.
+
+    Parameters:
+    - engine (AsyncEngine): A fresh schema.
+    - users (int): The number of users besides the target.
+    - contacts (int): The total number of contacts.
+
+    Returns:
+    - User: The target user.
+    """
+    per_user = contacts // (users + 1)
+    for i in range(users):
+        await seed_user(engine, f"noise{i}_{EMAIL}", per_user)
+    user = await seed_user(engine, EMAIL, per_user)
+    async with engine.begin() as conn:
+        await conn.execute(insert(User.__table__), [
+            {"username": f"extra{i}", "email": f"extra{i}_{EMAIL}", "password": "x"} for i in range(users * 10)])
+        await conn.execute(update(Contact).where(Contact.id % 97 == 0).values(
+            deleted_at=datetime.now() - timedelta(days=1)))
+        await conn.execute(text("ANALYZE"))
+    return user
+
+
+async def check(engine: AsyncEngine, user: User) -> List[dict]:
+    """
+    Run the hot paths and EXPLAIN what they sent.
+
+    Parameters:
+    - engine (AsyncEngine): The seeded database.
+    - user (User): The user the calls act for.
+
+    Returns:
+    - List[dict]: One finding (call, statement, scans) per statement with a sequential scan.
+    """
+    recorder = StatementRecorder(engine)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    with recorder.recording():
+        for label, call in hot_paths(user):
+            recorder.call = label
+            async with session_factory() as db:
+                await call(db)
+            recorder.call = None
+    findings = []
+    for label, statement, parameters in recorder.statements:
+        scans = sequential_scans(engine.dialect.name, await explain(engine, statement, parameters))
+        if scans:
+            findings.append({"call": label, "statement": " ".join(statement.split()), "scans": scans})
+    return findings
+
+
+async def main(args) -> int:
+    engine = await create_schema(args.database_url)
+    try:
+        user = await seed(engine, args.users, args.contacts)
+        findings = await check(engine, user)
+    finally:
+        await engine.dispose()
+    print(json.dumps({"database": engine.dialect.name, "contacts": args.contacts, "findings": findings}, indent=2))
+    return 1 if findings else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./bench.db")
+    parser.add_argument("--contacts", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=20)
+    sys.exit(asyncio.run(main(parser.parse_args())))
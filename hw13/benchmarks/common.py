@@ -0,0 +1,261 @@
+import asyncio
+import json
+import sys
+import time
+from datetime import date, timedelta
+from typing import Awaitable, Callable, List
+
+import httpx
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
+
+from hw11.database.models import Base, Contact, User, month_day
+from hw11.services import email, rate_limit
+from hw11.services.auth import auth_service
+from hw11.services.mailer import MemoryMailQueue
+
+SEED_CHUNK = 10_000
+# Values regressions() compares; p99 of a short run is too noisy to gate on.
+COMPARED_KEYS = ("rps", "p50_ms", "p95_ms")
+
+
+async def create_schema(url: str) -> AsyncEngine:
+    """
+    Create a fresh schema for a benchmark run.
+
+    Parameters:
+    - url (str): An async database URL, e.g. "sqlite+aiosqlite:///./bench.db".
+
+    Returns:
+    - AsyncEngine: The engine bound to the benchmark database.
+    """
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+async def seed_user(engine: AsyncEngine, email: str, contacts: int = 0) -> User:
+    """
+    Insert a confirmed user with a number of contacts.
+
+    Parameters:
+    - engine (AsyncEngine): The engine bound to the benchmark database.
+    - email (str): The email of the user.
+    - contacts (int): How many contacts to create for the user.
+
+    Returns:
+    - User: The created user.
+    """
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as db:
+        user = User(username=email.split("@")[0], email=email, password="x", avatar="",
+                    confirmed=True)
+        db.add(user)
+        await db.commit()
+        birthday = date(1990, 1, 1)
+        for offset in range(0, contacts, SEED_CHUNK):
+            rows = []
+            for i in range(offset, min(offset + SEED_CHUNK, contacts)):
+                day = birthday + timedelta(days=i % 365)
+                rows.append({"first_name": f"First{i}", "last_name": f"Last{i}", "email": f"contact{i}@example.com",
+                             "phone": f"{i:010d}", "birthday": day, "birthday_md": month_day(day),
+                             "user_id": user.id})
+            await db.execute(insert(Contact.__table__), rows)
+            await db.commit()
+    return user
+
+
+async def seed_users(engine: AsyncEngine, users: int, contacts: int) -> List[User]:
+    """
+    Insert a number of confirmed users with the same number of contacts each.
+
+    Parameters:
+    - engine (AsyncEngine): The engine bound to the benchmark database.
+    - users (int): How many users to create; their emails are user<i>@bench.example.com.
+    - contacts (int): How many contacts to create for every user.
+
+    Returns:
+    - List[User]: The created users, in email order.
+    """
+    return [await seed_user(engine, f"user{i}@bench.example.com", contacts) for i in range(users)]
+
+
+class UnlimitedBackend:
+    """
+    Rate-limit backend that lets every request through.
+    """
+
+    async def acquire(self, key: str, times: int, period: int, cost: int) -> float:
+        return 0.0
+
+
+def stub_services() -> None:
+    """
+    Take the rate limiter and the mail server out of the measurement.
+
+    Limits are lifted and confirmation mail goes to an in-memory queue, so a load
+    run measures the API and the database rather than 429s and SMTP.
+    """
+    rate_limit.backend = UnlimitedBackend()
+    email.mail_queue = MemoryMailQueue()
+
+
+async def auth_headers(email: str) -> dict:
+    """
+    Build an Authorization header with a fresh access token.
+
+    Parameters:
+    - email (str): The email of the user the token is issued for.
+
+    Returns:
+    - dict: The request headers.
+    """
+    token = await auth_service.create_access_token(data={"sub": email})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Return the p-th percentile of the values using the nearest-rank method.
+
+    Parameters:
+    - values (List[float]): The samples.
+    - p (float): The percentile, between 0 and 100.
+
+    Returns:
+    - float: The percentile value, or 0.0 for an empty sample.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: List[float], elapsed: float) -> dict:
+    """
+    Summarize request latencies into throughput and percentiles.
+
+    Parameters:
+    - latencies (List[float]): Per-request latencies in seconds.
+    - elapsed (float): Wall time of the whole run in seconds.
+
+    Returns:
+    - dict: requests, rps and p50/p95/p99 in milliseconds.
+    """
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def measure(call: Callable[[int], Awaitable], repeat: int) -> dict:
+    """
+    Call a coroutine function a number of times in sequence and measure the calls.
+
+    Parameters:
+    - call (Callable[[int], Awaitable]): The function, called with the iteration number.
+    - repeat (int): The number of calls.
+
+    Returns:
+    - dict: The run summary, see summarize(); rps are calls per second.
+    """
+    latencies = []
+    start = time.perf_counter()
+    for i in range(repeat):
+        t = time.perf_counter()
+        await call(i)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def run_load(client: httpx.AsyncClient, method: str, path: str, concurrency: int,
+                   requests: int, **kwargs) -> dict:
+    """
+    Send requests from a number of concurrent clients and measure them.
+
+    Parameters:
+    - client (httpx.AsyncClient): The client, either ASGI-backed or pointing at a server.
+    - method (str): The HTTP method.
+    - path (str): The request path.
+    - concurrency (int): The number of concurrent clients.
+    - requests (int): The total number of requests to send.
+    - kwargs: Extra arguments passed to client.request (headers, json, ...).
+
+    Returns:
+    - dict: The run summary, see summarize().
+    """
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, time.perf_counter() - start)
+    result["errors"] = errors
+    return result
+
+
+def regressions(baseline: dict, current: dict, tolerance: float, path: str = "") -> List[str]:
+    """
+    Compare two benchmark reports: latencies may not grow and throughput (rps) may
+    not drop by more than the tolerance. Only COMPARED_KEYS are checked.
+
+    Parameters:
+    - baseline (dict): The earlier report, as loaded from its JSON.
+    - current (dict): The new report, as loaded from its JSON.
+    - tolerance (float): The allowed relative change, e.g. 0.2 for 20%.
+    - path (str): The key path of the reports, used in the messages.
+
+    Returns:
+    - List[str]: One message per regressed value; values missing from either report are skipped.
+    """
+    found = []
+    for key, value in current.items():
+        if key not in baseline:
+            continue
+        old, name = baseline[key], f"{path}.{key}" if path else key
+        if isinstance(value, dict) and isinstance(old, dict):
+            found.extend(regressions(old, value, tolerance, name))
+        elif key == "rps" and value < old * (1 - tolerance):
+            found.append(f"{name}: {old} -> {value} rps")
+        elif key in COMPARED_KEYS and key != "rps" and old and value > old * (1 + tolerance):
+            found.append(f"{name}: {old} -> {value} ms")
+    return found
+
+
+def report(result: dict, baseline: str | None = None, tolerance: float = 0.2) -> int:
+    """
+    Print a benchmark report as JSON and check it against a baseline report.
+
+    Parameters:
+    - result (dict): The report.
+    - baseline (str, optional): Path of a report saved from an earlier run.
+    - tolerance (float): The allowed relative change, see regressions().
+
+    Returns:
+    - int: The exit status, 1 if any value regressed.
+    """
+    result = json.loads(json.dumps(result))
+    print(json.dumps(result, indent=2))
+    if baseline is None:
+        return 0
+    with open(baseline) as f:
+        found = regressions(json.load(f), result, tolerance)
+    for message in found:
+        print("regression:", message, file=sys.stderr)
+    return 1 if found else 0
@@ -1,3 +1,4 @@
+from typing import List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -22,6 +23,40 @@ class Settings(BaseSettings):
     - cloudinary_name (str): The name of the Cloudinary account.
     - cloudinary_api_key (str): The API key for accessing the Cloudinary API.
     - cloudinary_api_secret (str): The API secret for accessing the Cloudinary API.
+    - user_cache_size (int): How many authenticated users each worker keeps in memory.
+    - user_cache_ttl (int): Seconds an authenticated user stays in the in-process cache.
+    - user_cache_redis_ttl (int): Seconds an authenticated user stays in the Redis cache.
+    - bcrypt_rounds (int): The bcrypt work factor; existing hashes are upgraded on login when it changes.
+    - password_hash_workers (int): Threads hashing passwords in parallel in each worker.
+    - password_hash_queue (int): Hashes allowed to wait for a thread before requests get 503.
+    - rate_limit_backend (str): "local" for in-process buckets synced with Redis, "redis" to check Redis on every request.
+    - rate_limit_sync_interval (float): Seconds between syncs of the local buckets with Redis.
+    - rate_limit_fail_open (bool): Keep serving requests when Redis is down instead of answering 503.
+    - rate_limit_per_user (bool): Limit authenticated clients by user rather than by IP address.
+    - mail_queue (str): "redis" for a durable queue served by mail_worker.py, "memory" to deliver in-process.
+    - mail_pool_size (int): SMTP connections each mail worker keeps open.
+    - mail_batch_size (int): Messages a mail worker takes from the queue at once.
+    - mail_max_attempts (int): Delivery attempts before a message goes to the dead letters.
+    - mail_retry_base (float): A failed message is retried after mail_retry_base ** attempts seconds.
+    - avatar_storage (str): "local" to keep avatars in avatar_dir, "cloudinary" to upload them to Cloudinary.
+    - avatar_dir (str): The directory for locally stored avatars.
+    - avatar_url_prefix (str): The URL path (served by the app) or base URL of locally stored avatars.
+    - avatar_max_bytes (int): The largest accepted avatar upload.
+    - avatar_size (int): The edge length of avatars in pixels.
+    - avatar_thumbnail_size (int): The edge length of avatar thumbnails in pixels.
+    - image_workers (int): Threads resizing images in parallel in each worker.
+    - image_queue (int): Images allowed to wait for a thread before requests get 503.
+    - response_cache (bool): Keep rendered contact reads in Redis under the user's contacts version; ETags work either way.
+    - response_cache_ttl (int): Seconds a cached contact read outlives the version it was rendered for.
+    - contacts_tombstone_days (int): Days deleted contacts are kept for delta sync before purge_tombstones.py removes them.
+    - replica_database_urls (List[str]): Read replicas of sqlalchemy_database_url, as a JSON list; empty to read from the primary.
+    - replica_strategy (str): "round_robin" or "least_connections" (fewest sessions in flight).
+    - replica_health_interval (float): Seconds between health checks of the replicas.
+    - read_your_writes_seconds (float): Seconds a user's reads stay on the primary after they wrote.
+    - warm_up_connections (bool): Open the Redis and database connections at startup rather than on the first request.
+    - sql_profiler (bool): Debug mode: record the SQL of every request, log N+1 and slow queries.
+    - slow_query_ms (float): Statements slower than this are logged with their plan by the SQL profiler.
+    - n_plus_one_threshold (int): Repetitions of one statement shape in a request the SQL profiler reports.
 
     Configuration:
     - env_file (str): The path to the environment file containing configuration variables (default: ".env").
@@ -44,6 +79,40 @@ class Settings(BaseSettings):
     cloudinary_name: str
     cloudinary_api_key: str
     cloudinary_api_secret: str
+    user_cache_size: int = 1024
+    user_cache_ttl: int = 30
+    user_cache_redis_ttl: int = 300
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    password_hash_queue: int = 64
+    rate_limit_backend: str = "local"
+    rate_limit_sync_interval: float = 1.0
+    rate_limit_fail_open: bool = True
+    rate_limit_per_user: bool = True
+    mail_queue: str = "redis"
+    mail_pool_size: int = 2
+    mail_batch_size: int = 50
+    mail_max_attempts: int = 5
+    mail_retry_base: float = 2.0
+    avatar_storage: str = "local"
+    avatar_dir: str = "media/avatars"
+    avatar_url_prefix: str = "/media/avatars"
+    avatar_max_bytes: int = 5 * 1024 * 1024
+    avatar_size: int = 250
+    avatar_thumbnail_size: int = 64
+    image_workers: int = 2
+    image_queue: int = 16
+    response_cache: bool = False
+    response_cache_ttl: int = 300
+    contacts_tombstone_days: int = 30
+    replica_database_urls: List[str] = []
+    replica_strategy: str = "round_robin"
+    replica_health_interval: float = 5.0
+    read_your_writes_seconds: float = 5.0
+    warm_up_connections: bool = True
+    sql_profiler: bool = False
+    slow_query_ms: float = 100.0
+    n_plus_one_threshold: int = 5
 
     class ConfigDict:
         env_file = ".env"
@@ -1,28 +1,109 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from fastapi import Depends, Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from hw11.conf.config import settings
+from hw11.database.replicas import ReplicaSet
+from hw11.services.metrics import instrument_engine
+from hw11.services.sql_profiler import sql_profiler
+from hw11.services.tokens import access_token_subject
 
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_url(url: str) -> str:
+    """
+    Convert a database URL to the equivalent URL using an async driver.
+
+    Parameters:
+    - url (str): The database URL, e.g. "postgresql+psycopg2://..." or "sqlite:///./test.db".
+
+    Returns:
+    - str: The URL with an asyncio driver ("postgresql+asyncpg" or "sqlite+aiosqlite").
+    """
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+# The synchronous URL is still used by Alembic migrations.
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+ASYNC_SQLALCHEMY_DATABASE_URL = get_async_url(SQLALCHEMY_DATABASE_URL)
+
+engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-# Dependency
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 
+replicas = ReplicaSet([get_async_url(url) for url in settings.replica_database_urls], settings.replica_strategy,
+                      settings.read_your_writes_seconds, pool_pre_ping=True)
+for _engine in [engine, *replicas.engines]:
+    instrument_engine(_engine)
+    sql_profiler.attach(_engine)
+# Dependencies
 
-def get_db():
+
+async def get_db():
     """
-    Dependency function to get a database session.
+    Dependency function to get an asynchronous database session on the primary.
 
     Yields:
-    - Session: A SQLAlchemy database session.
+    - AsyncSession: A SQLAlchemy asynchronous database session.
 
     Usage:
     python
-    with get_db() as db:
+    async for db in get_db():
     # Perform database operations using db
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def get_write_db(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Dependency for endpoints that write: the primary session, and the user's
+    reads go to the primary for a while so all their devices see the write.
+
+    The user is marked before the handler runs and again once it has finished,
+    so the sticky window is measured from the commit rather than from the start
+    of a slow write.
+
+    Parameters:
+    - request (Request): The request, whose access token names the user.
+    - db (AsyncSession): The primary session.
+
+    Yields:
+    - AsyncSession: The primary session.
+    """
+    user = access_token_subject(request.headers.get("authorization"))
+    await replicas.mark_write(user)
+    yield db
+    await replicas.mark_write(user)
+
+
+async def get_read_db(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Dependency for read-only endpoints: a session on a healthy read replica.
+
+    Falls back to the primary session when no replica is configured or healthy,
+    and for a user who wrote recently (see get_write_db). An unused primary
+    session never checks out a connection. The user is the subject of the access
+    token, read before the route authenticates it, so stickiness survives a
+    token refresh and covers every device.
+
+    Reads whose results are tagged with the version of the user's contacts
+    (see ResponseCache) rely on this stickiness: the version moves on when the
+    write commits on the primary, and a lagging replica would give the new tag
+    to the old rows. Reads tagged with a single contact's version must use
+    get_db instead.
+
+    Parameters:
+    - request (Request): The request, whose access token names the user.
+    - db (AsyncSession): The primary session.
+
+    Yields:
+    - AsyncSession: The session to read from.
+    """
+    async with replicas.session(access_token_subject(request.headers.get("authorization")), db) as session:
+        yield session
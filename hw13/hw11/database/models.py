@@ -1,9 +1,24 @@
-from sqlalchemy import Column, Integer, String, func, UniqueConstraint, ForeignKey, Boolean
+from datetime import date
+from sqlalchemy import Column, BigInteger, Integer, SmallInteger, String, func, ForeignKey, Boolean, Index, DDL, event, text
 from sqlalchemy.sql.sqltypes import Date, DateTime
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.orm import relationship, declarative_base, validates
 
 Base = declarative_base()
 
+
+def month_day(value: date) -> int:
+    """
+    Encode the month and day of a date as a sortable integer, e.g. 21.11 -> 1121.
+
+    Parameters:
+    - value (date): The date.
+
+    Returns:
+    - int: month * 100 + day.
+    """
+    return value.month * 100 + value.day
+
+
 class Contact(Base):
     """
     SQLAlchemy model representing a contact.
@@ -15,12 +30,26 @@ class Contact(Base):
     - email (str): The email address of the contact.
     - phone (str): The phone number of the contact.
     - birthday (Date): The birthday of the contact.
+    - birthday_md (int): The month and day of the birthday (see month_day), kept in sync with birthday.
     - user_id (int, ForeignKey): The foreign key referencing the user to whom the contact belongs.
+    - updated_at (DateTime): The timestamp of the last change.
+    - change_seq (int): The owner's change sequence number of the last change (see User.contacts_seq), 0 for rows
+      written before delta sync existed.
+    - deleted_at (DateTime): When the contact was deleted; a deleted contact is a tombstone kept for delta sync.
+    - version (int): Incremented by every update, for optimistic concurrency (If-Match).
     - user (relationship): Relationship to the User model.
     """
     __tablename__ = "contacts"
+    # Every query filters on user_id, so every index leads with it. The primary
+    # key is unique on its own; the old unique (id, user_id) constraint is gone.
     __table_args__ = (
-        UniqueConstraint('id', 'user_id', name='unique_tag_user'),
+        Index('ix_contacts_user_id_id', 'user_id', 'id'),
+        Index('ix_contacts_user_id_last_name_id', 'user_id', 'last_name', 'id'),
+        Index('ix_contacts_user_id_birthday_md', 'user_id', 'birthday_md'),
+        Index('ix_contacts_user_id_change_seq', 'user_id', 'change_seq'),
+        # tombstones only, for purge_tombstones
+        Index('ix_contacts_deleted_at', 'deleted_at', postgresql_where=text('deleted_at IS NOT NULL'),
+              sqlite_where=text('deleted_at IS NOT NULL')),
     )
     id = Column(Integer, primary_key=True)
     first_name = Column(String(50), nullable=False)
@@ -28,10 +57,56 @@ class Contact(Base):
     email = Column(String(100), nullable=False)
     phone = Column(String(100), nullable=False)
     birthday = Column(Date, nullable=False)
+    birthday_md = Column(SmallInteger, nullable=False)
     user_id = Column('user_id', ForeignKey(
         'users.id', ondelete='CASCADE'), default=None)
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    deleted_at = Column(DateTime, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     user = relationship('User', backref="tags")
 
+    @validates('birthday')
+    def _set_birthday_md(self, key, value):
+        self.birthday_md = month_day(value) if value is not None else None
+        return value
+
+
+# Text searched by /api/contacts/search. On Postgres a pg_trgm GIN index is built
+# over this expression, so queries must use it verbatim to hit the index.
+CONTACT_SEARCH_DOCUMENT = "first_name || ' ' || last_name || ' ' || email || ' ' || phone"
+
+# Postgres: trigram index (databases managed by Alembic get it from a migration).
+event.listen(Contact.__table__, "after_create", DDL(
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+).execute_if(dialect="postgresql"))
+event.listen(Contact.__table__, "after_create", DDL(
+    f"CREATE INDEX IF NOT EXISTS ix_contacts_search_trgm ON contacts "
+    f"USING gin (({CONTACT_SEARCH_DOCUMENT}) gin_trgm_ops)"
+).execute_if(dialect="postgresql"))
+
+# SQLite: an external-content FTS5 table kept in sync with contacts by triggers.
+_SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5("
+    "first_name, last_name, email, phone, content='contacts', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+    "INSERT INTO contacts_fts(rowid, first_name, last_name, email, phone) "
+    "VALUES (new.id, new.first_name, new.last_name, new.email, new.phone); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email, phone) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.phone); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email, phone) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.phone); "
+    "INSERT INTO contacts_fts(rowid, first_name, last_name, email, phone) "
+    "VALUES (new.id, new.first_name, new.last_name, new.email, new.phone); END",
+]
+for _statement in _SQLITE_FTS_DDL:
+    event.listen(Contact.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(Contact.__table__, "before_drop", DDL(
+    "DROP TABLE IF EXISTS contacts_fts"
+).execute_if(dialect="sqlite"))
+
 
 class User(Base):
     """
@@ -44,10 +119,14 @@ class User(Base):
     - password (str): The hashed password of the user.
     - created_at (DateTime): The timestamp when the user was created.
     - avatar (str): The URL of the user's avatar.
-    - refresh_token (str): The refresh token associated with the user.
+    - refresh_token (str): No longer written; refresh tokens live in Redis (see services.tokens).
     - confirmed (bool): Flag indicating whether the user's email is confirmed.
+    - contacts_seq (int): The last change sequence number given to one of the user's contacts.
+    - contacts_purged_seq (int): The newest change sequence number of a purged tombstone.
     """
     __tablename__ = "users"
+    # fetch id and created_at with INSERT ... RETURNING instead of a second query
+    __mapper_args__ = {"eager_defaults": True}
     id = Column(Integer, primary_key=True)
     username = Column(String(50))
     email = Column(String(250), nullable=False, unique=True)
@@ -56,3 +135,10 @@ class User(Base):
     avatar = Column(String(255), nullable=True)
     refresh_token = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default=False)
+    contacts_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    contacts_purged_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+
+# Emails are matched case-insensitively (see repository.users.get_user_by_email),
+# which also makes addresses differing only in case the same account.
+Index('ix_users_email_lower', func.lower(User.email), unique=True)
@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("round_robin", "least_connections")
+
+
+class ReplicaSet:
+    """
+    Routes read-only sessions to read replicas of the primary database.
+
+    A replica is picked round-robin or by the fewest sessions in flight, among
+    the replicas that passed their last health check. Reads go to the primary
+    when there are no replicas, when none is healthy, and for a user who wrote
+    in the last sticky_seconds, so every device of the user reads its writes
+    despite replication lag. The recent writers are kept in process and, with a
+    Redis client set, in Redis for the other workers; Redis is only asked when a
+    replica would otherwise serve the read.
+    """
+
+    def __init__(self, urls: List[str], strategy: str = "round_robin", sticky_seconds: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic, **engine_kwargs):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown replica strategy {strategy!r}, expected one of {STRATEGIES}")
+        self.strategy = strategy
+        self.sticky_seconds = sticky_seconds
+        self.clock = clock
+        self.engines = [create_async_engine(url, **engine_kwargs) for url in urls]
+        self.session_makers = [async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+                               for engine in self.engines]
+        self.healthy = [True] * len(self.engines)
+        self.in_flight = [0] * len(self.engines)
+        self.redis = None
+        self._next = 0
+        self._writers: OrderedDict[str, float] = OrderedDict()
+
+    @staticmethod
+    def _key(user: str) -> str:
+        return "replica-sticky:" + hashlib.blake2b(user.encode(), digest_size=8).hexdigest()
+
+    def choose(self) -> Optional[int]:
+        """
+        Pick a healthy replica.
+
+        Returns:
+        - int | None: The index of the replica, or None if no replica is healthy.
+        """
+        count = len(self.engines)
+        candidates = [(self._next + i) % count for i in range(count) if self.healthy[(self._next + i) % count]]
+        if not candidates:
+            return None
+        if self.strategy == "least_connections":
+            chosen = min(candidates, key=lambda index: self.in_flight[index])
+        else:
+            chosen = candidates[0]
+        self._next = (chosen + 1) % count
+        return chosen
+
+    async def mark_write(self, user: Optional[str]) -> None:
+        """
+        Send a user's reads to the primary for the next sticky_seconds.
+
+        Parameters:
+        - user (str | None): The user identity, None for anonymous requests.
+        """
+        if user is None or not self.engines:
+            return
+        key = self._key(user)
+        now = self.clock()
+        self._writers[key] = now + self.sticky_seconds
+        self._writers.move_to_end(key)
+        while self._writers and next(iter(self._writers.values())) <= now:
+            self._writers.popitem(last=False)
+        if self.redis is not None:
+            try:
+                await self.redis.set(key, 1, px=int(self.sticky_seconds * 1000))
+            except RedisError as err:
+                logger.warning("Cannot share %s with other workers: %s", key, err)
+
+    async def wrote_recently(self, user: Optional[str]) -> bool:
+        """
+        Check whether a user wrote in the last sticky_seconds.
+
+        Parameters:
+        - user (str | None): The user identity, None for anonymous requests.
+
+        Returns:
+        - bool: True if the user's reads must go to the primary.
+        """
+        if user is None:
+            return False
+        key = self._key(user)
+        expires = self._writers.get(key)
+        if expires is not None and expires > self.clock():
+            return True
+        if self.redis is None:
+            return False
+        try:
+            return bool(await self.redis.exists(key))
+        except RedisError:
+            # without Redis a replica may be behind; the primary is always right
+            return True
+
+    @asynccontextmanager
+    async def session(self, user: Optional[str], primary: AsyncSession) -> AsyncIterator[AsyncSession]:
+        """
+        Open a read-only session on a replica, or fall back to the primary session.
+
+        Parameters:
+        - user (str | None): The user identity, see mark_write().
+        - primary (AsyncSession): The session on the primary, used when no replica should serve the read.
+
+        Yields:
+        - AsyncSession: The session to read from.
+        """
+        index = None
+        if any(self.healthy) and not await self.wrote_recently(user):
+            index = self.choose()
+        if index is None:
+            yield primary
+            return
+        self.in_flight[index] += 1
+        try:
+            async with self.session_makers[index]() as db:
+                yield db
+        finally:
+            self.in_flight[index] -= 1
+
+    async def check(self, timeout: float = 2.0) -> List[bool]:
+        """
+        Run SELECT 1 on every replica and update their health.
+
+        Parameters:
+        - timeout (float, optional): Seconds a replica gets to answer.
+
+        Returns:
+        - List[bool]: The health of each replica.
+        """
+        async def ping(engine) -> bool:
+            try:
+                async with engine.connect() as conn:
+                    await asyncio.wait_for(conn.execute(text("SELECT 1")), timeout)
+                return True
+            except Exception as err:
+                logger.warning("Replica %s is unhealthy: %s", engine.url.render_as_string(), err)
+                return False
+
+        self.healthy = list(await asyncio.gather(*(ping(engine) for engine in self.engines)))
+        return self.healthy
+
+    async def run_health_checks(self, interval: float) -> None:
+        """
+        Check the replicas every interval seconds until cancelled.
+
+        Parameters:
+        - interval (float): Seconds between checks.
+        """
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+    async def dispose(self) -> None:
+        """
+        Close the connection pools of the replicas.
+        """
+        for engine in self.engines:
+            await engine.dispose()
@@ -1,12 +1,61 @@
-from typing import List
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from hw11.database.models import Contact, User
-from hw11.schemas import ContactModel
-from datetime import date, timedelta
+import base64
+import calendar
+import json
+import re
+from typing import AsyncIterator, List, Sequence, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Row, and_, or_, select, insert, update, delete, tuple_, func, literal, literal_column, table, column, text, case
+from hw11.database.models import Contact, User, CONTACT_SEARCH_DOCUMENT, month_day
+from hw11.schemas import ContactModel, ContactUpdateItem
+from hw11.services.response_cache import contact_cache
+from datetime import date, datetime, timedelta
 
+# Every committed write bumps the owner's collection version, which changes the
+# ETags of contact reads and retires their cached responses (services.response_cache).
+# Writes also stamp the rows with the owner's next change_seq for delta sync, and
+# deletes leave tombstones (deleted_at), so reads must skip deleted rows.
 
-async def get_contacts(skip: int, limit: int, user: User, db: Session) -> List[Contact]:
+# Keyset orderings. Each one ends with the primary key so the key is unique
+# and is served by an index on (user_id, *columns).
+CURSOR_ORDERS = {
+    "id": (Contact.id,),
+    "last_name": (Contact.last_name, Contact.id),
+}
+
+
+class StaleSyncToken(ValueError):
+    """
+    Raised when a sync token predates tombstones that have been purged; the client must sync from scratch.
+    """
+
+
+class StaleVersion(ValueError):
+    """
+    Raised when a conditional write finds the contact at a version other than the expected ones.
+    """
+
+
+async def next_change_seq(user: User, db: AsyncSession) -> int:
+    """
+    Take the next change sequence number for a write to a user's contacts.
+
+    The counter lives on the user row, so the UPDATE locks that row until the
+    transaction ends. A user's writes therefore commit in sequence order, and a
+    delta sync can never pass over a change that commits late.
+
+    Parameters:
+    - user (User): The owner of the contacts.
+    - db (AsyncSession): The database session of the write.
+
+    Returns:
+    - int: The sequence number to stamp on the changed rows.
+    """
+    stmt = update(User).filter(User.id == user.id).values(contacts_seq=User.contacts_seq + 1)
+    seq = await db.execute(stmt.returning(User.contacts_seq).execution_options(synchronize_session=False))
+    return seq.scalar_one()
+
+
+async def get_contacts(skip: int, limit: int, user: User, db: AsyncSession) -> List[Contact]:
     """
     Retrieve a list of contacts for a specific user.
 
@@ -14,122 +63,600 @@ async def get_contacts(skip: int, limit: int, user: User, db: Session) -> List[C
     - skip (int): Number of records to skip.
     - limit (int): Maximum number of records to return.
     - user (User): The user whose contacts are being retrieved.
-    - db (Session): The database session.
+    - db (AsyncSession): The database session.
 
     Returns:
     - List[Contact]: List of contacts.
     """
-    return db.query(Contact).filter(Contact.user_id == user.id).offset(skip).limit(limit).all()
+    stmt = select(Contact).filter(Contact.user_id == user.id, Contact.deleted_at.is_(None)).offset(skip).limit(limit)
+    contacts = await db.execute(stmt)
+    return contacts.scalars().all()
+
+
+EXPORT_COLUMNS = (Contact.id, Contact.first_name, Contact.last_name, Contact.email, Contact.phone, Contact.birthday)
+
+
+async def stream_contacts(user: User, db: AsyncSession, batch_size: int = 1000) -> AsyncIterator[Sequence[Row]]:
+    """
+    Stream all contacts of a user in batches through a server-side cursor.
+
+    Only plain rows (EXPORT_COLUMNS) are fetched, so no ORM objects are built
+    and memory use is bounded by batch_size.
+
+    Parameters:
+    - user (User): The user whose contacts are being exported.
+    - db (AsyncSession): The database session. It must stay open while iterating.
+    - batch_size (int, optional): Rows fetched per round-trip. Defaults to 1000.
+
+    Yields:
+    - Sequence[Row]: The next batch of rows, ordered by id.
+    """
+    stmt = select(*EXPORT_COLUMNS).filter(Contact.user_id == user.id, Contact.deleted_at.is_(None)).order_by(Contact.id)
+    result = await db.stream(stmt.execution_options(yield_per=batch_size))
+    async for rows in result.partitions():
+        yield rows
+
+
+def encode_cursor(contact: Contact, order_by: str) -> str:
+    """
+    Build an opaque cursor pointing just after the given contact.
+
+    Parameters:
+    - contact (Contact): The last contact of the current page.
+    - order_by (str): The ordering the cursor belongs to (a key of CURSOR_ORDERS).
+
+    Returns:
+    - str: The URL-safe cursor.
+    """
+    key = [getattr(contact, column.key) for column in CURSOR_ORDERS[order_by]]
+    payload = json.dumps({"o": order_by, "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
 
 
-async def get_contact(db: Session, user: User, first_name: str = None, last_name: str = None, email: str = None) -> Contact:
+def decode_cursor(cursor: str, order_by: str) -> list | None:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Parameters:
+    - cursor (str): The cursor, or an empty string for the first page.
+    - order_by (str): The ordering the cursor must belong to.
+
+    Returns:
+    - list | None: The key values to seek after, or None for the first page.
+
+    Raises:
+    - ValueError: If the cursor is malformed, belongs to another ordering or has key values of the wrong type.
+    """
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        order, key = payload["o"], payload["k"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    columns = CURSOR_ORDERS.get(order_by, ())
+    if order != order_by or not isinstance(key, list) or len(key) != len(columns):
+        raise ValueError("Invalid cursor")
+    # a crafted cursor must not reach the driver with values of the wrong type
+    if any(type(value) is not column.type.python_type for value, column in zip(key, columns)):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+async def get_contacts_page(limit: int, user: User, db: AsyncSession, cursor: str = "",
+                            order_by: str = "id") -> Tuple[List[Contact], str | None]:
+    """
+    Retrieve a page of contacts for a user using keyset (cursor) pagination.
+
+    Instead of skipping rows the query seeks past the last key of the previous
+    page, so the cost of a page does not depend on how deep it is.
+
+    Parameters:
+    - limit (int): Maximum number of records to return.
+    - user (User): The user whose contacts are being retrieved.
+    - db (AsyncSession): The database session.
+    - cursor (str, optional): The cursor returned with the previous page, empty for the first page.
+    - order_by (str, optional): "id" or "last_name". Defaults to "id".
+
+    Returns:
+    - Tuple[List[Contact], str | None]: The contacts and the cursor of the next page,
+      or None if this is the last page.
+
+    Raises:
+    - ValueError: If the cursor is invalid.
+    """
+    columns = CURSOR_ORDERS[order_by]
+    key = decode_cursor(cursor, order_by)
+    stmt = select(Contact).filter(Contact.user_id == user.id, Contact.deleted_at.is_(None))
+    if key is not None:
+        stmt = stmt.filter(tuple_(*columns) > tuple_(*key))
+    stmt = stmt.order_by(*columns).limit(limit + 1)
+    contacts = await db.execute(stmt)
+    contacts = contacts.scalars().all()
+    if len(contacts) <= limit:
+        return contacts, None
+    contacts = contacts[:limit]
+    return contacts, encode_cursor(contacts[-1], order_by)
+
+
+def encode_sync_token(seq: int, contact_id: int, horizon: int) -> str:
+    """
+    Build an opaque sync token pointing just after the given change.
+
+    Parameters:
+    - seq (int): The change sequence number of the last change delivered.
+    - contact_id (int): The ID of the contact of that change.
+    - horizon (int): The sequence number up to which the client has seen every deletion.
+
+    Returns:
+    - str: The URL-safe token.
+    """
+    payload = json.dumps({"s": seq, "i": contact_id, "h": horizon}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_sync_token(token: str) -> Tuple[int, int, int]:
+    """
+    Decode a token produced by encode_sync_token.
+
+    Parameters:
+    - token (str): The token.
+
+    Returns:
+    - Tuple[int, int, int]: The change sequence number and contact ID to continue after, and the horizon.
+
+    Raises:
+    - ValueError: If the token is malformed.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        seq, contact_id = payload["s"], payload["i"]
+        horizon = payload.get("h", seq)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("Invalid sync token")
+    if not all(type(value) is int for value in (seq, contact_id, horizon)):
+        raise ValueError("Invalid sync token")
+    return seq, contact_id, horizon
+
+
+async def get_changes(user: User, db: AsyncSession, since: str = "", limit: int = 1000) -> dict:
+    """
+    Retrieve the changes to a user's contacts after a sync token.
+
+    Changes are read in (change_seq, id) order from the (user_id, change_seq)
+    index. An empty token starts a full sync, which skips tombstones; its pages
+    can start at change_seq 0, where rows written before delta sync existed stay.
+
+    The horizon of a token is the sequence number up to which the client knows
+    of every deletion. A full sync starts with the user's current sequence
+    number, since it skips everything deleted before; the token is stale once
+    tombstones after its horizon have been purged.
+
+    Parameters:
+    - user (User): The user whose contacts are synced.
+    - db (AsyncSession): The database session.
+    - since (str, optional): The token returned by the previous call, empty for a full sync.
+    - limit (int, optional): Maximum number of changes to return. Defaults to 1000.
+
+    Returns:
+    - dict: changed (List[Contact]), deleted (List[int]), token (str) and has_more (bool).
+
+    Raises:
+    - StaleSyncToken: If tombstones newer than the token have been purged.
+    - ValueError: If the token is invalid.
+    """
+    stmt = select(Contact).filter(Contact.user_id == user.id)
+    if since:
+        seq, contact_id, horizon = decode_sync_token(since)
+        purged = await db.execute(select(User.contacts_purged_seq).filter(User.id == user.id))
+        if horizon < (purged.scalar_one_or_none() or 0):
+            raise StaleSyncToken("Sync token expired")
+        stmt = stmt.filter(tuple_(Contact.change_seq, Contact.id) > tuple_(seq, contact_id))
+    else:
+        current = await db.execute(select(User.contacts_seq).filter(User.id == user.id))
+        seq, contact_id, horizon = 0, 0, current.scalar_one_or_none() or 0
+        stmt = stmt.filter(Contact.deleted_at.is_(None))
+    contacts = await db.execute(stmt.order_by(Contact.change_seq, Contact.id).limit(limit + 1))
+    contacts = contacts.scalars().all()
+    has_more = len(contacts) > limit
+    contacts = contacts[:limit]
+    if contacts:
+        seq, contact_id = contacts[-1].change_seq, contacts[-1].id
+    elif not since:
+        # an empty full sync: every later change has a higher sequence number
+        seq = horizon
+    return {"changed": [contact for contact in contacts if contact.deleted_at is None],
+            "deleted": [contact.id for contact in contacts if contact.deleted_at is not None],
+            "token": encode_sync_token(seq, contact_id, max(seq, horizon)), "has_more": has_more}
+
+
+async def get_contact(db: AsyncSession, user: User, first_name: str = None, last_name: str = None, email: str = None,
+                      contact_id: int = None) -> Contact:
     """
     Retrieve a specific contact for a user based on the provided parameters.
 
     Parameters:
-    - db (Session): The database session.
+    - db (AsyncSession): The database session.
     - user (User): The user whose contact is being retrieved.
     - first_name (str, optional): The first name of the contact.
     - last_name (str, optional): The last name of the contact.
     - email (str, optional): The email address of the contact.
+    - contact_id (int, optional): The ID of the contact.
 
     Returns:
     - Contact: The retrieved contact.
     """
-    query = db.query(Contact)
+    stmt = select(Contact).filter(Contact.user_id == user.id, Contact.deleted_at.is_(None))
+    if contact_id is not None:
+        stmt = stmt.filter(Contact.id == contact_id)
     if first_name:
-        query = query.filter(and_(Contact.first_name.ilike(
-            f"%{first_name}%"), Contact.user_id == user.id))
+        stmt = stmt.filter(Contact.first_name.ilike(f"%{first_name}%"))
     if last_name:
-        query = query.filter(Contact.last_name.ilike(f"%{last_name}%"))
+        stmt = stmt.filter(Contact.last_name.ilike(f"%{last_name}%"))
     if email:
-        query = query.filter(Contact.email.ilike(f"%{email}%"))
-    return query.first()
+        stmt = stmt.filter(Contact.email.ilike(f"%{email}%"))
+    contact = await db.execute(stmt)
+    return contact.scalars().first()
 
 
-async def create_contact(body: ContactModel, user: User, db: Session) -> Contact:
+def _fts_query(q: str) -> str:
     """
-    Create a new contact for a user.
+    Turn free text into an FTS5 query matching every word as a prefix.
+
+    Parameters:
+    - q (str): The search text.
+
+    Returns:
+    - str: The FTS5 MATCH expression, empty if q has no words.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", q))
+
+
+async def search_contacts(q: str, user: User, db: AsyncSession, skip: int = 0, limit: int = 20) -> List[Contact]:
+    """
+    Search the contacts of a user by name, email or phone, best matches first.
+
+    On Postgres the query uses the pg_trgm GIN index over CONTACT_SEARCH_DOCUMENT
+    (substring and fuzzy matches, ranked by word similarity). On SQLite it uses the
+    contacts_fts FTS5 table (word prefix matches, ranked by bm25).
+
+    Parameters:
+    - q (str): The search text.
+    - user (User): The user whose contacts are searched.
+    - db (AsyncSession): The database session.
+    - skip (int, optional): Number of records to skip. Defaults to 0.
+    - limit (int, optional): Maximum number of records to return. Defaults to 20.
+
+    Returns:
+    - List[Contact]: The matching contacts.
+    """
+    stmt = select(Contact).filter(Contact.user_id == user.id, Contact.deleted_at.is_(None))
+    if db.get_bind().dialect.name == "postgresql":
+        document = literal_column(f"({CONTACT_SEARCH_DOCUMENT})")
+        pattern = "%" + re.sub(r"([\\%_])", r"\\\1", q) + "%"
+        stmt = stmt.filter(or_(document.ilike(pattern), literal(q).op("<%")(document)))
+        stmt = stmt.order_by(func.word_similarity(q, document).desc(), Contact.id)
+    else:
+        match = _fts_query(q)
+        if not match:
+            return []
+        fts = table("contacts_fts", column("rowid"), column("rank"))
+        stmt = stmt.join(fts, fts.c.rowid == Contact.id)
+        stmt = stmt.filter(text("contacts_fts MATCH :match").bindparams(match=match))
+        stmt = stmt.order_by(fts.c.rank, Contact.id)
+    contacts = await db.execute(stmt.offset(skip).limit(limit))
+    return contacts.scalars().all()
+
+
+async def _change_seq_value(user: User, db: AsyncSession):
+    """
+    Return the change sequence number for a single-statement write.
+
+    On Postgres this is a scalar subquery over a data-modifying CTE, so taking
+    the number rides along with the write itself. SQLite has no writable CTEs,
+    so the number is taken first with next_change_seq().
+
+    Parameters:
+    - user (User): The owner of the contacts.
+    - db (AsyncSession): The database session of the write.
+
+    Returns:
+    - The value to assign to Contact.change_seq.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        seq = update(User).filter(User.id == user.id).values(contacts_seq=User.contacts_seq + 1) \
+            .returning(User.contacts_seq).cte("next_seq")
+        return select(seq.c.contacts_seq).scalar_subquery()
+    return await next_change_seq(user, db)
+
+
+async def _write_one(stmt, contact_id: int, user: User, db: AsyncSession,
+                     expected_versions: Sequence[int] | None) -> Contact | None:
+    """
+    Run a single-row UPDATE ... RETURNING on a live contact and commit it.
+
+    Parameters:
+    - stmt: The UPDATE, not yet filtered.
+    - contact_id (int): The ID of the contact.
+    - user (User): The user who owns the contact.
+    - db (AsyncSession): The database session.
+    - expected_versions (Sequence[int] | None): Versions the contact must have, or None for an unconditional write.
+
+    Returns:
+    - Contact | None: The contact as written, or None if the contact does not exist.
+
+    Raises:
+    - StaleVersion: If the contact exists at another version.
+    """
+    live = and_(Contact.id == contact_id, Contact.user_id == user.id, Contact.deleted_at.is_(None))
+    stmt = stmt.filter(live)
+    if expected_versions is not None:
+        stmt = stmt.filter(Contact.version.in_(expected_versions))
+    # "fetch" refreshes a copy already in the session from the RETURNING row, no extra SELECT
+    contact = await db.execute(stmt.returning(Contact).execution_options(synchronize_session="fetch"))
+    contact = contact.scalar_one_or_none()
+    if contact is None:
+        # Nothing to commit. The sequence bump is rolled back with the session, or
+        # becomes a gap if the caller commits later; delta sync does not mind gaps.
+        if expected_versions is not None and await db.scalar(select(Contact.id).filter(live)) is not None:
+            raise StaleVersion(contact_id)
+        return None
+    await db.commit()
+    await contact_cache.bump(user.id)
+    return contact
+
+
+async def create_contact(body: ContactModel, user: User, db: AsyncSession) -> Contact:
+    """
+    Create a new contact for a user with one INSERT ... RETURNING.
 
     Parameters:
     - body (ContactModel): The contact data.
     - user (User): The user who owns the contact.
-    - db (Session): The database session.
+    - db (AsyncSession): The database session.
 
     Returns:
     - Contact: The created contact.
     """
-    contact = Contact(first_name=body.first_name, last_name=body.last_name,
-                      email=body.email, phone=body.phone, birthday=body.birthday, user_id=user.id)
-    db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    stmt = insert(Contact).values(**body.model_dump(), birthday_md=month_day(body.birthday), user_id=user.id,
+                                  change_seq=await _change_seq_value(user, db)).returning(Contact)
+    contact = await db.execute(stmt)
+    contact = contact.scalar_one()
+    await db.commit()
+    await contact_cache.bump(user.id)
     return contact
 
 
-async def update_contact(contact_id: int, body: ContactModel, user: User, db: Session) -> Contact | None:
+async def update_contact(contact_id: int, body: ContactModel, user: User, db: AsyncSession,
+                         expected_versions: Sequence[int] | None = None) -> Contact | None:
     """
-    Update an existing contact for a user.
+    Update an existing contact for a user with one UPDATE ... RETURNING.
 
     Parameters:
     - contact_id (int): The ID of the contact to update.
     - body (ContactModel): The updated contact data.
     - user (User): The user who owns the contact.
-    - db (Session): The database session.
+    - db (AsyncSession): The database session.
+    - expected_versions (Sequence[int], optional): Only update the contact at one of these versions (If-Match).
 
     Returns:
     - Contact | None: The updated contact, or None if the contact does not exist.
+
+    Raises:
+    - StaleVersion: If expected_versions is given and the contact has been changed since.
     """
-    contact = db.query(Contact).filter(
-        and_(Contact.id == contact_id, Contact.user_id == user.id)).first()
-    if contact:
-        contact.first_name = body.first_name
-        contact.last_name = body.last_name
-        contact.email = body.email
-        contact.phone = body.phone
-        contact.birthday = body.birthday
-        db.commit()
-    return contact
+    stmt = update(Contact).values(**body.model_dump(), birthday_md=month_day(body.birthday),
+                                  change_seq=await _change_seq_value(user, db), version=Contact.version + 1)
+    return await _write_one(stmt, contact_id, user, db, expected_versions)
 
 
-async def remove_contact(contact_id: int, user: User, db: Session) -> Contact | None:
+async def remove_contact(contact_id: int, user: User, db: AsyncSession,
+                         expected_versions: Sequence[int] | None = None) -> Contact | None:
     """
-    Remove a contact for a user.
+    Remove a contact for a user, leaving a tombstone for delta sync, with one UPDATE ... RETURNING.
 
     Parameters:
     - contact_id (int): The ID of the contact to remove.
     - user (User): The user who owns the contact.
-    - db (Session): The database session.
+    - db (AsyncSession): The database session.
+    - expected_versions (Sequence[int], optional): Only remove the contact at one of these versions (If-Match).
 
     Returns:
     - Contact | None: The removed contact, or None if the contact does not exist.
+
+    Raises:
+    - StaleVersion: If expected_versions is given and the contact has been changed since.
     """
-    contact = db.query(Contact).filter(
-        and_(Contact.id == contact_id, Contact.user_id == user.id)).first()
-    if contact:
-        db.delete(contact)
-        db.commit()
-    return contact
+    stmt = update(Contact).values(deleted_at=func.now(), change_seq=await _change_seq_value(user, db))
+    return await _write_one(stmt, contact_id, user, db, expected_versions)
+
+
+async def create_contacts(bodies: List[ContactModel], user: User, db: AsyncSession) -> List[dict]:
+    """
+    Create many contacts for a user with one multi-row INSERT ... RETURNING.
+
+    Parameters:
+    - bodies (List[ContactModel]): The contacts data.
+    - user (User): The user who owns the contacts.
+    - db (AsyncSession): The database session.
+
+    Returns:
+    - List[dict]: One result per item with index, status ("created") and contact.
+    """
+    seq = await next_change_seq(user, db)
+    rows = [dict(body.model_dump(), birthday_md=month_day(body.birthday), user_id=user.id, change_seq=seq)
+            for body in bodies]
+    stmt = insert(Contact).returning(Contact, sort_by_parameter_order=True)
+    contacts = await db.execute(stmt, rows)
+    contacts = contacts.scalars().all()
+    await db.commit()
+    await contact_cache.bump(user.id)
+    return [{"index": index, "status": "created", "contact": contact} for index, contact in enumerate(contacts)]
+
+
+async def update_contacts(items: List[ContactUpdateItem], user: User, db: AsyncSession) -> List[dict]:
+    """
+    Update many contacts of a user in one transaction.
+
+    The change sequence number is taken first, which locks the user row before
+    any contact row, in the same order as every other write. The contacts owned
+    by the user are then locked with a single SELECT ... FOR UPDATE, updated with
+    one executemany UPDATE by primary key and read back with one SELECT, so every
+    result carries the written row with its new version.
+
+    Parameters:
+    - items (List[ContactUpdateItem]): The contacts data with their IDs.
+    - user (User): The user who owns the contacts.
+    - db (AsyncSession): The database session.
+
+    Returns:
+    - List[dict]: One result per item with index, status ("updated" or "not_found") and contact.
+    """
+    seq = await next_change_seq(user, db)
+    stmt = select(Contact.id, Contact.version).filter(
+        and_(Contact.user_id == user.id, Contact.deleted_at.is_(None),
+             Contact.id.in_({item.id for item in items}))).with_for_update()
+    found = await db.execute(stmt)
+    found = dict(found.tuples().all())
+    rows = [dict(item.model_dump(), birthday_md=month_day(item.birthday), version=found[item.id] + 1)
+            for item in items if item.id in found]
+    contacts = {}
+    if rows:
+        await db.execute(update(Contact), [dict(row, change_seq=seq) for row in rows])
+        # executemany UPDATE has no RETURNING; populate_existing refreshes contacts already in the session
+        written = await db.execute(select(Contact).filter(Contact.id.in_(found))
+                                   .execution_options(populate_existing=True))
+        contacts = {contact.id: contact for contact in written.scalars().all()}
+    await db.commit()
+    if rows:
+        await contact_cache.bump(user.id)
+    return [{"index": index, "status": "updated", "contact": contacts[item.id]} if item.id in contacts
+            else {"index": index, "status": "not_found"}
+            for index, item in enumerate(items)]
 
 
-async def upcoming_birthdays(user: User, db: Session) -> List[Contact]:
+async def remove_contacts(ids: List[int], user: User, db: AsyncSession) -> List[dict]:
     """
-    Retrieve contacts with upcoming birthdays for a user.
+    Remove many contacts of a user with one UPDATE ... RETURNING that turns them into tombstones.
+
+    Parameters:
+    - ids (List[int]): The IDs of the contacts to remove.
+    - user (User): The user who owns the contacts.
+    - db (AsyncSession): The database session.
+
+    Returns:
+    - List[dict]: One result per item with index, status ("deleted" or "not_found") and contact.
+    """
+    seq = await next_change_seq(user, db)
+    stmt = update(Contact).filter(
+        and_(Contact.user_id == user.id, Contact.deleted_at.is_(None), Contact.id.in_(set(ids)))
+    ).values(deleted_at=func.now(), change_seq=seq).returning(Contact)
+    contacts = await db.execute(stmt.execution_options(synchronize_session=False))
+    contacts = {contact.id: contact for contact in contacts.scalars().all()}
+    await db.commit()
+    if contacts:
+        await contact_cache.bump(user.id)
+    return [{"index": index, "status": "deleted", "contact": contacts[contact_id]} if contact_id in contacts
+            else {"index": index, "status": "not_found"}
+            for index, contact_id in enumerate(ids)]
+
+
+IMPORT_COLUMNS = ("first_name", "last_name", "email", "phone", "birthday", "birthday_md", "user_id", "change_seq")
+
+
+async def copy_contacts(bodies: List[ContactModel], user: User, db: AsyncSession) -> int:
+    """
+    Write a chunk of imported contacts as fast as the database allows.
+
+    Postgres uses COPY through the asyncpg connection; other databases use one
+    executemany INSERT. The chunk is committed before returning.
+
+    Parameters:
+    - bodies (List[ContactModel]): The validated contacts.
+    - user (User): The user who owns the contacts.
+    - db (AsyncSession): The database session.
+
+    Returns:
+    - int: The number of contacts written.
+    """
+    if not bodies:
+        return 0
+    seq = await next_change_seq(user, db)
+    records = [(body.first_name, body.last_name, body.email, body.phone, body.birthday,
+                month_day(body.birthday), user.id, seq) for body in bodies]
+    if db.get_bind().dialect.driver == "asyncpg":
+        connection = await db.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            Contact.__tablename__, records=records, columns=IMPORT_COLUMNS)
+    else:
+        await db.execute(insert(Contact.__table__), [dict(zip(IMPORT_COLUMNS, record)) for record in records])
+    await db.commit()
+    await contact_cache.bump(user.id)
+    return len(records)
+
+
+async def upcoming_birthdays(user: User, db: AsyncSession, days: int = 7, today: date | None = None) -> List[Contact]:
+    """
+    Retrieve contacts whose birthday falls within the next days, soonest first.
+
+    Birthdays are matched on the stored month-day (birthday_md), so the birth
+    year is ignored and the query is a range scan of the (user_id, birthday_md)
+    index. A window crossing New Year is split into two ranges. In non-leap
+    years Feb 29 birthdays are celebrated on Feb 28.
 
     Parameters:
     - user (User): The user whose contacts are being retrieved.
-    - db (Session): The database session.
+    - db (AsyncSession): The database session.
+    - days (int, optional): Size of the window after today, in days. Defaults to 7.
+    - today (date, optional): The first day of the window. Defaults to date.today().
 
     Returns:
-    - List[Contact]: List of contacts with upcoming birthdays.
+    - List[Contact]: List of contacts with upcoming birthdays, ordered by next occurrence.
     """
-    today = date.today()
-    end_date = today + timedelta(days=7)
+    today = today or date.today()
+    end_date = today + timedelta(days=days)
+    start_md, end_md = month_day(today), month_day(end_date)
+    if (end_date.month, end_date.day) == (2, 28) and not calendar.isleap(end_date.year):
+        end_md = month_day(date(2000, 2, 29))
 
-    return db.query(Contact).filter(
+    if end_date.year == today.year:
+        in_window = Contact.birthday_md.between(start_md, end_md)
+    else:
+        in_window = or_(Contact.birthday_md >= start_md, Contact.birthday_md <= end_md)
+    stmt = select(Contact).filter(
         and_(
             Contact.user_id == user.id,
-            Contact.birthday >= today,
-            Contact.birthday <= end_date
+            Contact.deleted_at.is_(None),
+            in_window
         )
-    ).all()
+    ).order_by(case((Contact.birthday_md < start_md, 1), else_=0), Contact.birthday_md, Contact.id)
+    contacts = await db.execute(stmt)
+    return contacts.scalars().all()
+
+
+async def purge_tombstones(before: datetime, db: AsyncSession) -> int:
+    """
+    Delete tombstones of contacts deleted before a point in time.
+
+    Each affected user remembers the newest purged change_seq, so a client
+    whose sync token is older gets StaleSyncToken instead of silently missing
+    the deletions.
+
+    Parameters:
+    - before (datetime): Tombstones older than this are deleted.
+    - db (AsyncSession): The database session.
+
+    Returns:
+    - int: The number of tombstones deleted.
+    """
+    stmt = select(Contact.user_id, func.max(Contact.change_seq)).filter(
+        Contact.deleted_at < before).group_by(Contact.user_id)
+    horizons = await db.execute(stmt)
+    horizons = [{"id": user_id, "contacts_purged_seq": seq} for user_id, seq in horizons.all()]
+    if not horizons:
+        return 0
+    await db.execute(update(User), horizons)
+    deleted = await db.execute(delete(Contact).filter(Contact.deleted_at < before))
+    await db.commit()
+    return deleted.rowcount
@@ -1,86 +1,96 @@
-from libgravatar import Gravatar
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from hw11.database.models import User
 from hw11.schemas import UserModel
+from hw11.services.cache import user_cache
 
 
-async def get_user_by_email(email: str, db: Session) -> User:
+async def get_user_by_email(email: str, db: AsyncSession) -> User:
     """
-    Retrieve a user by email from the database.
+    Retrieve a user by email from the database, ignoring case.
+
+    The lookup uses the ix_users_email_lower index on lower(email).
 
     Parameters:
     - email (str): The email address of the user to retrieve.
-    - db (Session): The database session.
+    - db (AsyncSession): The database session.
 
     Returns:
     - User: The retrieved user.
     """
-    return db.query(User).filter(User.email == email).first()
+    stmt = select(User).filter(func.lower(User.email) == email.lower())
+    user = await db.execute(stmt)
+    return user.scalars().first()
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def create_user(body: UserModel, db: AsyncSession) -> User:
     """
     Create a new user in the database.
 
+    No avatar is stored; UserDb falls back to the Gravatar URL of the email when the user is read.
+
     Parameters:
     - body (UserModel): The user data.
-    - db (Session): The database session.
+    - db (AsyncSession): The database session.
 
     Returns:
     - User: The created user.
+
+    Raises:
+    - IntegrityError: If a user with the same email exists; the session is rolled back.
     """
-    avatar = None
-    try:
-        g = Gravatar(body.email)
-        avatar = g.get_image()
-    except Exception as e:
-        print(e)
-    new_user = User(**body.dict(), avatar=avatar)
+    new_user = User(**body.dict())
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
+async def update_password(user: User, password: str, db: AsyncSession) -> None:
     """
-    Update the refresh token for a user.
+    Replace the password hash of a user, e.g. after rehashing with a new work factor.
 
     Parameters:
-    - user (User): The user whose token is being updated.
-    - token (str | None): The new refresh token, or None if no token is provided.
-    - db (Session): The database session.
+    - user (User): The user whose password hash is being updated.
+    - password (str): The new password hash.
+    - db (AsyncSession): The database session.
     """
-    user.refresh_token = token
-    db.commit()
+    user.password = password
+    await db.commit()
 
 
-async def confirmed_email(email: str, db: Session) -> None:
+async def confirmed_email(email: str, db: AsyncSession) -> None:
     """
     Mark a user's email as confirmed.
 
     Parameters:
     - email (str): The email address of the user.
-    - db (Session): The database session.
+    - db (AsyncSession): The database session.
     """
     user = await get_user_by_email(email, db)
     user.confirmed = True
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(email)
 
 
-async def update_avatar(email: str, url: str, db: Session) -> User:
+async def update_avatar(email: str, url: str, db: AsyncSession) -> User:
     """
     Update a user's avatar URL.
 
     Parameters:
     - email (str): The email address of the user.
     - url (str): The new avatar URL.
-    - db (Session): The database session.
+    - db (AsyncSession): The database session.
 
     Returns:
     - User: The updated user.
     """
     user = await get_user_by_email(email, db)
     user.avatar = url
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(email)
     return user
@@ -1,11 +1,13 @@
 from typing import List
 from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from hw11.database.db import get_db
 from hw11.schemas import UserModel, UserResponse, TokenModel, RequestEmail
 from hw11.repository import users as repository_users
 from hw11.services.auth import auth_service
+from hw11.services.tokens import Rotation
 from hw11.services.email import send_email
 
 router = APIRouter(prefix='/auth', tags=["auth"])
@@ -13,7 +15,7 @@ security = HTTPBearer()
 
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: AsyncSession = Depends(get_db)):
     """
     Endpoint to sign up a new user.
 
@@ -21,30 +23,30 @@ async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Re
     - body (UserModel): The user data.
     - background_tasks (BackgroundTasks): Background tasks to be executed.
     - request (Request): The request object.
-    - db (Session, optional): The database session. Defaults to Depends(get_db).
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_db).
 
     Returns:
     - UserResponse: The response containing the created user.
     """
-    exist_user = await repository_users.get_user_by_email(body.email, db)
-    if exist_user:
+    body.password = await auth_service.get_password_hash(body.password)
+    try:
+        new_user = await repository_users.create_user(body, db)
+    except IntegrityError:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT,
                             detail="Account already exists")
-    body.password = auth_service.get_password_hash(body.password)
-    new_user = await repository_users.create_user(body, db)
     background_tasks.add_task(
         send_email, new_user.email, new_user.username, request.base_url)
     return {"user": new_user, "detail": "User successfully created. Check your email for confirmation."}
 
 
 @router.post("/login", response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """
     Endpoint to authenticate and log in a user.
 
     Parameters:
     - body (OAuth2PasswordRequestForm): The login form data.
-    - db (Session, optional): The database session. Defaults to Depends(get_db).
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_db).
 
     Returns:
     - TokenModel: The response containing the access and refresh tokens.
@@ -56,50 +58,68 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
     if not user.confirmed:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
-    if not auth_service.verify_password(body.password, user.password):
+    valid, new_hash = await auth_service.verify_and_update_password(body.password, user.password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
-    # Generate JWT
-    access_token = await auth_service.create_access_token(data={"sub": user.email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    await repository_users.update_token(user, refresh_token, db)
-    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+    if new_hash:
+        await repository_users.update_password(user, new_hash, db)
+    # Generate JWT; every login starts its own refresh-token family
+    return await auth_service.issue_tokens(user.email)
 
 
 @router.get('/refresh_token', response_model=TokenModel)
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security)):
     """
     Endpoint to refresh an access token.
 
+    The refresh token is rotated: the presented one stops working and reusing it
+    revokes the whole token family.
+
     Parameters:
     - credentials (HTTPAuthorizationCredentials): The HTTP authorization credentials.
-    - db (Session, optional): The database session. Defaults to Depends(get_db).
 
     Returns:
     - TokenModel: The response containing the new access and refresh tokens.
     """
-    token = credentials.credentials
-    email = await auth_service.decode_refresh_token(token)
-    user = await repository_users.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await repository_users.update_token(user, None, db)
+    claims = await auth_service.decode_refresh_claims(credentials.credentials)
+    email, family = claims["sub"], claims.get("fid")
+    new_jti = auth_service.refresh_tokens.new_id()
+    if family is None or await auth_service.refresh_tokens.rotate(
+            email, family, claims.get("jti"), new_jti) != Rotation.ROTATED:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    return await auth_service.issue_tokens(email, family, new_jti)
+
+
+@router.post('/logout')
+async def logout(everywhere: bool = False, credentials: HTTPAuthorizationCredentials = Security(security)):
+    """
+    Endpoint to revoke refresh tokens.
 
-    access_token = await auth_service.create_access_token(data={"sub": email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    await repository_users.update_token(user, refresh_token, db)
-    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+    Parameters:
+    - everywhere (bool): Revoke the tokens of all devices instead of the current one.
+    - credentials (HTTPAuthorizationCredentials): The refresh token as HTTP authorization credentials.
+
+    Returns:
+    - dict: A message indicating the status of the logout.
+    """
+    claims = await auth_service.decode_refresh_claims(credentials.credentials)
+    if everywhere:
+        await auth_service.refresh_tokens.revoke_all(claims["sub"])
+    elif claims.get("fid"):
+        await auth_service.refresh_tokens.revoke(claims["sub"], claims["fid"])
+    return {"message": "Logged out"}
 
 
 @router.get('/confirmed_email/{token}')
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
     Endpoint to confirm a user's email.
 
     Parameters:
     - token (str): The email confirmation token.
-    - db (Session, optional): The database session. Defaults to Depends(get_db).
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_db).
 
     Returns:
     - dict: A message indicating the status of the email confirmation.
@@ -117,7 +137,7 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
 
 @router.post('/request_email')
 async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)):
+                        db: AsyncSession = Depends(get_db)):
     """
     Endpoint to request a confirmation email.
 
@@ -125,7 +145,7 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
     - body (RequestEmail): The request data containing the user's email.
     - background_tasks (BackgroundTasks): Background tasks to be executed.
     - request (Request): The request object.
-    - db (Session, optional): The database session. Defaults to Depends(get_db).
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_db).
 
     Returns:
     - dict: A message indicating the status of the email request.
@@ -1,61 +1,310 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from hw11.database.db import get_db
-from hw11.schemas import ContactModel, ContactResponse
+import io
+from datetime import date
+from typing import List, Literal
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response, Query, Header, UploadFile, File
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from hw11.database.db import get_db, get_read_db, get_write_db
+from hw11.schemas import (ContactModel, ContactResponse, ContactBatchCreate, ContactBatchUpdate,
+                          ContactBatchDelete, BatchItemResult, ImportReport, ContactChanges)
 from hw11.repository import contacts as repository_contacts
-from hw11.database.models import User
+from hw11.database.models import Contact, User
 from hw11.services.auth import auth_service
-from fastapi_limiter.depends import RateLimiter
+from hw11.services.rate_limit import RateLimit
+from hw11.services import importer, exporter
+from hw11.services.fast_json import FastJSONRoute, build_encoder
+from hw11.services.response_cache import contact_cache
 
-router = APIRouter(prefix='/contacts', tags=["contacts"])
+router = APIRouter(prefix='/contacts', tags=["contacts"], route_class=FastJSONRoute)
+batch_limiter = RateLimit(times=1000, seconds=60)
+encode_contacts = build_encoder(List[ContactResponse])
+encode_contact = build_encoder(ContactResponse)
+
+
+def _contact_etag(contact: Contact) -> str:
+    return f'"{contact.id}-{contact.version}"'
+
+
+def _if_match_versions(if_match: str | None, contact_id: int) -> List[int] | None:
+    """
+    Parse an If-Match header into the versions of a contact it accepts.
+
+    A contact's entity tag is its ID and version, quoted, e.g. "12-3". Comparison
+    is strong, so weak tags, tags of other contacts and malformed tags match nothing.
+
+    Parameters:
+    - if_match (str | None): The header value.
+    - contact_id (int): The ID of the contact being written.
+
+    Returns:
+    - List[int] | None: The accepted versions, or None if the header is absent or "*".
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = []
+    for tag in (tag.strip() for tag in if_match.split(",")):
+        if len(tag) < 2 or tag[0] != '"' or tag[-1] != '"':
+            continue
+        tag_id, _, version = tag[1:-1].partition("-")
+        if tag_id == str(contact_id) and version.isdigit():
+            versions.append(int(version))
+    return versions
 
 
 @router.get("/upcoming-birthdays", response_model=List[ContactResponse], description='No more than 5 requests per minute',
-            dependencies=[Depends(RateLimiter(times=5, seconds=60))])
-async def upcoming_birthdays(db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+            dependencies=[Depends(RateLimit(times=5, seconds=60))])
+async def upcoming_birthdays(request: Request, response: Response, days: int = Query(7, ge=0, le=366),
+                             db: AsyncSession = Depends(get_read_db),
+                             current_user: User = Depends(auth_service.get_current_user)):
     """
     Endpoint to retrieve upcoming birthdays of contacts for the current user.
 
+    Supports If-None-Match; the ETag changes with the contacts and with the date.
+
     Parameters:
-    - db (Session, optional): The database session. Defaults to Depends(get_db).
+    - request (Request): The request object.
+    - response (Response): The response object.
+    - days (int, optional): Size of the window after today, in days. Defaults to 7.
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_read_db).
     - current_user (User): The current user obtained from the access token.
 
     Returns:
-    - List[ContactResponse]: A list of contacts with upcoming birthdays.
+    - List[ContactResponse]: A list of contacts with upcoming birthdays, soonest first.
     """
-    contacts = await repository_contacts.upcoming_birthdays(current_user, db)
-    return contacts
+    today = date.today()
+
+    async def load():
+        return await repository_contacts.upcoming_birthdays(current_user, db, days, today)
+    return await contact_cache.respond(request, response, current_user, load, encode_contacts,
+                                       variant=today.isoformat())
 
 
 @router.get("/", response_model=List[ContactResponse], description='No more than 5 requests per minute',
-            dependencies=[Depends(RateLimiter(times=5, seconds=60))])
-async def read_contacts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+            dependencies=[Depends(RateLimit(times=5, seconds=60))])
+async def read_contacts(request: Request, response: Response, skip: int = Query(0, ge=0),
+                        limit: int = Query(100, ge=1, le=1000), cursor: str | None = None,
+                        order_by: Literal["id", "last_name"] = "id", db: AsyncSession = Depends(get_read_db),
+                        current_user: User = Depends(auth_service.get_current_user)):
     """
     Endpoint to retrieve contacts for the current user.
 
+    Without a cursor the endpoint pages with skip/limit. Passing cursor (empty for
+    the first page) switches to keyset pagination: the cursor of the next page is
+    returned in the X-Next-Cursor header, which is absent on the last page.
+    Supports If-None-Match; the ETag changes whenever the user's contacts do.
+
     Parameters:
+    - request (Request): The request object.
+    - response (Response): The response, used to set the X-Next-Cursor header.
     - skip (int, optional): Number of records to skip. Defaults to 0.
-    - limit (int, optional): Maximum number of records to return. Defaults to 100.
-    - db (Session, optional): The database session. Defaults to Depends(get_db).
+    - limit (int, optional): Maximum number of records to return, 1 to 1000. Defaults to 100.
+    - cursor (str, optional): The opaque cursor from X-Next-Cursor. Defaults to None.
+    - order_by (str, optional): Keyset ordering, "id" or "last_name". Defaults to "id".
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_read_db).
     - current_user (User): The current user obtained from the access token.
 
     Returns:
     - List[ContactResponse]: A list of contacts.
     """
-    contacts = await repository_contacts.get_contacts(skip, limit, current_user, db)
-    return contacts
+    async def load():
+        if cursor is None:
+            return await repository_contacts.get_contacts(skip, limit, current_user, db)
+        try:
+            contacts, next_cursor = await repository_contacts.get_contacts_page(limit, current_user, db, cursor,
+                                                                                order_by)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return contacts
+    return await contact_cache.respond(request, response, current_user, load, encode_contacts,
+                                       headers=("X-Next-Cursor",))
+
+
+@router.get("/search", response_model=List[ContactResponse], description='No more than 5 requests per minute',
+            dependencies=[Depends(RateLimit(times=5, seconds=60))])
+async def search_contacts(q: str = Query(min_length=1, max_length=100), skip: int = Query(0, ge=0),
+                          limit: int = Query(20, ge=1, le=100), db: AsyncSession = Depends(get_read_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Endpoint to search the contacts of the current user by name, email or phone.
+
+    Parameters:
+    - q (str): The search text.
+    - skip (int, optional): Number of records to skip. Defaults to 0.
+    - limit (int, optional): Maximum number of records to return. Defaults to 20.
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_read_db).
+    - current_user (User): The current user obtained from the access token.
+
+    Returns:
+    - List[ContactResponse]: The matching contacts, best matches first.
+    """
+    return await repository_contacts.search_contacts(q, current_user, db, skip, limit)
+
+
+@router.get("/changes", response_model=ContactChanges, description='No more than 5 requests per minute',
+            dependencies=[Depends(RateLimit(times=5, seconds=60))])
+async def contact_changes(since: str = "", limit: int = Query(1000, ge=1, le=5000), db: AsyncSession = Depends(get_read_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Endpoint to retrieve what changed in the contacts of the current user since a sync token.
+
+    Start with an empty since to get every contact, then pass the returned token
+    on the next call. While has_more is true the next page is waiting. A 410
+    response means the token is too old to resume and the client must start over.
+
+    Parameters:
+    - since (str, optional): The token from the previous call. Defaults to "" (full sync).
+    - limit (int, optional): Maximum number of changes to return. Defaults to 1000.
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_read_db).
+    - current_user (User): The current user obtained from the access token.
+
+    Returns:
+    - ContactChanges: The changed contacts, the IDs of deleted ones and the next token.
+    """
+    try:
+        return await repository_contacts.get_changes(current_user, db, since, limit)
+    except repository_contacts.StaleSyncToken:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE, detail="Sync token expired, sync from scratch")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+
+
+@router.post("/batch", response_model=List[BatchItemResult], status_code=status.HTTP_201_CREATED,
+             description='No more than 1000 contacts per minute')
+async def create_contacts(body: ContactBatchCreate, request: Request, response: Response,
+                          db: AsyncSession = Depends(get_write_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Endpoint to create many contacts for the current user in one transaction.
+
+    Parameters:
+    - body (ContactBatchCreate): The contacts data.
+    - request (Request): The request object.
+    - response (Response): The response object.
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_write_db).
+    - current_user (User): The current user obtained from the access token.
+
+    Returns:
+    - List[BatchItemResult]: The result for each contact, in request order.
+    """
+    await batch_limiter.hit(request, response, len(body.items))
+    return await repository_contacts.create_contacts(body.items, current_user, db)
+
+
+@router.put("/batch", response_model=List[BatchItemResult], description='No more than 1000 contacts per minute')
+async def update_contacts(body: ContactBatchUpdate, request: Request, response: Response,
+                          db: AsyncSession = Depends(get_write_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Endpoint to update many contacts of the current user in one transaction.
+
+    Parameters:
+    - body (ContactBatchUpdate): The contacts data with their IDs.
+    - request (Request): The request object.
+    - response (Response): The response object.
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_write_db).
+    - current_user (User): The current user obtained from the access token.
+
+    Returns:
+    - List[BatchItemResult]: The result for each contact, in request order.
+    """
+    await batch_limiter.hit(request, response, len(body.items))
+    return await repository_contacts.update_contacts(body.items, current_user, db)
+
+
+@router.delete("/batch", response_model=List[BatchItemResult], description='No more than 1000 contacts per minute')
+async def remove_contacts(body: ContactBatchDelete, request: Request, response: Response,
+                          db: AsyncSession = Depends(get_write_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Endpoint to remove many contacts of the current user in one transaction.
+
+    Parameters:
+    - body (ContactBatchDelete): The IDs of the contacts.
+    - request (Request): The request object.
+    - response (Response): The response object.
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_write_db).
+    - current_user (User): The current user obtained from the access token.
+
+    Returns:
+    - List[BatchItemResult]: The result for each ID, in request order.
+    """
+    await batch_limiter.hit(request, response, len(body.ids))
+    return await repository_contacts.remove_contacts(body.ids, current_user, db)
+
+
+@router.post("/import", response_model=ImportReport, description='No more than 2 requests per minute',
+             dependencies=[Depends(RateLimit(times=2, seconds=60))])
+async def import_contacts(file: UploadFile = File(), format: Literal["csv", "vcard"] | None = None,
+                          db: AsyncSession = Depends(get_write_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Endpoint to import an address book (CSV or vCard) for the current user.
+
+    The upload is spooled to a temporary file by the framework and parsed
+    incrementally, so large files are never held in memory.
+
+    Parameters:
+    - file (UploadFile): The CSV (first_name,last_name,email,phone,birthday header) or vCard file.
+    - format (str, optional): "csv" or "vcard". Guessed from the file name when omitted.
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_write_db).
+    - current_user (User): The current user obtained from the access token.
+
+    Returns:
+    - ImportReport: The counts, duration, throughput and the first rejected rows.
+    """
+    fmt = format or importer.detect_format(file.filename, file.content_type)
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        return await importer.import_contacts(stream, fmt, current_user, db)
+    finally:
+        stream.detach()
+
+
+@router.get("/export", response_class=StreamingResponse, description='No more than 2 requests per minute',
+            dependencies=[Depends(RateLimit(times=2, seconds=60))])
+async def export_contacts(format: Literal["ndjson", "csv"] = "ndjson", db: AsyncSession = Depends(get_read_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Endpoint to download all contacts of the current user as NDJSON or CSV.
+
+    The response is streamed from a server-side cursor, so memory use does not
+    grow with the number of contacts.
+
+    Parameters:
+    - format (str, optional): "ndjson" or "csv". Defaults to "ndjson".
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_read_db).
+    - current_user (User): The current user obtained from the access token.
+
+    Returns:
+    - StreamingResponse: The contacts file.
+    """
+    return StreamingResponse(
+        exporter.export_contacts(format, current_user, db.bind),
+        media_type=exporter.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="contacts.{format}"'},
+    )
 
 
 @router.get("/{contact_id}", response_model=ContactResponse, description='No more than 5 requests per minute',
-            dependencies=[Depends(RateLimiter(times=5, seconds=60))])
-async def find_contact(db: Session = Depends(get_db),
+            dependencies=[Depends(RateLimit(times=5, seconds=60))])
+async def find_contact(contact_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db),
                        current_user: User = Depends(auth_service.get_current_user), first_name: str = None, last_name: str = None, email: str = None):
     """
-    Endpoint to find a contact by ID, first name, last name, or email for the current user.
+    Endpoint to retrieve a contact of the current user by ID, optionally also matching first name, last name, or email.
+
+    The ETag is the contact's ID and version, the same tag PUT and DELETE accept
+    in If-Match. Supports If-None-Match.
 
     Parameters:
-    - db (Session, optional): The database session. Defaults to Depends(get_db).
+    - contact_id (int): The ID of the contact.
+    - request (Request): The request object.
+    - response (Response): The response object.
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_db).
     - current_user (User): The current user obtained from the access token.
     - first_name (str, optional): The first name of the contact.
     - last_name (str, optional): The last name of the contact.
@@ -64,68 +313,96 @@ async def find_contact(db: Session = Depends(get_db),
     Returns:
     - ContactResponse: The retrieved contact.
     """
-    contact = await repository_contacts.get_contact(db, current_user, first_name, last_name, email)
-    if contact is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-    return contact
+    async def load():
+        contact = await repository_contacts.get_contact(db, current_user, first_name, last_name, email, contact_id)
+        if contact is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+        return contact
+    return await contact_cache.respond(request, response, current_user, load, encode_contact,
+                                       entity_tag=_contact_etag)
 
 
 @router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED, description='No more than 3 requests per minute',
-            dependencies=[Depends(RateLimiter(times=3, seconds=60))])
-async def create_contact(body: ContactModel, db: Session = Depends(get_db),
+            dependencies=[Depends(RateLimit(times=3, seconds=60))])
+async def create_contact(body: ContactModel, response: Response, db: AsyncSession = Depends(get_write_db),
                          current_user: User = Depends(auth_service.get_current_user)):
     """
     Endpoint to create a new contact for the current user.
 
     Parameters:
     - body (ContactModel): The contact data.
-    - db (Session, optional): The database session. Defaults to Depends(get_db).
+    - response (Response): The response object, for the ETag.
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_write_db).
     - current_user (User): The current user obtained from the access token.
 
     Returns:
     - ContactResponse: The created contact.
     """
-    return await repository_contacts.create_contact(body, current_user, db)
+    contact = await repository_contacts.create_contact(body, current_user, db)
+    response.headers["ETag"] = _contact_etag(contact)
+    return contact
 
 
 @router.put("/{contact_id}", response_model=ContactResponse, description='No more than 3 requests per minute',
-            dependencies=[Depends(RateLimiter(times=3, seconds=60))])
-async def update_contact(body: ContactModel, contact_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+            dependencies=[Depends(RateLimit(times=3, seconds=60))])
+async def update_contact(body: ContactModel, contact_id: int, response: Response,
+                         if_match: str | None = Header(None), db: AsyncSession = Depends(get_write_db),
+                         current_user: User = Depends(auth_service.get_current_user)):
     """
     Endpoint to update a contact for the current user.
 
+    With If-Match set to the contact's ETag, the update only happens
+    if nobody has changed the contact since; otherwise the answer is 412.
+
     Parameters:
     - body (ContactModel): The updated contact data.
     - contact_id (int): The ID of the contact to update.
-    - db (Session, optional): The database session. Defaults to Depends(get_db).
+    - response (Response): The response object, for the ETag.
+    - if_match (str, optional): The If-Match header.
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_write_db).
     - current_user (User): The current user obtained from the access token.
 
     Returns:
     - ContactResponse: The updated contact.
     """
-    contact = await repository_contacts.update_contact(contact_id, body, current_user, db)
+    try:
+        contact = await repository_contacts.update_contact(contact_id, body, current_user, db,
+                                                           _if_match_versions(if_match, contact_id))
+    except repository_contacts.StaleVersion:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Contact has been changed, fetch it again")
     if contact is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    response.headers["ETag"] = _contact_etag(contact)
     return contact
 
 
 @router.delete("/{contact_id}", response_model=ContactResponse, description='No more than 3 requests per minute',
-            dependencies=[Depends(RateLimiter(times=3, seconds=60))])
-async def remove_contact(contact_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+            dependencies=[Depends(RateLimit(times=3, seconds=60))])
+async def remove_contact(contact_id: int, if_match: str | None = Header(None), db: AsyncSession = Depends(get_write_db),
+                         current_user: User = Depends(auth_service.get_current_user)):
     """
     Endpoint to remove a contact for the current user.
 
+    With If-Match set to the contact's ETag, the contact is only
+    removed if nobody has changed it since; otherwise the answer is 412.
+
     Parameters:
     - contact_id (int): The ID of the contact to remove.
-    - db (Session, optional): The database session. Defaults to Depends(get_db).
+    - if_match (str, optional): The If-Match header.
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_write_db).
     - current_user (User): The current user obtained from the access token.
 
     Returns:
     - ContactResponse: The removed contact.
     """
-    contact = await repository_contacts.remove_contact(contact_id, current_user, db)
+    try:
+        contact = await repository_contacts.remove_contact(contact_id, current_user, db, _if_match_versions(if_match, contact_id))
+    except repository_contacts.StaleVersion:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Contact has been changed, fetch it again")
     if contact is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
@@ -1,15 +1,15 @@
-from fastapi import APIRouter, Depends, UploadFile, File
-from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
-from hw11.database.db import get_db
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from hw11.database.db import get_write_db
 from hw11.database.models import User
 from hw11.repository import users as repository_users
 from hw11.services.auth import auth_service
+from hw11.services import avatars
+from hw11.services.fast_json import FastJSONRoute
 from hw11.conf.config import settings
 from hw11.schemas import UserDb
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=FastJSONRoute)
 
 
 @router.get("/me/", response_model=UserDb)
@@ -26,29 +26,30 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
     return current_user
 
 
-@router.patch('/avatar', response_model=UserDb)
-async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
-                             db: Session = Depends(get_db)):
+AVATAR_UPLOAD = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}}}}}}}
+
+
+@router.patch('/avatar', response_model=UserDb, openapi_extra=AVATAR_UPLOAD,
+              description=f'Images up to {settings.avatar_max_bytes} bytes')
+async def update_avatar_user(request: Request, current_user: User = Depends(auth_service.get_current_user),
+                             db: AsyncSession = Depends(get_write_db)):
     """
     Endpoint to update the avatar of the current user.
 
+    The image is read from the "file" field of a multipart body, which is
+    refused as soon as it grows past avatar_max_bytes. It is resized off the
+    event loop and stored under its content hash.
+
     Parameters:
-    - file (UploadFile): The image file to upload as the avatar.
+    - request (Request): The request carrying the image file.
     - current_user (User): The current user obtained from the access token.
-    - db (Session, optional): The database session. Defaults to Depends(get_db).
+    - db (AsyncSession, optional): The database session. Defaults to Depends(get_write_db).
 
     Returns:
     - UserDb: The updated user with the new avatar.
     """
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-    r = cloudinary.uploader.upload(file.file, public_id=f'NotesApp/{current_user.username}', overwrite=True)
-    src_url = cloudinary.CloudinaryImage(f'NotesApp/{current_user.username}')\
-                        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
+    data = await avatars.read_upload(request, settings.avatar_max_bytes)
+    src_url = await avatars.store_avatar(data)
     user = await repository_users.update_avatar(current_user.email, src_url, db)
     return user
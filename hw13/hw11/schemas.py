@@ -1,5 +1,9 @@
 from datetime import date, datetime
-from pydantic import BaseModel, Field, EmailStr
+from typing import List, Literal
+from pydantic import BaseModel, Field, EmailStr, model_validator
+from hw11.services.gravatar import gravatar_url
+
+BATCH_MAX_ITEMS = 500
 
 
 class ContactModel(BaseModel):
@@ -28,13 +32,119 @@ class ContactResponse(ContactModel):
 
     Attributes:
     - id (int): The unique identifier of the contact.
+    - version (int): The version of the contact, to send back in If-Match.
     """
     id: int
+    version: int
 
     class ConfigDict:
         from_attributes = True
 
 
+class ContactUpdateItem(ContactModel):
+    """
+    Pydantic model representing one contact of a batch update.
+
+    Inherits from ContactModel.
+
+    Attributes:
+    - id (int): The unique identifier of the contact to update.
+    """
+    id: int
+
+
+class ContactBatchCreate(BaseModel):
+    """
+    Pydantic model representing a batch of contacts to create.
+
+    Attributes:
+    - items (List[ContactModel]): The contacts (1 to BATCH_MAX_ITEMS).
+    """
+    items: List[ContactModel] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
+class ContactBatchUpdate(BaseModel):
+    """
+    Pydantic model representing a batch of contacts to update.
+
+    Attributes:
+    - items (List[ContactUpdateItem]): The contacts with their IDs (1 to BATCH_MAX_ITEMS).
+    """
+    items: List[ContactUpdateItem] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
+class ContactBatchDelete(BaseModel):
+    """
+    Pydantic model representing a batch of contacts to delete.
+
+    Attributes:
+    - ids (List[int]): The IDs of the contacts (1 to BATCH_MAX_ITEMS).
+    """
+    ids: List[int] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
+class BatchItemResult(BaseModel):
+    """
+    Pydantic model representing the outcome for one item of a batch.
+
+    Attributes:
+    - index (int): The position of the item in the request.
+    - status (str): "created", "updated", "deleted" or "not_found".
+    - contact (ContactResponse | None): The contact, unless it was not found.
+    """
+    index: int
+    status: Literal["created", "updated", "deleted", "not_found"]
+    contact: ContactResponse | None = None
+
+
+class ContactChanges(BaseModel):
+    """
+    Pydantic model representing the changes to a user's contacts since a sync token.
+
+    Attributes:
+    - changed (List[ContactResponse]): Contacts created or updated since the token, oldest change first.
+    - deleted (List[int]): IDs of contacts deleted since the token.
+    - token (str): The token to pass as since on the next call.
+    - has_more (bool): Whether more changes are waiting; call again with the new token right away.
+    """
+    changed: List[ContactResponse]
+    deleted: List[int]
+    token: str
+    has_more: bool
+
+
+class ImportReject(BaseModel):
+    """
+    Pydantic model representing a row rejected by a contacts import.
+
+    Attributes:
+    - line (int): The line of the source file where the row starts.
+    - error (str): Why the row was rejected.
+    """
+    line: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    """
+    Pydantic model representing the outcome of a contacts import.
+
+    Attributes:
+    - total (int): The number of rows read.
+    - imported (int): The number of contacts written.
+    - rejected (int): The number of rows rejected.
+    - seconds (float): The duration of the import.
+    - rows_per_second (float): The import throughput.
+    - rejects (List[ImportReject]): The first rejected rows.
+    """
+    total: int = 0
+    imported: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+    rows_per_second: float = 0.0
+    rejects: List[ImportReject] = []
+
+
 class UserModel(BaseModel):
     """
     Pydantic model representing user data used for user creation.
@@ -58,13 +168,19 @@ class UserDb(BaseModel):
     - username (str): The username of the user.
     - email (str): The email address of the user.
     - created_at (datetime): The timestamp when the user was created.
-    - avatar (str): The URL of the user's avatar.
+    - avatar (str): The URL of the user's avatar; the Gravatar URL of the email if none was uploaded.
     """
     id: int
     username: str
     email: str
     created_at: datetime
-    avatar: str
+    avatar: str | None = None
+
+    @model_validator(mode="after")
+    def default_avatar(self):
+        if not self.avatar:
+            self.avatar = gravatar_url(self.email)
+        return self
 
     class ConfigDict:
         from_attributes = True
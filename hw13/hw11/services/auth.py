@@ -1,31 +1,68 @@
+import time
 from typing import Optional
 
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from hw11.database.db import get_db
+from hw11.database.db import get_read_db
 from hw11.repository import users as repository_users
+from hw11.services.cache import user_cache
+from hw11.services.hashing import HashingPool
+from hw11.services.metrics import Counter, Gauge, Histogram
+from hw11.services.tokens import RefreshTokenStore
 from hw11.conf.config import settings
 
+password_seconds = Histogram("auth_password_seconds",
+                             "Time to hash or verify a password, waiting for a hashing thread included.",
+                             ("operation",))
+auth_failures = Counter("auth_failures_total", "Requests refused because of their access token.", ("reason",))
+
 
 class Auth:
     """
     Class containing authentication related methods.
     """
 
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    _pwd_context = None
+    hash_pool = HashingPool(settings.password_hash_workers, settings.password_hash_queue)
+    REFRESH_TOKEN_EXPIRE = timedelta(days=7)
+    refresh_tokens = RefreshTokenStore(ttl=int(REFRESH_TOKEN_EXPIRE.total_seconds()))
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-    def verify_password(self, plain_password, hashed_password):
+    @property
+    def pwd_context(self):
+        """
+        The passlib context, created on first use: importing passlib is a
+        noticeable part of the startup time, and most requests only check tokens.
+        """
+        if self._pwd_context is None:
+            from passlib.context import CryptContext
+            self._pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                                             bcrypt__rounds=settings.bcrypt_rounds)
+        return self._pwd_context
+
+    @pwd_context.setter
+    def pwd_context(self, context):
+        self._pwd_context = context
+
+    async def _hash(self, operation: str, func, *args):
+        started = time.perf_counter()
+        try:
+            return await self.hash_pool.run(func, *args)
+        finally:
+            password_seconds.observe(time.perf_counter() - started, operation)
+
+    async def verify_password(self, plain_password, hashed_password):
         """
         Verifies if the provided plain password matches the hashed password.
 
+        Hashing runs in hash_pool so it does not block the event loop.
+
         Parameters:
         - plain_password (str): The plain password.
         - hashed_password (str): The hashed password.
@@ -33,19 +70,34 @@ class Auth:
         Returns:
         - bool: True if passwords match, False otherwise.
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return await self._hash("verify", self.pwd_context.verify, plain_password, hashed_password)
 
-    def get_password_hash(self, password: str):
+    async def verify_and_update_password(self, plain_password, hashed_password):
+        """
+        Verifies a password and rehashes it if the hash uses outdated settings (e.g. bcrypt_rounds changed).
+
+        Parameters:
+        - plain_password (str): The plain password.
+        - hashed_password (str): The hashed password.
+
+        Returns:
+        - Tuple[bool, str | None]: Whether the passwords match, and the new hash to store or None.
+        """
+        return await self._hash("verify", self.pwd_context.verify_and_update, plain_password, hashed_password)
+
+    async def get_password_hash(self, password: str):
         """
         Generates the hash for the provided password.
 
+        Hashing runs in hash_pool so it does not block the event loop.
+
         Parameters:
         - password (str): The password to hash.
 
         Returns:
         - str: The hashed password.
         """
-        return self.pwd_context.hash(password)
+        return await self._hash("hash", self.pwd_context.hash, password)
 
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
         """
@@ -84,22 +136,22 @@ class Auth:
         if expires_delta:
             expire = datetime.utcnow() + timedelta(seconds=expires_delta)
         else:
-            expire = datetime.utcnow() + timedelta(days=7)
+            expire = datetime.utcnow() + self.REFRESH_TOKEN_EXPIRE
         to_encode.update(
             {"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"})
         encoded_refresh_token = jwt.encode(
             to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
         return encoded_refresh_token
 
-    async def decode_refresh_token(self, refresh_token: str):
+    async def decode_refresh_claims(self, refresh_token: str):
         """
-        Decodes the provided refresh token and retrieves the email from its payload.
+        Decodes the provided refresh token and returns its whole payload.
 
         Parameters:
         - refresh_token (str): The refresh token to decode.
 
         Returns:
-        - str: The email address extracted from the token payload.
+        - dict: The payload, including the token family ("fid") and id ("jti").
 
         Raises:
         - HTTPException: If the token cannot be validated.
@@ -108,21 +160,41 @@ class Auth:
             payload = jwt.decode(
                 refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             if payload['scope'] == 'refresh_token':
-                email = payload['sub']
-                return email
+                return payload
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid scope for token')
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail='Could not validate credentials')
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    async def issue_tokens(self, email: str, family: Optional[str] = None, jti: Optional[str] = None):
+        """
+        Creates an access token and a refresh token belonging to a token family.
+
+        Parameters:
+        - email (str): The subject of both tokens.
+        - family (Optional[str]): The family of the refresh token; a new one is started if omitted.
+        - jti (Optional[str]): The id of the refresh token, required together with family.
+
+        Returns:
+        - dict: The access and refresh tokens in the TokenModel shape.
+        """
+        if family is None:
+            family, jti = await self.refresh_tokens.create_family(email)
+        access_token = await self.create_access_token(data={"sub": email})
+        refresh_token = await self.create_refresh_token(data={"sub": email, "fid": family, "jti": jti})
+        return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)):
         """
         Retrieves the current user based on the provided access token.
 
+        The user is served from user_cache when possible, so most requests do not
+        query the database.
+
         Parameters:
         - token (str): The access token.
-        - db (Session): The database session.
+        - db (AsyncSession): The database session.
 
         Returns:
         - User: The current user.
@@ -143,15 +215,23 @@ class Auth:
             if payload['scope'] == 'access_token':
                 email = payload["sub"]
                 if email is None:
+                    auth_failures.inc("invalid_token")
                     raise credentials_exception
             else:
+                auth_failures.inc("wrong_scope")
                 raise credentials_exception
         except JWTError as e:
+            auth_failures.inc("invalid_token")
             raise credentials_exception
 
+        user = await user_cache.get(email)
+        if user is not None:
+            return user
         user = await repository_users.get_user_by_email(email, db)
         if user is None:
+            auth_failures.inc("unknown_user")
             raise credentials_exception
+        await user_cache.set(user)
         return user
 
     def create_email_token(self, data: dict):
@@ -196,3 +276,4 @@ class Auth:
 
 
 auth_service = Auth()
+Gauge("auth_password_pending", "Password hashes running or waiting for a thread.", lambda: Auth.hash_pool.pending)
@@ -0,0 +1,288 @@
+import hashlib
+import io
+import os
+import tempfile
+from pathlib import Path
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.staticfiles import StaticFiles
+from PIL import Image, ImageOps, UnidentifiedImageError
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.requests import Request
+
+from hw11.conf.config import settings
+from hw11.services.hashing import HashingPool
+
+# Room for the multipart boundaries and part headers around the file itself.
+MULTIPART_OVERHEAD = 16 * 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+FORMAT = "webp"
+
+# Pillow refuses images with more than twice this many pixels (decompression bombs).
+Image.MAX_IMAGE_PIXELS = 40_000_000
+
+
+class LocalStorage:
+    """
+    Stores avatars in a directory served by the app under url_prefix.
+    """
+
+    def __init__(self, root: str, url_prefix: str):
+        self.root = Path(root)
+        self.url_prefix = url_prefix.rstrip("/")
+
+    def _write(self, name: str, data: bytes) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.root / name)
+
+    async def exists(self, name: str) -> bool:
+        """
+        Check whether a file is already stored.
+
+        Parameters:
+        - name (str): The file name.
+
+        Returns:
+        - bool: True if the file exists.
+        """
+        return await run_in_threadpool(os.path.exists, self.root / name)
+
+    async def save(self, name: str, data: bytes) -> None:
+        """
+        Store a file atomically.
+
+        Parameters:
+        - name (str): The file name.
+        - data (bytes): The content.
+        """
+        await run_in_threadpool(self._write, name, data)
+
+    def url(self, name: str) -> str:
+        """
+        Return the public URL of a file.
+
+        Parameters:
+        - name (str): The file name.
+
+        Returns:
+        - str: The URL.
+        """
+        return f"{self.url_prefix}/{name}"
+
+
+class CloudinaryStorage:
+    """
+    Stores avatars on Cloudinary. The SDK is synchronous, so uploads run in the thread pool.
+
+    The SDK and httpx are imported here rather than at module level, so workers
+    storing avatars locally never load them.
+    """
+
+    def __init__(self, folder: str = "NotesApp/avatars"):
+        import cloudinary
+
+        self.folder = folder
+        cloudinary.config(
+            cloud_name=settings.cloudinary_name,
+            api_key=settings.cloudinary_api_key,
+            api_secret=settings.cloudinary_api_secret,
+            secure=True
+        )
+
+    def _public_id(self, name: str) -> str:
+        return f"{self.folder}/{name.rsplit('.', 1)[0]}"
+
+    async def exists(self, name: str) -> bool:
+        """
+        Check whether a file is already stored, asking the CDN rather than the rate-limited Admin API.
+
+        Parameters:
+        - name (str): The file name.
+
+        Returns:
+        - bool: True if the file exists.
+        """
+        import httpx
+
+        async with httpx.AsyncClient(timeout=5) as client:
+            try:
+                response = await client.head(self.url(name))
+            except httpx.HTTPError:
+                return False
+        return response.status_code == 200
+
+    async def save(self, name: str, data: bytes) -> None:
+        """
+        Upload a file.
+
+        Parameters:
+        - name (str): The file name.
+        - data (bytes): The content.
+        """
+        import cloudinary.uploader
+
+        await run_in_threadpool(cloudinary.uploader.upload, data, public_id=self._public_id(name),
+                                overwrite=False, resource_type="image")
+
+    def url(self, name: str) -> str:
+        """
+        Return the public URL of a file.
+
+        Parameters:
+        - name (str): The file name.
+
+        Returns:
+        - str: The URL.
+        """
+        import cloudinary
+
+        return cloudinary.CloudinaryImage(self._public_id(name)).build_url(format=FORMAT)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    Static files whose names never change content, so browsers and proxies may cache them for a year.
+    """
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE
+        return response
+
+
+def create_storage():
+    """
+    Build the storage selected by settings.avatar_storage ("local" or "cloudinary").
+
+    Returns:
+    - LocalStorage | CloudinaryStorage: The storage.
+    """
+    if settings.avatar_storage == "cloudinary":
+        return CloudinaryStorage()
+    return LocalStorage(settings.avatar_dir, settings.avatar_url_prefix)
+
+
+storage = create_storage()
+image_pool = HashingPool(settings.image_workers, settings.image_queue, thread_name_prefix="image")
+
+
+async def read_upload(request: Request, limit: int) -> bytes:
+    """
+    Read the "file" field of a multipart request, refusing bodies over the limit while they stream in.
+
+    Parameters:
+    - request (Request): The request with a multipart/form-data body.
+    - limit (int): The maximum file size in bytes.
+
+    Returns:
+    - bytes: The file content.
+
+    Raises:
+    - HTTPException: 413 if the upload is too large, 400 if there is no file field.
+    """
+    too_large = HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                              detail=f"Avatar must not exceed {limit} bytes")
+    body_limit = limit + MULTIPART_OVERHEAD
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > body_limit:
+        raise too_large
+
+    async def limited():
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > body_limit:
+                raise too_large
+            yield chunk
+
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected multipart/form-data")
+    try:
+        form = await MultiPartParser(request.headers, limited(), max_files=1, max_fields=0).parse()
+    except MultiPartException as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=err.message)
+    try:
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No file field")
+        data = await file.read(limit + 1)
+    finally:
+        await form.close()
+    if len(data) > limit:
+        raise too_large
+    return data
+
+
+def render_sizes(data: bytes, sizes: tuple) -> list:
+    """
+    Decode an image and render square crops of it. Runs in image_pool.
+
+    Parameters:
+    - data (bytes): The uploaded image.
+    - sizes (tuple): Edge lengths in pixels, largest first.
+
+    Returns:
+    - list[bytes]: The encoded images, one per size.
+
+    Raises:
+    - ValueError: If the data is not a supported image.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", (sizes[0] * 2, sizes[0] * 2))
+            image = ImageOps.exif_transpose(image).convert("RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as err:
+        raise ValueError(f"Not a supported image: {err}")
+    rendered = []
+    for size in sizes:
+        out = io.BytesIO()
+        ImageOps.fit(image, (size, size), Image.LANCZOS).save(out, FORMAT, quality=85)
+        rendered.append(out.getvalue())
+    return rendered
+
+
+def avatar_names(digest: str) -> tuple:
+    """
+    Return the file names of an avatar and its thumbnail.
+
+    Parameters:
+    - digest (str): The content hash of the upload.
+
+    Returns:
+    - tuple[str, str]: The avatar and thumbnail names.
+    """
+    return f"{digest}_{settings.avatar_size}.{FORMAT}", f"{digest}_{settings.avatar_thumbnail_size}.{FORMAT}"
+
+
+async def store_avatar(data: bytes) -> str:
+    """
+    Resize an uploaded image and store it, unless the same image is already stored.
+
+    Files are named by the SHA-256 of the upload, so identical uploads are
+    processed once and every URL points at content that never changes.
+
+    Parameters:
+    - data (bytes): The uploaded image.
+
+    Returns:
+    - str: The URL of the avatar.
+
+    Raises:
+    - HTTPException: 400 if the data is not an image, 503 if the image pool is full.
+    """
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    avatar, thumbnail = avatar_names(digest)
+    if not await storage.exists(avatar):
+        try:
+            images = await image_pool.run(render_sizes, data, (settings.avatar_size, settings.avatar_thumbnail_size))
+        except ValueError as err:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+        # the thumbnail first: once the avatar exists the pair counts as stored
+        await storage.save(thumbnail, images[1])
+        await storage.save(avatar, images[0])
+    return storage.url(avatar)
@@ -0,0 +1,143 @@
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Optional
+
+from redis.exceptions import RedisError
+
+from hw11.conf.config import settings
+from hw11.database.models import User
+
+# Columns needed to act on behalf of a user. Secrets (password hash,
+# refresh token) are never cached.
+PRINCIPAL_FIELDS = ("id", "username", "email", "created_at", "avatar", "confirmed")
+
+
+class UserCache:
+    """
+    Two-tier cache of authenticated users keyed by email (the token subject).
+
+    The first tier is an in-process LRU with a short TTL, the second an optional
+    Redis tier shared by all workers. Cached users are rebuilt as transient User
+    objects holding PRINCIPAL_FIELDS only. Writes that change a user must call
+    invalidate(); other workers may serve the old data until their local TTL ends.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30, redis_ttl: int = 300,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.redis_ttl = redis_ttl
+        self.clock = clock
+        self.redis = None
+        self._local: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def _key(email: str) -> str:
+        return f"user-cache:{email}"
+
+    @staticmethod
+    def _snapshot(user: User) -> dict:
+        data = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+        if data["created_at"] is not None:
+            data["created_at"] = data["created_at"].isoformat()
+        return data
+
+    @staticmethod
+    def _restore(data: dict) -> User:
+        data = dict(data)
+        if data["created_at"] is not None:
+            data["created_at"] = datetime.fromisoformat(data["created_at"])
+        return User(**data)
+
+    def _remember(self, email: str, data: dict) -> None:
+        self._local[email] = (self.clock() + self.ttl, data)
+        self._local.move_to_end(email)
+        while len(self._local) > self.maxsize:
+            self._local.popitem(last=False)
+
+    async def get(self, email: str) -> Optional[User]:
+        """
+        Look a user up in the local tier, then in Redis.
+
+        Parameters:
+        - email (str): The email of the user.
+
+        Returns:
+        - User | None: A transient copy of the user, or None on a miss.
+        """
+        entry = self._local.get(email)
+        if entry is not None:
+            expires, data = entry
+            if expires > self.clock():
+                self._local.move_to_end(email)
+                self.local_hits += 1
+                return self._restore(data)
+            del self._local[email]
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(self._key(email))
+            except RedisError:
+                self.redis_errors += 1
+                raw = None
+            if raw is not None:
+                data = json.loads(raw)
+                self._remember(email, data)
+                self.redis_hits += 1
+                return self._restore(data)
+        self.misses += 1
+        return None
+
+    async def set(self, user: User) -> None:
+        """
+        Store a user in both tiers.
+
+        Parameters:
+        - user (User): The user loaded from the database.
+        """
+        data = self._snapshot(user)
+        self._remember(user.email, data)
+        if self.redis is not None:
+            try:
+                await self.redis.set(self._key(user.email), json.dumps(data), ex=self.redis_ttl)
+            except RedisError:
+                self.redis_errors += 1
+
+    async def invalidate(self, email: str) -> None:
+        """
+        Drop a user from both tiers after it has been changed.
+
+        Parameters:
+        - email (str): The email of the user.
+        """
+        self._local.pop(email, None)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(self._key(email))
+            except RedisError:
+                self.redis_errors += 1
+
+    def clear(self) -> None:
+        """
+        Empty the local tier and reset the counters.
+        """
+        self._local.clear()
+        self.local_hits = self.redis_hits = self.misses = self.redis_errors = 0
+
+    def stats(self) -> dict:
+        """
+        Return the cache counters.
+
+        Returns:
+        - dict: local_hits, redis_hits, misses, redis_errors and the local size.
+        """
+        return {"local_hits": self.local_hits, "redis_hits": self.redis_hits, "misses": self.misses,
+                "redis_errors": self.redis_errors, "size": len(self._local)}
+
+
+user_cache = UserCache(settings.user_cache_size, settings.user_cache_ttl, settings.user_cache_redis_ttl)
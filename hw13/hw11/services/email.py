@@ -1,46 +1,107 @@
+import json
+import uuid
+from email.message import EmailMessage
+from email.utils import formataddr
+from functools import lru_cache
 from pathlib import Path
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+
 from pydantic import EmailStr
+
 from hw11.services.auth import auth_service
+from hw11.services.mailer import MailWorker, MemoryMailQueue, RedisMailQueue, SMTPPool
+from hw11.services.metrics import Counter
 from hw11.conf.config import settings
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME="Desired Name",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-)
+MAIL_FROM_NAME = "Desired Name"
+
+emails_queued = Counter("emails_queued_total", "Emails queued for delivery.", ("template",))
+
+
+@lru_cache(maxsize=None)
+def templates():
+    """
+    The Jinja environment of the mail templates, built on first render, so web
+    workers that only queue mail never import Jinja.
+
+    Compiled templates stay in the environment's cache; auto_reload=False skips
+    the modification-time check on every render.
+
+    Returns:
+    - Environment: The environment.
+    """
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+    return Environment(
+        loader=FileSystemLoader(Path(__file__).parent / 'templates'),
+        autoescape=select_autoescape(),
+        auto_reload=False,
+    )
+
+
+def render_message(job: dict) -> EmailMessage:
+    """
+    Builds the message for a queued mail job.
+
+    Parameters:
+    - job (dict): The job with "to", "subject", "template" and the template "body".
+
+    Returns:
+    - EmailMessage: The message ready to be sent.
+    """
+    message = EmailMessage()
+    message["From"] = formataddr((MAIL_FROM_NAME, settings.mail_from))
+    message["To"] = job["to"]
+    message["Subject"] = job["subject"]
+    message.set_content(templates().get_template(job["template"]).render(**job["body"]), subtype="html")
+    return message
+
+
+def create_queue():
+    """
+    Creates the mail queue selected by settings.mail_queue ("redis" or "memory").
+
+    Returns:
+    - RedisMailQueue | MemoryMailQueue: The queue; a Redis queue gets its client at startup.
+    """
+    if settings.mail_queue == "memory":
+        return MemoryMailQueue()
+    return RedisMailQueue()
+
+
+def create_worker(queue=None) -> MailWorker:
+    """
+    Creates a worker delivering from the mail queue over a pool of SMTP connections.
+
+    Parameters:
+    - queue (optional): The queue to deliver from. Defaults to mail_queue.
+
+    Returns:
+    - MailWorker: The worker; start it with run().
+    """
+    pool = SMTPPool(settings.mail_pool_size, hostname=settings.mail_server, port=settings.mail_port,
+                    username=settings.mail_username, password=settings.mail_password, use_tls=True,
+                    validate_certs=True)
+    return MailWorker(queue or mail_queue, pool, render_message, batch_size=settings.mail_batch_size,
+                      max_attempts=settings.mail_max_attempts, retry_base=settings.mail_retry_base)
+
+
+mail_queue = create_queue()
+
 
 async def send_email(email: EmailStr, username: str, host: str):
     """
-    Sends an email for email verification.
+    Queues an email for email verification.
+
+    The message is delivered by a MailWorker, so the caller never waits for SMTP.
 
     Parameters:
     - email (EmailStr): The email address of the recipient.
     - username (str): The username of the recipient.
     - host (str): The base URL of the application.
-
-    Raises:
-    - ConnectionErrors: If there is an error connecting to the mail server.
-    """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+    """
+    token_verification = auth_service.create_email_token({"sub": email})
+    job = {"id": uuid.uuid4().hex, "to": email, "subject": "Confirm your email",
+           "template": "email_template.html", "attempts": 0,
+           "body": {"host": str(host), "username": username, "token": token_verification}}
+    await mail_queue.push(json.dumps(job))
+    emails_queued.inc(job["template"])
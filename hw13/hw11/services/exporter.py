@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from hw11.database.models import User
+from hw11.repository import contacts as repository_contacts
+
+EXPORT_FIELDS = tuple(column.key for column in repository_contacts.EXPORT_COLUMNS)
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def encode_ndjson(rows: Sequence[Row]) -> bytes:
+    """
+    Encode rows as newline-delimited JSON objects.
+
+    Parameters:
+    - rows (Sequence[Row]): Rows with the EXPORT_FIELDS columns.
+
+    Returns:
+    - bytes: One JSON object per line.
+    """
+    lines = [json.dumps({"id": r[0], "first_name": r[1], "last_name": r[2], "email": r[3], "phone": r[4],
+                         "birthday": r[5].isoformat()}, ensure_ascii=False) for r in rows]
+    lines.append("")
+    return "\n".join(lines).encode()
+
+
+def encode_csv(rows: Sequence[Row], header: bool = False) -> bytes:
+    """
+    Encode rows as CSV.
+
+    Parameters:
+    - rows (Sequence[Row]): Rows with the EXPORT_FIELDS columns.
+    - header (bool, optional): Whether to start with the header line. Defaults to False.
+
+    Returns:
+    - bytes: The CSV lines.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def export_contacts(fmt: str, user: User, bind: AsyncEngine, batch_size: int = 1000) -> AsyncIterator[bytes]:
+    """
+    Produce the export of a user's contacts chunk by chunk, one chunk per database batch.
+
+    The generator opens its own session on bind because it is consumed by a
+    StreamingResponse, after the request's session has been closed.
+
+    Parameters:
+    - fmt (str): "ndjson" or "csv".
+    - user (User): The user whose contacts are being exported.
+    - bind (AsyncEngine): The engine to read from.
+    - batch_size (int, optional): Rows per batch. Defaults to 1000.
+
+    Yields:
+    - bytes: The next chunk of the file.
+    """
+    if fmt == "csv":
+        yield encode_csv([], header=True)
+    async with AsyncSession(bind) as db:
+        async for rows in repository_contacts.stream_contacts(user, db, batch_size):
+            yield encode_csv(rows) if fmt == "csv" else encode_ndjson(rows)
@@ -0,0 +1,123 @@
+import functools
+import inspect
+import typing
+from datetime import date, datetime
+from typing import Any, Callable, Optional
+
+import orjson
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import Response
+
+# Field types orjson writes exactly like pydantic's JSON mode.
+PLAIN_TYPES = {int, str, float, bool, date, datetime, type(None)}
+
+
+class JSONBytesResponse(Response):
+    """
+    A response whose content is JSON that is already encoded.
+    """
+    media_type = "application/json"
+
+
+def _is_plain_model(model) -> bool:
+    if not (inspect.isclass(model) and issubclass(model, BaseModel)):
+        return False
+    decorators = model.__pydantic_decorators__
+    if decorators.model_validators or decorators.field_serializers or decorators.model_serializers \
+            or decorators.computed_fields:
+        return False
+    for field in model.model_fields.values():
+        if field.alias or field.serialization_alias:
+            return False
+        args = typing.get_args(field.annotation) or (field.annotation,)
+        if typing.get_origin(field.annotation) is typing.Literal:
+            continue
+        if not all(arg in PLAIN_TYPES for arg in args):
+            return False
+    return True
+
+
+def build_encoder(response_model) -> Callable[[Any], bytes]:
+    """
+    Build a function that turns an endpoint's return value into JSON bytes.
+
+    Models (and lists of models) with plain fields and no serializers are
+    encoded by reading the fields straight off the ORM objects into orjson,
+    with no validation and no intermediate pydantic objects. Anything else is
+    validated and dumped by pydantic-core, which still writes bytes directly.
+
+    Parameters:
+    - response_model: The route's response model.
+
+    Returns:
+    - Callable[[Any], bytes]: The encoder.
+    """
+    many = typing.get_origin(response_model) in (list, typing.List)
+    model = typing.get_args(response_model)[0] if many else response_model
+    if _is_plain_model(model):
+        names = tuple(model.model_fields)
+
+        def row(obj):
+            if isinstance(obj, dict):
+                return {name: obj[name] for name in names}
+            return {name: getattr(obj, name) for name in names}
+
+        if many:
+            return lambda value: orjson.dumps([row(obj) for obj in value], option=orjson.OPT_UTC_Z)
+        return lambda value: orjson.dumps(row(value), option=orjson.OPT_UTC_Z)
+
+    adapter = TypeAdapter(response_model)
+    return lambda value: adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Route class that serializes responses with build_encoder() instead of
+    FastAPI's validate, dump-to-dict and json.dumps steps.
+
+    Opt in per router with APIRouter(route_class=FastJSONRoute). The response
+    model still documents the route in OpenAPI; status codes, headers and
+    background tasks set on the injected Response are kept. Routes with
+    response_model_include/exclude options or without a response model are
+    served by FastAPI as usual.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], *, response_model: Any = None,
+                 status_code: Optional[int] = None, **kwargs):
+        plain_options = not any(kwargs.get(option) for option in (
+            "response_model_include", "response_model_exclude", "response_model_exclude_unset",
+            "response_model_exclude_defaults", "response_model_exclude_none"))
+        # include_router() builds new routes from our already wrapped endpoints
+        endpoint = getattr(endpoint, "__fast_json_endpoint__", endpoint)
+        if response_model is not None and not isinstance(response_model, DefaultPlaceholder) and plain_options:
+            endpoint = self._wrap(endpoint, build_encoder(response_model), status_code or 200)
+        super().__init__(path, endpoint, response_model=response_model, status_code=status_code, **kwargs)
+
+    @staticmethod
+    def _wrap(endpoint: Callable[..., Any], encode: Callable[[Any], bytes], status_code: int):
+        signature = inspect.signature(endpoint)
+        response_param = next((name for name, param in signature.parameters.items()
+                               if param.annotation is Response), None)
+        parameters = list(signature.parameters.values())
+        if response_param is None:
+            response_param = "_fast_json_response"
+            parameters.append(inspect.Parameter(response_param, inspect.Parameter.KEYWORD_ONLY, annotation=Response))
+
+        @functools.wraps(endpoint)
+        async def wrapper(**values):
+            sub_response = values[response_param]
+            if response_param == "_fast_json_response":
+                del values[response_param]
+            result = await endpoint(**values)
+            if isinstance(result, Response):
+                return result
+            response = JSONBytesResponse(encode(result), status_code=sub_response.status_code or status_code)
+            response.raw_headers.extend(header for header in sub_response.raw_headers
+                                        if header[0] not in (b"content-length", b"content-type"))
+            return response
+
+        wrapper.__signature__ = signature.replace(parameters=parameters)
+        wrapper.__fast_json_endpoint__ = endpoint
+        return wrapper
@@ -0,0 +1,20 @@
+from functools import lru_cache
+
+from libgravatar import Gravatar
+
+
+@lru_cache(maxsize=4096)
+def gravatar_url(email: str) -> str:
+    """
+    Return the Gravatar URL of an email address.
+
+    The URL is derived from a hash of the address, so it is computed when a user
+    is read instead of being stored at signup, and memoised per process.
+
+    Parameters:
+    - email (str): The email address.
+
+    Returns:
+    - str: The URL of the Gravatar image (Gravatar's default image if there is none).
+    """
+    return Gravatar(email).get_image()
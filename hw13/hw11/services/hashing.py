@@ -0,0 +1,77 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from fastapi import HTTPException, status
+
+
+class HashingPool:
+    """
+    Bounded worker pool for CPU-bound password hashing and image processing.
+
+    bcrypt and Pillow release the GIL, so a small thread pool lets the work run
+    in parallel without blocking the event loop. At most `workers` hashes run at once; up to
+    `max_queue` more may wait, beyond that requests are rejected with 503 instead
+    of piling up behind each other.
+    """
+
+    def __init__(self, workers: int, max_queue: int, thread_name_prefix: str = "password-hash"):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix)
+        self.pending = 0
+        self.jobs = 0
+        self.rejected = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.run_seconds = 0.0
+
+    @staticmethod
+    def _timed(func: Callable, args: tuple):
+        started = time.perf_counter()
+        result = func(*args)
+        return started, time.perf_counter(), result
+
+    async def run(self, func: Callable, *args):
+        """
+        Run func(*args) in the pool and wait for the result.
+
+        Parameters:
+        - func (Callable): The blocking function.
+        - args: Its arguments.
+
+        Returns:
+        - Any: What func returned.
+
+        Raises:
+        - HTTPException: 503 if the queue is full.
+        """
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Server is busy, try again later", headers={"Retry-After": "1"})
+        self.pending += 1
+        queued = time.perf_counter()
+        try:
+            started, finished, result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._timed, func, args)
+        finally:
+            self.pending -= 1
+        waited = started - queued
+        self.jobs += 1
+        self.queue_seconds += waited
+        self.max_queue_seconds = max(self.max_queue_seconds, waited)
+        self.run_seconds += finished - started
+        return result
+
+    def stats(self) -> dict:
+        """
+        Return the pool counters.
+
+        Returns:
+        - dict: jobs, rejected, pending, total and max queue time, and total run time in seconds.
+        """
+        return {"jobs": self.jobs, "rejected": self.rejected, "pending": self.pending,
+                "queue_seconds": self.queue_seconds, "max_queue_seconds": self.max_queue_seconds,
+                "run_seconds": self.run_seconds}
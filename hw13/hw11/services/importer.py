@@ -0,0 +1,177 @@
+import csv
+import re
+import time
+from typing import Callable, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from hw11.database.models import User
+from hw11.repository import contacts as repository_contacts
+from hw11.schemas import ContactModel, ImportReject, ImportReport
+
+FORMATS = ("csv", "vcard")
+CSV_FIELDS = ("first_name", "last_name", "email", "phone", "birthday")
+MAX_REPORTED_REJECTS = 100
+
+Row = Tuple[int, dict]
+
+
+def detect_format(filename: str | None, content_type: str | None = None) -> str:
+    """
+    Guess the format of an uploaded address book.
+
+    Parameters:
+    - filename (str | None): The name of the file.
+    - content_type (str | None, optional): The MIME type of the file.
+
+    Returns:
+    - str: "vcard" for .vcf/.vcard files or text/vcard, "csv" otherwise.
+    """
+    if (filename or "").lower().endswith((".vcf", ".vcard")) or (content_type or "").endswith(("vcard", "x-vcard")):
+        return "vcard"
+    return "csv"
+
+
+def iter_csv(stream: Iterable[str]) -> Iterator[Row]:
+    """
+    Read contacts from CSV with a header row (first_name,last_name,email,phone,birthday).
+
+    Parameters:
+    - stream (Iterable[str]): The lines of the file.
+
+    Yields:
+    - Tuple[int, dict]: The line number and the raw row.
+    """
+    reader = csv.DictReader(stream)
+    previous = 1  # the header
+    for row in reader:
+        yield previous + 1, {field: (row.get(field) or "").strip() for field in CSV_FIELDS}
+        previous = reader.line_num
+
+
+def _unfold(stream: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """
+    Join vCard content lines folded over several physical lines (RFC 6350, 3.2).
+    """
+    start, current = 0, None
+    for number, line in enumerate(stream, 1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        start, current = number, line
+    if current is not None:
+        yield start, current
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def _bday(value: str) -> str:
+    # vCard 3 allows 19900121 as well as 1990-01-21.
+    value = value.split("T")[0]
+    if re.fullmatch(r"\d{8}", value):
+        return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return value
+
+
+def iter_vcard(stream: Iterable[str]) -> Iterator[Row]:
+    """
+    Read contacts from vCard (3.0/4.0). Uses N (or FN), the first EMAIL and TEL, and BDAY.
+
+    Parameters:
+    - stream (Iterable[str]): The lines of the file.
+
+    Yields:
+    - Tuple[int, dict]: The line number of BEGIN:VCARD and the raw row.
+    """
+    card, start = None, 0
+    for number, line in _unfold(stream):
+        name, _, value = line.partition(":")
+        prop = name.split(";")[0].split(".")[-1].upper()
+        if prop == "BEGIN" and value.upper() == "VCARD":
+            card, start = {}, number
+        elif card is None:
+            continue
+        elif prop == "END":
+            yield start, card
+            card = None
+        elif prop == "N":
+            parts = re.split(r"(?<!\\);", value) + ["", ""]
+            card["last_name"], card["first_name"] = _unescape(parts[0]).strip(), _unescape(parts[1]).strip()
+        elif prop == "FN" and not card.get("first_name"):
+            first, _, last = _unescape(value).strip().partition(" ")
+            card.setdefault("last_name", last)
+            card["first_name"] = first
+        elif prop == "EMAIL":
+            card.setdefault("email", _unescape(value).strip())
+        elif prop == "TEL":
+            card.setdefault("phone", _unescape(value).strip())
+        elif prop == "BDAY":
+            card["birthday"] = _bday(value.strip())
+
+
+def _next_chunk(rows: Iterator[Row], size: int) -> Tuple[List[ContactModel], List[Tuple[int, str, dict]], int]:
+    """
+    Read and validate up to size rows. Runs in a worker thread.
+    """
+    valid, rejects, read = [], [], 0
+    for line, row in rows:
+        read += 1
+        try:
+            valid.append(ContactModel.model_validate(row))
+        except ValidationError as e:
+            error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            rejects.append((line, error, row))
+        if read == size:
+            break
+    return valid, rejects, read
+
+
+async def import_contacts(stream: TextIO, fmt: str, user: User, db: AsyncSession, chunk_size: int = 5000,
+                          on_progress: Optional[Callable[[ImportReport], None]] = None,
+                          on_reject: Optional[Callable[[int, str, dict], None]] = None) -> ImportReport:
+    """
+    Import contacts from a CSV or vCard stream for a user.
+
+    The stream is read incrementally: each chunk is parsed and validated with
+    ContactModel in a worker thread, then written with repository_contacts.copy_contacts,
+    so memory use depends on chunk_size rather than on the size of the file.
+
+    Parameters:
+    - stream (TextIO): The text stream of the file.
+    - fmt (str): "csv" or "vcard".
+    - user (User): The user who owns the contacts.
+    - db (AsyncSession): The database session.
+    - chunk_size (int, optional): Rows per chunk. Defaults to 5000.
+    - on_progress (Callable, optional): Called with the report after each chunk.
+    - on_reject (Callable, optional): Called with (line, error, row) for every rejected row.
+
+    Returns:
+    - ImportReport: The counts, duration, throughput and the first rejected rows.
+    """
+    rows = iter_vcard(stream) if fmt == "vcard" else iter_csv(stream)
+    report = ImportReport()
+    start = time.perf_counter()
+    while True:
+        valid, rejects, read = await run_in_threadpool(_next_chunk, rows, chunk_size)
+        if not read:
+            break
+        report.total += read
+        report.imported += await repository_contacts.copy_contacts(valid, user, db)
+        report.rejected += len(rejects)
+        for line, error, row in rejects:
+            if len(report.rejects) < MAX_REPORTED_REJECTS:
+                report.rejects.append(ImportReject(line=line, error=error))
+            if on_reject:
+                on_reject(line, error, row)
+        report.seconds = round(time.perf_counter() - start, 3)
+        report.rows_per_second = round(report.total / report.seconds, 1) if report.seconds else 0.0
+        if on_progress:
+            on_progress(report)
+    return report
@@ -0,0 +1,365 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import socket
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from typing import Callable, List
+
+import aiosmtplib
+from aiosmtplib import SMTPException, SMTPServerDisconnected
+
+logger = logging.getLogger(__name__)
+
+# Jobs are JSON strings so the queues below can hold them unchanged:
+# {"id", "to", "subject", "template", "body", "attempts"}
+
+PROMOTE_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job in ipairs(due) do
+    redis.call('ZREM', KEYS[1], job)
+    redis.call('LPUSH', KEYS[2], job)
+end
+return #due
+"""
+
+
+class MemoryMailQueue:
+    """
+    In-process mail queue for tests and single-process development.
+
+    Jobs are lost when the process exits.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._ready: deque[str] = deque()
+        self._delayed: list = []
+        self._seq = itertools.count()
+        self._pushed = asyncio.Event()
+        self.dead: List[str] = []
+
+    async def push(self, job: str, delay: float = 0) -> None:
+        """
+        Add a job, optionally to be delivered after a delay.
+
+        Parameters:
+        - job (str): The serialized job.
+        - delay (float): Seconds to wait before the job becomes ready.
+        """
+        if delay > 0:
+            heapq.heappush(self._delayed, (self.clock() + delay, next(self._seq), job))
+        else:
+            self._ready.append(job)
+            self._pushed.set()
+
+    async def pop(self, count: int, timeout: float) -> List[str]:
+        """
+        Take up to count ready jobs, waiting up to timeout seconds for the first one.
+
+        Parameters:
+        - count (int): The maximum number of jobs.
+        - timeout (float): Seconds to wait when no job is ready.
+
+        Returns:
+        - List[str]: The jobs, possibly empty.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            now = self.clock()
+            while self._delayed and self._delayed[0][0] <= now:
+                self._ready.append(heapq.heappop(self._delayed)[2])
+            if self._ready:
+                return [self._ready.popleft() for _ in range(min(count, len(self._ready)))]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            self._pushed.clear()
+            wait = remaining if not self._delayed else min(remaining, max(self._delayed[0][0] - now, 0.001))
+            try:
+                await asyncio.wait_for(self._pushed.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def ack(self, jobs: List[str]) -> None:
+        """
+        Mark jobs as handled; nothing to do in memory.
+
+        Parameters:
+        - jobs (List[str]): The jobs returned by pop().
+        """
+
+    async def bury(self, job: str) -> None:
+        """
+        Move a job that ran out of attempts to the dead letters.
+
+        Parameters:
+        - job (str): The serialized job.
+        """
+        self.dead.append(job)
+
+    async def recover(self) -> int:
+        """
+        Requeue jobs of a crashed worker; nothing survives a crash in memory.
+
+        Returns:
+        - int: Always 0.
+        """
+        return 0
+
+    async def size(self) -> int:
+        """
+        Return the number of waiting jobs.
+
+        Returns:
+        - int: Ready plus delayed jobs.
+        """
+        return len(self._ready) + len(self._delayed)
+
+
+class RedisMailQueue:
+    """
+    Durable mail queue in Redis.
+
+    Ready jobs are a list, retries wait in a sorted set scored by due time.
+    pop() moves jobs to a processing list and ack() removes them from it, so a
+    worker that dies mid-batch leaves its jobs there for recover(). Delivery is
+    at least once.
+    """
+
+    def __init__(self, prefix: str = "mail"):
+        self.redis = None
+        self.ready_key = f"{prefix}:ready"
+        self.delayed_key = f"{prefix}:delayed"
+        self.processing_key = f"{prefix}:processing"
+        self.dead_key = f"{prefix}:dead"
+
+    async def push(self, job: str, delay: float = 0) -> None:
+        """
+        Add a job, optionally to be delivered after a delay.
+
+        Parameters:
+        - job (str): The serialized job.
+        - delay (float): Seconds to wait before the job becomes ready.
+        """
+        if delay > 0:
+            await self.redis.zadd(self.delayed_key, {job: time.time() + delay})
+        else:
+            await self.redis.lpush(self.ready_key, job)
+
+    async def pop(self, count: int, timeout: float) -> List[str]:
+        """
+        Take up to count ready jobs, waiting up to timeout seconds for the first one.
+
+        Parameters:
+        - count (int): The maximum number of jobs.
+        - timeout (float): Seconds to wait when no job is ready.
+
+        Returns:
+        - List[str]: The jobs, possibly empty.
+        """
+        await self.redis.eval(PROMOTE_DUE, 2, self.delayed_key, self.ready_key, time.time(), count)
+        first = await self.redis.blmove(self.ready_key, self.processing_key, timeout, "RIGHT", "LEFT")
+        if first is None:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for _ in range(count - 1):
+            pipe.lmove(self.ready_key, self.processing_key, "RIGHT", "LEFT")
+        return [first] + [job for job in await pipe.execute() if job is not None]
+
+    async def ack(self, jobs: List[str]) -> None:
+        """
+        Remove handled jobs from the processing list.
+
+        Parameters:
+        - jobs (List[str]): The jobs returned by pop().
+        """
+        if jobs:
+            pipe = self.redis.pipeline(transaction=False)
+            for job in jobs:
+                pipe.lrem(self.processing_key, 1, job)
+            await pipe.execute()
+
+    async def bury(self, job: str) -> None:
+        """
+        Move a job that ran out of attempts to the dead letters.
+
+        Parameters:
+        - job (str): The serialized job.
+        """
+        await self.redis.lpush(self.dead_key, job)
+
+    async def recover(self) -> int:
+        """
+        Requeue jobs left in the processing list by a worker that died.
+
+        Call it when a worker starts and no other worker is running, otherwise
+        in-flight jobs are delivered twice.
+
+        Returns:
+        - int: The number of requeued jobs.
+        """
+        moved = 0
+        while await self.redis.lmove(self.processing_key, self.ready_key, "LEFT", "RIGHT") is not None:
+            moved += 1
+        return moved
+
+    async def size(self) -> int:
+        """
+        Return the number of waiting jobs.
+
+        Returns:
+        - int: Ready plus delayed jobs.
+        """
+        return await self.redis.llen(self.ready_key) + await self.redis.zcard(self.delayed_key)
+
+
+class SMTPPool:
+    """
+    A fixed number of SMTP connections kept open between messages.
+
+    Connections are opened lazily and reopened once when the server has dropped
+    an idle one, which saves the TCP, TLS and AUTH handshakes on every message.
+    """
+
+    def __init__(self, size: int, **options):
+        options.setdefault("local_hostname", socket.getfqdn())
+        self.options = options
+        self._clients = [aiosmtplib.SMTP(**options) for _ in range(size)]
+        self._idle: asyncio.LifoQueue = asyncio.LifoQueue()
+        for smtp in self._clients:
+            self._idle.put_nowait(smtp)
+        self.connects = 0
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Borrow a connected client, waiting while all of them are busy.
+
+        Yields:
+        - aiosmtplib.SMTP: The client.
+        """
+        smtp = await self._idle.get()
+        try:
+            if not smtp.is_connected:
+                await smtp.connect()
+                self.connects += 1
+            yield smtp
+        except SMTPException:
+            smtp.close()
+            raise
+        finally:
+            self._idle.put_nowait(smtp)
+
+    async def send(self, message: EmailMessage) -> None:
+        """
+        Send a message over a pooled connection.
+
+        Parameters:
+        - message (EmailMessage): The message.
+
+        Raises:
+        - SMTPException: If the server refused the message or could not be reached.
+        """
+        async with self.connection() as smtp:
+            try:
+                await smtp.send_message(message)
+            except SMTPServerDisconnected:
+                await smtp.connect()
+                self.connects += 1
+                await smtp.send_message(message)
+
+    async def close(self) -> None:
+        """
+        Close all connections.
+        """
+        for smtp in self._clients:
+            if smtp.is_connected:
+                try:
+                    await smtp.quit()
+                except SMTPException:
+                    smtp.close()
+
+
+class MailWorker:
+    """
+    Delivers queued mail in batches over an SMTPPool.
+
+    A failed message is retried after retry_base ** attempts seconds and buried
+    in the dead letters after max_attempts.
+    """
+
+    def __init__(self, queue, pool: SMTPPool, render: Callable[[dict], EmailMessage], batch_size: int = 50,
+                 max_attempts: int = 5, retry_base: float = 2.0):
+        self.queue = queue
+        self.pool = pool
+        self.render = render
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def _deliver(self, raw: str) -> None:
+        job = json.loads(raw)
+        job["attempts"] = job.get("attempts", 0) + 1
+        try:
+            message = self.render(job)
+        except Exception as err:
+            # a broken template or job will not get better with retries
+            job["attempts"], job["error"] = self.max_attempts, repr(err)
+        else:
+            try:
+                await self.pool.send(message)
+                self.sent += 1
+                return
+            except (SMTPException, OSError) as err:
+                job["error"] = str(err)
+        if job["attempts"] >= self.max_attempts:
+            self.failed += 1
+            logger.error("Giving up on mail %s to %s: %s", job["id"], job["to"], job["error"])
+            await self.queue.bury(json.dumps(job))
+        else:
+            self.retried += 1
+            logger.warning("Mail %s to %s failed (attempt %d): %s", job["id"], job["to"], job["attempts"],
+                           job["error"])
+            await self.queue.push(json.dumps(job), delay=self.retry_base ** job["attempts"])
+
+    async def run_once(self, timeout: float = 1.0) -> int:
+        """
+        Deliver one batch.
+
+        Parameters:
+        - timeout (float): Seconds to wait for the first job.
+
+        Returns:
+        - int: The number of jobs handled.
+        """
+        jobs = await self.queue.pop(self.batch_size, timeout)
+        await asyncio.gather(*(self._deliver(job) for job in jobs))
+        await self.queue.ack(jobs)
+        return len(jobs)
+
+    async def run(self) -> None:
+        """
+        Deliver batches until cancelled.
+        """
+        try:
+            while True:
+                await self.run_once()
+        finally:
+            await self.pool.close()
+
+    def stats(self) -> dict:
+        """
+        Return the worker counters.
+
+        Returns:
+        - dict: sent, retried, failed and SMTP connects.
+        """
+        return {"sent": self.sent, "retried": self.retried, "failed": self.failed, "connects": self.pool.connects}
@@ -0,0 +1,226 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Request latencies: 1 ms to 10 s.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Single statements are faster.
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """
+    The metrics of a process, rendered in the Prometheus text format.
+
+    Metrics are plain dicts updated on the event loop thread without locks,
+    which keeps an update to a dict lookup and an addition.
+    """
+
+    def __init__(self):
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Render every metric.
+
+        Returns:
+        - str: The exposition, see CONTENT_TYPE.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    """
+    A monotonically increasing count, optionally split by labels.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: Dict[tuple, float] = {} if labelnames else {(): 0}
+        registry.register(self)
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        """
+        Add to the count.
+
+        Parameters:
+        - labels: The label values, in labelnames order.
+        - amount (float, optional): How much to add. Defaults to 1.
+        """
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in self.values.items()]
+
+
+class Gauge:
+    """
+    A value read when the metrics are scraped, e.g. a queue length.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], float], registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.read = read
+        registry.register(self)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_number(self.read())}"]
+
+
+class Histogram:
+    """
+    Observations counted into fixed buckets, with their sum, optionally split by labels.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS, registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # per label values: [count in each bucket (not cumulative) ..., count above the last bucket, sum]
+        self.values: Dict[tuple, list] = {}
+        registry.register(self)
+
+    def observe(self, value: float, *labels) -> None:
+        """
+        Record an observation.
+
+        Parameters:
+        - value (float): The observed value, e.g. seconds.
+        - labels: The label values, in labelnames order.
+        """
+        counts = self.values.get(labels)
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, counts in self.values.items():
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                total += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {total}")
+        return lines
+
+
+http_request_seconds = Histogram("http_request_duration_seconds", "Time to answer an HTTP request.",
+                                 ("method", "route", "status"))
+http_request_queries = Histogram("http_request_db_queries", "SQL statements sent while answering a request.",
+                                 ("route",), COUNT_BUCKETS)
+http_request_db_seconds = Histogram("http_request_db_seconds", "Time spent in SQL while answering a request.",
+                                    ("route",))
+db_query_seconds = Histogram("db_query_duration_seconds", "Time of single SQL statements.", (), QUERY_BUCKETS)
+
+# [statements, seconds] of the current request, None outside requests
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    db_query_seconds.observe(elapsed)
+    usage = _request_db.get()
+    if usage is not None:
+        usage[0] += 1
+        usage[1] += elapsed
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Time every statement an engine sends and charge it to the current request.
+
+    Parameters:
+    - engine (AsyncEngine): The engine to instrument.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and SQL use of every HTTP request.
+
+    Requests are labelled with the route template (e.g. /api/contacts/{contact_id}),
+    so path parameters do not multiply the series; requests that match no route
+    share the label "other".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        usage = [0, 0.0]
+        token = _request_db.set(usage)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db.reset(token)
+            route = scope.get("route")
+            route = route.path if route is not None else "other"
+            http_request_seconds.observe(elapsed, scope["method"], route, status)
+            http_request_queries.observe(usage[0], route)
+            http_request_db_seconds.observe(usage[1], route)
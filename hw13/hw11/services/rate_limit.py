@@ -0,0 +1,284 @@
+import asyncio
+import time
+from math import ceil
+from typing import Callable, Optional
+
+from fastapi import HTTPException, status
+from redis.exceptions import NoScriptError, RedisError
+from starlette.requests import Request
+from starlette.responses import Response
+
+from hw11.conf.config import settings
+from hw11.services.metrics import Counter
+from hw11.services.tokens import access_token_subject
+
+PREFIX = "rate-limit"
+
+rejections = Counter("rate_limit_rejections_total", "Requests refused with 429.", ("route",))
+backend_failures = Counter("rate_limit_backend_failures_total", "Limit checks that could not reach Redis.")
+
+
+def _unavailable(backend) -> float:
+    backend.failures += 1
+    backend_failures.inc()
+    if backend.fail_open:
+        return 0.0
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Rate limiter unavailable", headers={"Retry-After": "1"})
+
+
+class RedisBackend:
+    """
+    Fixed-window counters checked in Redis on every request.
+
+    The scheme the routes used with fastapi_limiter: exact across workers, but
+    each limited request waits for a Redis round-trip before the handler runs.
+    """
+
+    script = """local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local expire_time = ARGV[2]
+local cost = tonumber(ARGV[3])
+
+local current = tonumber(redis.call('get', key) or "0")
+if current + cost > limit then
+    local pttl = redis.call("PTTL", key)
+    if pttl > 0 then
+        return pttl
+    end
+    return tonumber(expire_time)
+end
+if current > 0 then
+    redis.call("INCRBY", key, cost)
+else
+    redis.call("SET", key, cost, "px", expire_time)
+end
+return 0"""
+
+    def __init__(self, fail_open: bool = True, prefix: str = PREFIX):
+        self.fail_open = fail_open
+        self.prefix = prefix
+        self.redis = None
+        self.failures = 0
+        self._sha = None
+
+    async def _eval(self, *args):
+        if self._sha is not None:
+            try:
+                return await self.redis.evalsha(self._sha, *args)
+            except NoScriptError:
+                pass
+        self._sha = await self.redis.script_load(self.script)
+        return await self.redis.evalsha(self._sha, *args)
+
+    async def acquire(self, key: str, limit: int, period: float, cost: int = 1) -> float:
+        """
+        Take cost units from the limit of a key.
+
+        Parameters:
+        - key (str): The client and route being limited.
+        - limit (int): Units allowed per period.
+        - period (float): The period in seconds.
+        - cost (int): Units this request takes.
+
+        Returns:
+        - float: 0 if the request is allowed, otherwise seconds until it would be.
+
+        Raises:
+        - HTTPException: 503 if Redis is down and the backend fails closed.
+        """
+        if self.redis is None:
+            return _unavailable(self)
+        try:
+            pexpire = await self._eval(1, f"{self.prefix}:{key}", str(limit), str(int(period * 1000)), str(cost))
+        except RedisError:
+            return _unavailable(self)
+        return int(pexpire) / 1000
+
+
+class LocalBackend:
+    """
+    In-process GCRA buckets reconciled with Redis in batches.
+
+    Requests are admitted from a per-worker bucket without any I/O. Every
+    sync_interval seconds a background task adds what this worker admitted to a
+    shared per-window counter in one pipeline and charges the local buckets with
+    what the other workers admitted meanwhile. Between syncs the workers together
+    may overshoot a limit by what they admit in one interval.
+
+    Without Redis the buckets are purely local and acquire() prunes the idle ones
+    every sync_interval seconds instead. When a sync fails the backend
+    keeps admitting from local state (fail open) or answers 503 until a sync
+    succeeds again (fail closed).
+    """
+
+    def __init__(self, sync_interval: float = 1.0, fail_open: bool = True, prefix: str = PREFIX,
+                 clock: Callable[[], float] = time.time):
+        self.sync_interval = sync_interval
+        self.fail_open = fail_open
+        self.prefix = prefix
+        self.clock = clock
+        self.redis = None
+        self.redis_ok = True
+        self.failures = 0
+        self.syncs = 0
+        self._tat: dict[str, float] = {}
+        self._pending: dict[str, list] = {}
+        self._seen: dict[str, tuple[int, int]] = {}
+        self._last_sync = clock()
+        self._sync_task: Optional[asyncio.Task] = None
+
+    def _take(self, key: str, limit: int, period: float, cost: int, now: float) -> float:
+        tat = max(self._tat.get(key, now), now)
+        new_tat = tat + cost * period / limit
+        if new_tat - now > period:
+            return new_tat - period - now
+        self._tat[key] = new_tat
+        return 0.0
+
+    async def acquire(self, key: str, limit: int, period: float, cost: int = 1) -> float:
+        """
+        Take cost units from the local bucket of a key.
+
+        Parameters:
+        - key (str): The client and route being limited.
+        - limit (int): Units allowed per period.
+        - period (float): The period in seconds.
+        - cost (int): Units this request takes.
+
+        Returns:
+        - float: 0 if the request is allowed, otherwise seconds until it would be.
+
+        Raises:
+        - HTTPException: 503 if the last sync failed and the backend fails closed.
+        """
+        now = self.clock()
+        if self.redis is None:
+            if now - self._last_sync >= self.sync_interval:
+                self._last_sync = now
+                self._prune(now)
+            return self._take(key, limit, period, cost, now)
+        if now - self._last_sync >= self.sync_interval and (self._sync_task is None or self._sync_task.done()):
+            self._sync_task = asyncio.create_task(self.sync())
+        if not self.redis_ok and not self.fail_open:
+            return _unavailable(self)
+        wait = self._take(key, limit, period, cost, now)
+        if wait == 0:
+            pending = self._pending.setdefault(key, [0, limit, period])
+            pending[0] += cost
+        return wait
+
+    def _prune(self, now: float) -> None:
+        # a bucket whose TAT has passed is full again, the same as no bucket
+        for key in [key for key, tat in self._tat.items() if tat <= now and key not in self._pending]:
+            del self._tat[key]
+            self._seen.pop(key, None)
+
+    async def sync(self) -> None:
+        """
+        Report locally admitted units to Redis and charge what other workers admitted.
+        """
+        pending, self._pending = self._pending, {}
+        now = self._last_sync = self.clock()
+        if pending or not self.redis_ok:
+            windows = {key: int(now // period) for key, (_, _, period) in pending.items()}
+            pipe = self.redis.pipeline(transaction=False)
+            for key, (cost, _, period) in pending.items():
+                counter = f"{self.prefix}:{key}:{windows[key]}"
+                pipe.incrby(counter, cost)
+                pipe.pexpire(counter, int(period * 2000))
+            if not pending:
+                # nothing to report, but a failed backend has to find out whether Redis is back
+                pipe.ping()
+            try:
+                results = await pipe.execute()
+            except RedisError:
+                self.redis_ok = False
+                self.failures += 1
+                for key, (cost, limit, period) in pending.items():
+                    self._pending.setdefault(key, [0, limit, period])[0] += cost
+                return
+            self.syncs += 1
+            for (key, (cost, limit, period)), total in zip(pending.items(), results[::2]):
+                window, seen = self._seen.get(key, (windows[key], 0))
+                others = total - cost - (seen if window == windows[key] else 0)
+                self._seen[key] = (windows[key], total)
+                if others > 0:
+                    tat = max(self._tat.get(key, now), now) + others * period / limit
+                    self._tat[key] = min(tat, now + period)
+        self.redis_ok = True
+        self._prune(now)
+
+
+async def user_identifier(request: Request) -> str:
+    """
+    Identify the client by the subject of its access token, falling back to the IP address.
+
+    The token is only decoded here; authentication still happens in the route.
+
+    Parameters:
+    - request (Request): The request object.
+
+    Returns:
+    - str: "user:<email>" or "ip:<address>".
+    """
+    if settings.rate_limit_per_user:
+        subject = access_token_subject(request.headers.get("Authorization"))
+        if subject is not None:
+            return f"user:{subject}"
+    forwarded = request.headers.get("X-Forwarded-For")
+    return "ip:" + (forwarded.split(",")[0].strip() if forwarded else request.client.host)
+
+
+def create_backend():
+    """
+    Build the backend selected by settings.rate_limit_backend ("local" or "redis").
+
+    Returns:
+    - LocalBackend | RedisBackend: The backend; its redis attribute is set at startup.
+    """
+    if settings.rate_limit_backend == "redis":
+        return RedisBackend(fail_open=settings.rate_limit_fail_open)
+    return LocalBackend(sync_interval=settings.rate_limit_sync_interval, fail_open=settings.rate_limit_fail_open)
+
+
+backend = create_backend()
+
+
+class RateLimit:
+    """
+    Route dependency limiting how often a client may call a route.
+
+    Use it as Depends(RateLimit(times=5, seconds=60)), or call hit() with a cost
+    from the handler when the price depends on the body (e.g. batch size).
+    Requests are keyed by client, method and route template.
+    """
+
+    def __init__(self, times: int, seconds: int = 0, minutes: int = 0, identifier: Optional[Callable] = None):
+        self.times = times
+        self.period = seconds + 60 * minutes
+        self.identifier = identifier or user_identifier
+
+    async def __call__(self, request: Request, response: Response):
+        await self.hit(request, response, 1)
+
+    async def hit(self, request: Request, response: Response, cost: int):
+        """
+        Charge the current client for a number of units.
+
+        Parameters:
+        - request (Request): The request object.
+        - response (Response): The response object.
+        - cost (int): The number of units (e.g. items) in the request.
+
+        Raises:
+        - HTTPException: 429 if the client is over the limit, 503 if the backend fails closed.
+        """
+        route = request.scope.get("route")
+        path = route.path if route is not None else request.url.path
+        key = f"{await self.identifier(request)}:{request.method}:{path}"
+        wait = await backend.acquire(key, self.times, self.period, cost)
+        if wait > 0:
+            rejections.inc(path)
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too Many Requests",
+                                headers={"Retry-After": str(ceil(wait))})
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from redis.exceptions import RedisError
+from starlette.requests import Request
+from starlette.responses import Response
+
+from hw11.conf.config import settings
+from hw11.database.models import User
+from hw11.services.fast_json import JSONBytesResponse
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def _digest(*parts) -> str:
+    return hashlib.blake2b(":".join(map(str, parts)).encode(), digest_size=8).hexdigest()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 requires for it).
+
+    Parameters:
+    - if_none_match (str): The header value, a list of entity tags or "*".
+    - etag (str): The current strong ETag, quoted.
+
+    Returns:
+    - bool: True if the client already holds this representation.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ResponseCache:
+    """
+    Conditional GETs and an optional Redis response cache for a per-user collection.
+
+    Every user has a collection version that the repository bumps after each
+    committed write. Responses carry a strong ETag derived from the version, so
+    a poll with a current If-None-Match gets 304 without running the query.
+    With the cache enabled, rendered bodies are kept in Redis under the user and
+    version, so unchanged reads never touch the database either; a bump makes
+    the old entries unreachable and they expire after ttl seconds.
+
+    Versions live in Redis. A missing key starts from the current time in
+    microseconds rather than zero, so a flushed or evicted version never
+    repeats an ETag handed out before. Without a Redis client (tests,
+    single-process development) versions are kept in process.
+    """
+
+    def __init__(self, namespace: str, enabled: bool = False, ttl: int = 300,
+                 clock: Callable[[], int] = time.time_ns):
+        self.namespace = namespace
+        self.enabled = enabled
+        self.ttl = ttl
+        self.clock = clock
+        self.redis = None
+        self._local: dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def _epoch(self) -> int:
+        return self.clock() // 1000
+
+    def _version_key(self, user_id: int) -> str:
+        return f"{self.namespace}-version:{user_id}"
+
+    def _cache_key(self, user_id: int, version: int, request: Request, variant: str) -> str:
+        return f"{self.namespace}-cache:{user_id}:{version}:{_digest(request.url.path, request.url.query, variant)}"
+
+    async def version(self, user_id: int) -> Optional[int]:
+        """
+        Return the collection version of a user.
+
+        Parameters:
+        - user_id (int): The ID of the user.
+
+        Returns:
+        - int | None: The version, or None if Redis is unavailable.
+        """
+        if self.redis is None:
+            return self._local.setdefault(user_id, self._epoch())
+        key = self._version_key(user_id)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(key, self._epoch(), nx=True)
+            pipe.get(key)
+            _, version = await pipe.execute()
+        except RedisError as err:
+            logger.warning("Cannot read %s: %s", key, err)
+            return None
+        return int(version)
+
+    async def bump(self, user_id: int) -> None:
+        """
+        Move a user's collection to a new version after a committed write.
+
+        Parameters:
+        - user_id (int): The ID of the user.
+        """
+        if self.redis is None:
+            self._local[user_id] = self._local.get(user_id, self._epoch()) + 1
+            return
+        key = self._version_key(user_id)
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.set(key, self._epoch(), nx=True)
+            pipe.incr(key)
+            await pipe.execute()
+        except RedisError as err:
+            logger.error("Cannot bump %s, clients may see stale data until it changes again: %s", key, err)
+
+    async def _get(self, key: str) -> Optional[tuple]:
+        try:
+            raw = await self.redis.get(key)
+        except RedisError:
+            return None
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        headers, body = raw.split("\n", 1)
+        return body.encode(), json.loads(headers)
+
+    async def _set(self, key: str, body: bytes, headers: dict) -> None:
+        try:
+            await self.redis.set(key, json.dumps(headers) + "\n" + body.decode(), ex=self.ttl)
+        except RedisError:
+            pass
+
+    @staticmethod
+    def _finish(result: Response, response: Response, etag: Optional[str]) -> Response:
+        if etag is not None:
+            result.headers["ETag"] = etag
+            result.headers["Cache-Control"] = CACHE_CONTROL
+        present = {name for name, _ in result.raw_headers}
+        result.raw_headers.extend(header for header in response.raw_headers
+                                  if header[0] not in present and header[0] != b"content-length")
+        return result
+
+    async def respond(self, request: Request, response: Response, user: User, load: Callable[[], Awaitable[Any]],
+                      encode: Callable[[Any], bytes], variant: str = "", headers: tuple = (),
+                      entity_tag: Optional[Callable[[Any], str]] = None) -> Response:
+        """
+        Answer a read of the user's collection: 304, a cached body, or the result of load().
+
+        By default the ETag is derived from the collection version, so a current
+        If-None-Match is answered without loading anything. A read of a single
+        resource passes entity_tag instead, so its ETag is the one If-Match is
+        checked against on writes; it is kept with the cached body, and a 304 then
+        needs the cache or the query.
+
+        Parameters:
+        - request (Request): The request, for If-None-Match and the cache key.
+        - response (Response): The injected response. Headers set on it are copied to the result.
+        - user (User): The owner of the collection.
+        - load (Callable[[], Awaitable[Any]]): Runs the query; awaited only when the body is needed.
+        - encode (Callable[[Any], bytes]): Renders the loaded value, see fast_json.build_encoder().
+        - variant (str, optional): Anything else the body depends on, e.g. the current date.
+        - headers (tuple, optional): Names of headers load() sets that belong with the body.
+        - entity_tag (Callable[[Any], str], optional): Builds the quoted ETag of the loaded value.
+
+        Returns:
+        - Response: The response to return from the endpoint.
+        """
+        if_none_match = request.headers.get("if-none-match", "")
+        version = await self.version(user.id)
+        etag = None
+        if version is not None and entity_tag is None:
+            etag = f'"{_digest(user.id, version, variant)}"'
+            if etag_matches(if_none_match, etag):
+                self.not_modified += 1
+                return self._finish(Response(status_code=304), response, etag)
+
+        cache = self.enabled and self.redis is not None and version is not None
+        key = self._cache_key(user.id, version, request, variant) if cache else None
+        cached = await self._get(key) if cache else None
+        if cached is not None:
+            self.hits += 1
+            body, extra = cached
+        else:
+            self.misses += 1
+            value = await load()
+            body = encode(value)
+            extra = {name: response.headers[name] for name in headers if name in response.headers}
+            if entity_tag is not None:
+                extra["ETag"] = entity_tag(value)
+            if cache:
+                await self._set(key, body, extra)
+        if entity_tag is not None:
+            etag = extra.pop("ETag")
+            if etag_matches(if_none_match, etag):
+                self.not_modified += 1
+                return self._finish(Response(status_code=304), response, etag)
+        return self._finish(JSONBytesResponse(body, headers=extra), response, etag)
+
+    def stats(self) -> dict:
+        """
+        Return the cache counters.
+
+        Returns:
+        - dict: hits, misses and not_modified.
+        """
+        return {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
+
+
+contact_cache = ResponseCache("contacts", settings.response_cache, settings.response_cache_ttl)
@@ -0,0 +1,192 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from hw11.conf.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Literals and expanded IN lists differ between repetitions of one query.
+_SHAPE_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\$\d+|%\(\w+\)s"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\?(?:\s*,\s*\?)+"), "?..."),
+    (re.compile(r"\s+"), " "),
+)
+_EXPLAINED = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Reduce a statement to its shape, so repetitions of one query compare equal.
+
+    Parameters:
+    - statement (str): The SQL as sent to the driver.
+
+    Returns:
+    - str: The statement with literals and parameter lists replaced by placeholders.
+    """
+    for pattern, replacement in _SHAPE_PATTERNS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+class RequestProfile:
+    """
+    The statements one request sent, with their parameters, times and engines.
+    """
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.statements: List[Tuple[str, object, float, AsyncEngine]] = []
+
+    @property
+    def endpoint(self) -> str:
+        return f"{self.method} {self.route or self.path}"
+
+    @property
+    def seconds(self) -> float:
+        return sum(elapsed for _, _, elapsed, _ in self.statements)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """
+        Find statement shapes sent at least threshold times, the mark of an N+1 query.
+
+        Parameters:
+        - threshold (int): The smallest number of repetitions reported.
+
+        Returns:
+        - List[Tuple[str, int]]: The shapes and how often they were sent, most frequent first.
+        """
+        counts = Counter(statement_shape(statement) for statement, _, _, _ in self.statements)
+        return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+
+async def explain(engine: AsyncEngine, statement: str, parameters) -> list:
+    """
+    EXPLAIN one recorded statement with its parameters, without running it.
+
+    Parameters:
+    - engine (AsyncEngine): The engine the statement was recorded on.
+    - statement (str): The SQL as sent to the driver.
+    - parameters: The driver parameters.
+
+    Returns:
+    - list: The EXPLAIN QUERY PLAN rows (SQLite) or the EXPLAIN (FORMAT JSON) document (Postgres).
+    """
+    async with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            result = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            return [tuple(row) for row in result.all()]
+        result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+        plan = result.scalar_one()
+        return json.loads(plan) if isinstance(plan, str) else plan
+
+
+class SQLProfiler:
+    """
+    Debug-mode recorder of the SQL each request sends.
+
+    Engines passed to attach() report every statement to the profile of the
+    current request, which ProfilerMiddleware opens while the profiler is
+    enabled. When a request ends, statement shapes repeated n_plus_one times
+    or more are logged as a likely N+1 query, and statements slower than
+    slow_seconds are logged with their EXPLAIN plan. Listeners receive every
+    finished profile (see tests/query_budget.py).
+    """
+
+    def __init__(self, enabled: bool = False, slow_seconds: float = 0.1, n_plus_one: int = 5):
+        self.enabled = enabled
+        self.slow_seconds = slow_seconds
+        self.n_plus_one = n_plus_one
+        self.listeners: List[Callable[[RequestProfile], None]] = []
+        self._current: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+        self._engines: Dict[object, AsyncEngine] = {}
+
+    def attach(self, engine: AsyncEngine) -> None:
+        """
+        Report the statements of an engine to the current request's profile.
+
+        Parameters:
+        - engine (AsyncEngine): The engine to watch.
+        """
+        self._engines[engine.sync_engine] = engine
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if self._current.get() is not None:
+            context._profiler_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        profile = self._current.get()
+        if profile is None or not hasattr(context, "_profiler_started"):
+            return
+        elapsed = time.perf_counter() - context._profiler_started
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        profile.statements.append((statement, parameters, elapsed, self._engines[conn.engine]))
+
+    def start(self, method: str, path: str) -> Tuple[RequestProfile, object]:
+        profile = RequestProfile(method, path)
+        return profile, self._current.set(profile)
+
+    async def finish(self, profile: RequestProfile, token) -> None:
+        """
+        Close a request's profile, log what it found and pass it to the listeners.
+
+        Parameters:
+        - profile (RequestProfile): The profile returned by start().
+        - token: The token returned by start().
+        """
+        self._current.reset(token)
+        for shape, count in profile.repeated(self.n_plus_one):
+            logger.warning("%s sent %d times (N+1?): %s", profile.endpoint, count, shape)
+        for statement, parameters, elapsed, engine in profile.statements:
+            if elapsed < self.slow_seconds or not statement.lstrip().upper().startswith(_EXPLAINED):
+                continue
+            try:
+                plan = await explain(engine, statement, parameters)
+            except Exception as err:
+                plan = f"EXPLAIN failed: {err}"
+            logger.warning("%s slow query (%.1f ms): %s\n%s", profile.endpoint, elapsed * 1000,
+                           " ".join(statement.split()), plan)
+        logger.debug("%s sent %d statements in %.1f ms", profile.endpoint, len(profile.statements),
+                     profile.seconds * 1000)
+        for listener in self.listeners:
+            listener(profile)
+
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware opening a profile for every HTTP request while the profiler is enabled.
+    """
+
+    def __init__(self, app, profiler: SQLProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+        profile, token = self.profiler.start(scope["method"], scope["path"])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            profile.route = route.path if route is not None else None
+            await self.profiler.finish(profile, token)
+
+
+sql_profiler = SQLProfiler(settings.sql_profiler, settings.slow_query_ms / 1000, settings.n_plus_one_threshold)
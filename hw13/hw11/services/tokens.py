@@ -0,0 +1,222 @@
+import time
+import uuid
+from enum import IntEnum
+
+from typing import Optional
+
+from fastapi import HTTPException, status
+from jose import JWTError, jwt
+from redis.exceptions import NoScriptError, RedisError
+
+from hw11.conf.config import settings
+
+# The scripts touch only the two keys of one user, both passed in KEYS and
+# sharing the {email} hash tag, so they also run on Redis Cluster.
+# refresh:{email}:jti     hash of the user's families (one per device/login) to their current jti
+# refresh:{email}:expiry  sorted set of the same families scored by their expiry (unix seconds)
+
+# Drops the families that expired before ARGV[1] (now).
+PRUNE = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+if #expired > 0 then
+    redis.call('HDEL', KEYS[1], unpack(expired))
+    redis.call('ZREM', KEYS[2], unpack(expired))
+end
+"""
+
+CREATE_FAMILY = PRUNE + """
+redis.call('HSET', KEYS[1], ARGV[3], ARGV[4])
+redis.call('ZADD', KEYS[2], ARGV[1] + ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+ROTATE = PRUNE + """
+local current = redis.call('HGET', KEYS[1], ARGV[3])
+if not current then
+    return 0
+end
+if current ~= ARGV[4] then
+    redis.call('HDEL', KEYS[1], ARGV[3])
+    redis.call('ZREM', KEYS[2], ARGV[3])
+    return -1
+end
+redis.call('HSET', KEYS[1], ARGV[3], ARGV[5])
+redis.call('ZADD', KEYS[2], ARGV[1] + ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+REVOKE = """
+redis.call('ZREM', KEYS[2], ARGV[1])
+return redis.call('HDEL', KEYS[1], ARGV[1])
+"""
+
+REVOKE_ALL = PRUNE + """
+local revoked = redis.call('HLEN', KEYS[1])
+redis.call('DEL', KEYS[1], KEYS[2])
+return revoked
+"""
+
+
+def access_token_subject(authorization: Optional[str]) -> Optional[str]:
+    """
+    Read the subject of a bearer access token without authenticating the user.
+
+    For deciding how to serve a request before the route authenticates it, e.g.
+    by rate limits or replica routing. The signature and expiry are checked, but
+    the user is not looked up.
+
+    Parameters:
+    - authorization (str | None): The Authorization header.
+
+    Returns:
+    - str | None: The email of the user, or None if there is no valid access token.
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        return None
+    if payload.get("scope") != "access_token":
+        return None
+    return payload.get("sub") or None
+
+
+class Rotation(IntEnum):
+    """
+    Outcome of RefreshTokenStore.rotate().
+    """
+    ROTATED = 1
+    UNKNOWN = 0
+    REUSED = -1
+
+
+class RefreshTokenStore:
+    """
+    Refresh-token families kept in Redis instead of the users table.
+
+    Every login starts a family (one per device) that remembers only the jti of
+    its latest refresh token. Refreshing swaps the jti atomically; presenting an
+    older jti means the token was stolen or replayed, so the whole family is
+    revoked. Families expire together with their newest token.
+    """
+
+    def __init__(self, ttl: int, prefix: str = "refresh"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self.redis = None
+        self._shas = {}
+
+    def _keys(self, email: str) -> list:
+        return [f"{self.prefix}:{{{email}}}:jti", f"{self.prefix}:{{{email}}}:expiry"]
+
+    async def _eval(self, source: str, keys: list, args: list) -> int:
+        if self.redis is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Session store unavailable")
+        try:
+            sha = self._shas.get(source)
+            if sha is not None:
+                try:
+                    return int(await self.redis.evalsha(sha, len(keys), *keys, *args))
+                except NoScriptError:
+                    pass
+            self._shas[source] = await self.redis.script_load(source)
+            return int(await self.redis.evalsha(self._shas[source], len(keys), *keys, *args))
+        except RedisError:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Session store unavailable")
+
+    @staticmethod
+    def new_id() -> str:
+        """
+        Generate a random family or token id.
+
+        Returns:
+        - str: 32 hex characters.
+        """
+        return uuid.uuid4().hex
+
+    async def create_family(self, email: str) -> tuple[str, str]:
+        """
+        Start a new token family for a login.
+
+        Parameters:
+        - email (str): The email of the user (the token subject).
+
+        Returns:
+        - tuple[str, str]: The family id and the jti to put into the first refresh token.
+
+        Raises:
+        - HTTPException: 503 if Redis is not available.
+        """
+        family, jti = self.new_id(), self.new_id()
+        await self._eval(CREATE_FAMILY, self._keys(email), [int(time.time()), self.ttl, family, jti])
+        return family, jti
+
+    async def rotate(self, email: str, family: str, jti: str, new_jti: str) -> Rotation:
+        """
+        Replace the current jti of a family if the presented one matches.
+
+        A mismatch revokes the family, so the legitimate owner and the attacker
+        both have to log in again.
+
+        Parameters:
+        - email (str): The token subject.
+        - family (str): The family id from the token.
+        - jti (str): The jti from the presented token.
+        - new_jti (str): The jti of the token about to be issued.
+
+        Returns:
+        - Rotation: ROTATED, REUSED, or UNKNOWN if the family expired or was revoked.
+
+        Raises:
+        - HTTPException: 503 if Redis is not available.
+        """
+        result = await self._eval(ROTATE, self._keys(email), [int(time.time()), self.ttl, family, jti, new_jti])
+        return Rotation(result)
+
+    async def revoke(self, email: str, family: str) -> None:
+        """
+        Revoke a single family, e.g. on logout from one device.
+
+        Parameters:
+        - email (str): The token subject.
+        - family (str): The family id.
+
+        Raises:
+        - HTTPException: 503 if Redis is not available.
+        """
+        await self._eval(REVOKE, self._keys(email), [family])
+
+    async def revoke_all(self, email: str) -> int:
+        """
+        Revoke every family of a user.
+
+        Parameters:
+        - email (str): The token subject.
+
+        Returns:
+        - int: How many families were revoked.
+
+        Raises:
+        - HTTPException: 503 if Redis is not available.
+        """
+        return await self._eval(REVOKE_ALL, self._keys(email), [int(time.time())])
+
+    async def families(self, email: str) -> set[str]:
+        """
+        Return the live families of a user.
+
+        Parameters:
+        - email (str): The token subject.
+
+        Returns:
+        - set[str]: The family ids that have not expired or been revoked.
+        """
+        return set(await self.redis.zrangebyscore(self._keys(email)[1], f"({int(time.time())}", "+inf"))
@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import csv
+import sys
+
+from hw11.database.db import SessionLocal
+from hw11.repository import users as repository_users
+from hw11.services import importer
+
+
+async def main(args) -> int:
+    """
+    Import a CSV or vCard address book for a user, printing progress to stderr.
+
+    Parameters:
+    - args (argparse.Namespace): The command line arguments.
+
+    Returns:
+    - int: The exit code.
+    """
+    fmt = args.format or importer.detect_format(args.path)
+    async with SessionLocal() as db:
+        user = await repository_users.get_user_by_email(args.email, db)
+        if user is None:
+            print(f"No user with email {args.email}", file=sys.stderr)
+            return 1
+
+        rejects_file = open(args.rejects, "w", newline="", encoding="utf-8") if args.rejects else None
+        writer = csv.writer(rejects_file) if rejects_file else None
+        if writer:
+            writer.writerow(["line", "error", *importer.CSV_FIELDS])
+
+        def on_reject(line, error, row):
+            if writer:
+                writer.writerow([line, error, *(row.get(field, "") for field in importer.CSV_FIELDS)])
+
+        def on_progress(report):
+            print(f"\r{report.total} rows, {report.imported} imported, {report.rejected} rejected, "
+                  f"{report.rows_per_second} rows/s", end="", file=sys.stderr, flush=True)
+
+        try:
+            with open(args.path, encoding="utf-8-sig", errors="replace", newline="") as stream:
+                report = await importer.import_contacts(stream, fmt, user, db, args.chunk_size,
+                                                        on_progress, on_reject)
+        finally:
+            if rejects_file:
+                rejects_file.close()
+    print(file=sys.stderr)
+    print(report.model_dump_json(exclude={"rejects"}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import contacts from a CSV or vCard file.")
+    parser.add_argument("path", help="CSV (first_name,last_name,email,phone,birthday header) or vCard file")
+    parser.add_argument("--email", required=True, help="Email of the user who will own the contacts")
+    parser.add_argument("--format", choices=importer.FORMATS, help="Defaults to a guess from the file name")
+    parser.add_argument("--rejects", help="Write rejected rows to this CSV file")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,47 @@
+import argparse
+import asyncio
+import logging
+import sys
+
+import redis.asyncio as redis
+
+from hw11.conf.config import settings
+from hw11.services.email import create_worker, mail_queue
+from hw11.services.mailer import RedisMailQueue
+
+
+async def main(args) -> int:
+    """
+    Deliver queued mail until interrupted.
+
+    Parameters:
+    - args (argparse.Namespace): The command line arguments.
+
+    Returns:
+    - int: The exit code.
+    """
+    if not isinstance(mail_queue, RedisMailQueue):
+        print("mail_queue is not \"redis\"; mail is delivered by the web process", file=sys.stderr)
+        return 1
+    mail_queue.redis = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0,
+                                   decode_responses=True)
+    if args.recover:
+        logging.info("Requeued %d unfinished jobs", await mail_queue.recover())
+    worker = create_worker()
+    try:
+        await worker.run()
+    finally:
+        logging.info("Stopping: %s", worker.stats())
+        await mail_queue.redis.aclose()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deliver queued mail over pooled SMTP connections.")
+    parser.add_argument("--recover", action="store_true",
+                        help="Requeue jobs a crashed worker left unfinished; only when no other worker runs")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        sys.exit(asyncio.run(main(parser.parse_args())))
+    except KeyboardInterrupt:
+        pass
@@ -1,11 +1,82 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 import redis.asyncio as redis
-from fastapi_limiter import FastAPILimiter
+from sqlalchemy import text
 from hw11.routes import contacts, auth, users
 from hw11.conf.config import settings
+from hw11.database.db import engine, replicas
+from hw11.services.cache import user_cache
+from hw11.services.response_cache import contact_cache
+from hw11.services.auth import auth_service
+from hw11.services import rate_limit
+from hw11.services.email import create_worker, mail_queue
+from hw11.services.mailer import RedisMailQueue
+from hw11.services.avatars import ImmutableStaticFiles
+from hw11.services import metrics
+from hw11.services.sql_profiler import ProfilerMiddleware, sql_profiler
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+
+async def warm_up(r: redis.Redis) -> None:
+    """
+    Open the first Redis and database connections concurrently, so the first requests do not wait for them.
+    A failure is only logged: the request that needs the connection will try again.
+
+    Parameters:
+    - r (redis.Redis): The Redis client.
+    """
+    async def database():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    results = await asyncio.gather(r.ping(), database(), replicas.check(), return_exceptions=True)
+    for name, result in zip(("redis", "database", "replicas"), results):
+        if isinstance(result, Exception):
+            logger.warning("Warming up the %s connection failed: %s", name, result)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts and stops the application.
+    On startup it creates the Redis client and hands it to rate limiting, the user cache, the refresh-token store,
+    the contact response cache, the read-your-writes tracking of the replicas and the mail queue, then warms up the
+    connections (see warm_up). With the in-memory mail queue the mail worker runs in this process. With read
+    replicas configured their health checks start. On shutdown the background tasks are cancelled and awaited, then
+    the replica pools and the Redis client close.
+    """
+    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8",
+                          decode_responses=True)
+    rate_limit.backend.redis = r
+    user_cache.redis = r
+    contact_cache.redis = r
+    replicas.redis = r
+    auth_service.refresh_tokens.redis = r
+    if isinstance(mail_queue, RedisMailQueue):
+        mail_queue.redis = r
+    if settings.warm_up_connections:
+        await warm_up(r)
+    tasks = []
+    if not isinstance(mail_queue, RedisMailQueue):
+        tasks.append(asyncio.create_task(create_worker().run()))
+    if replicas.engines:
+        tasks.append(asyncio.create_task(replicas.run_health_checks(settings.replica_health_interval)))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await replicas.dispose()
+        await r.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [ 
     "http://localhost:3000"
@@ -15,6 +86,10 @@ app.include_router(contacts.router, prefix='/api')
 app.include_router(auth.router, prefix='/api')
 app.include_router(users.router, prefix='/api')
 
+if settings.avatar_storage == "local" and settings.avatar_url_prefix.startswith("/"):
+    app.mount(settings.avatar_url_prefix, ImmutableStaticFiles(directory=settings.avatar_dir, check_dir=False),
+              name="avatars")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -22,16 +97,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# a no-op unless settings.sql_profiler is on (or a test enables it)
+app.add_middleware(ProfilerMiddleware, profiler=sql_profiler)
+# outermost, so the time spent in the other middleware counts too
+app.add_middleware(metrics.MetricsMiddleware)
 
-@app.on_event("startup")
-async def startup():
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
     """
-    This function is called when the application starts up.
-    It initializes the Redis connection and sets up rate limiting.
+    Metrics of this worker process in the Prometheus text format.
     """
-    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8",
-                          decode_responses=True)
-    await FastAPILimiter.init(r)
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,31 @@
+"""Contacts trigram search index
+
+Revision ID: 8b2e4f6a1c3d
+Revises: 3f1d2c7a9b10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4f6a1c3d'
+down_revision: Union[str, None] = '3f1d2c7a9b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Must stay in sync with hw11.database.models.CONTACT_SEARCH_DOCUMENT.
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_contacts_search_trgm ON contacts "
+        "USING gin ((first_name || ' ' || last_name || ' ' || email || ' ' || phone) gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_contacts_search_trgm")
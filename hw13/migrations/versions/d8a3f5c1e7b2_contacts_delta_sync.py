@@ -0,0 +1,43 @@
+"""Contacts delta sync: change sequence, updated_at and tombstones
+
+Revision ID: d8a3f5c1e7b2
+Revises: c5a7e9d2b4f6
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a3f5c1e7b2'
+down_revision: Union[str, None] = 'c5a7e9d2b4f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('contacts_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('contacts_purged_seq', sa.BigInteger(), server_default='0', nullable=False))
+    # Existing rows keep change_seq 0: they are delivered by a full sync, which is
+    # how every client starts, and get a real sequence number on their next write.
+    op.add_column('contacts', sa.Column('change_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('contacts', sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+    op.add_column('contacts', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_contacts_user_id_change_seq', 'contacts', ['user_id', 'change_seq'], unique=False)
+    # purge_tombstones scans by deleted_at; the column is new and empty, so the index builds instantly
+    op.create_index('ix_contacts_deleted_at', 'contacts', ['deleted_at'], unique=False,
+                    postgresql_where=sa.text('deleted_at IS NOT NULL'))
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM contacts WHERE deleted_at IS NOT NULL")
+    op.drop_index('ix_contacts_deleted_at', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_change_seq', table_name='contacts')
+    op.drop_column('contacts', 'deleted_at')
+    op.drop_column('contacts', 'updated_at')
+    op.drop_column('contacts', 'change_seq')
+    op.drop_column('users', 'contacts_purged_seq')
+    op.drop_column('users', 'contacts_seq')
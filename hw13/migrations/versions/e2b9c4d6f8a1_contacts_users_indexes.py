@@ -0,0 +1,34 @@
+"""Case-insensitive email index, drop redundant contacts constraint
+
+Revision ID: e2b9c4d6f8a1
+Revises: d8a3f5c1e7b2
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b9c4d6f8a1'
+down_revision: Union[str, None] = 'd8a3f5c1e7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY builds the index without blocking writes, but cannot run in a
+    # transaction. If the build fails it leaves an INVALID index: drop it and rerun.
+    # The unique email index fails if two accounts differ only in case; merge them first.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True,
+                        postgresql_concurrently=True)
+    op.drop_constraint('unique_tag_user', 'contacts', type_='unique')
+
+
+def downgrade() -> None:
+    op.create_unique_constraint('unique_tag_user', 'contacts', ['id', 'user_id'])
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_email_lower', table_name='users', postgresql_concurrently=True)
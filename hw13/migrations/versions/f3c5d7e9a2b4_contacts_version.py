@@ -0,0 +1,27 @@
+"""Contacts version column for optimistic concurrency
+
+Revision ID: f3c5d7e9a2b4
+Revises: e2b9c4d6f8a1
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c5d7e9a2b4'
+down_revision: Union[str, None] = 'e2b9c4d6f8a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant default is a metadata-only change on Postgres 11+, no table rewrite.
+    op.add_column('contacts', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('contacts', 'version')
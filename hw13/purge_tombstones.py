@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta
+
+from hw11.conf.config import settings
+from hw11.database.db import SessionLocal
+from hw11.repository import contacts as repository_contacts
+
+
+async def main(args) -> int:
+    """
+    Delete contact tombstones older than the retention period.
+
+    Clients whose sync token predates a purged tombstone get 410 and sync from
+    scratch, so the retention should exceed how long a client may stay offline.
+
+    Parameters:
+    - args (argparse.Namespace): The command line arguments.
+
+    Returns:
+    - int: The exit code.
+    """
+    before = datetime.now() - timedelta(days=args.days)
+    async with SessionLocal() as db:
+        purged = await repository_contacts.purge_tombstones(before, db)
+    print(f"Purged {purged} tombstones deleted before {before:%Y-%m-%d %H:%M}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete contact tombstones kept for delta sync.")
+    parser.add_argument("--days", type=int, default=settings.contacts_tombstone_days,
+                        help="Keep tombstones this many days (default: CONTACTS_TOMBSTONE_DAYS)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -1,50 +1,135 @@
+import asyncio
+
+import fakeredis
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from main import app
 from hw11.database.models import Base
 from hw11.database.db import get_db
+from hw11.services.auth import auth_service
+from hw11.services.cache import user_cache
+from hw11.services.sql_profiler import sql_profiler
+from tests.factories import DataFactory
+
+pytest_plugins = ["tests.query_budget"]
+
+
+class LoopLocalFakeRedis:
+    """
+    fakeredis clients are bound to the loop they first ran on, and TestClient
+    starts a new loop for every request; keep one client per loop on a shared server.
+    """
+
+    def __init__(self):
+        self.server = fakeredis.FakeServer()
+        self.clients = {}
+
+    def __getattr__(self, name):
+        loop = asyncio.get_running_loop()
+        if loop not in self.clients:
+            self.clients[loop] = fakeredis.FakeAsyncRedis(server=self.server, decode_responses=True)
+        return getattr(self.clients[loop], name)
+
+
+@pytest.fixture(scope="session")
+def db_engine():
+    # One in-memory database per process, so pytest-xdist workers never share
+    # one. StaticPool hands out its single connection; aiosqlite connections
+    # are not tied to a loop, so TestClient's per-request loops can use it.
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def no_implicit_transactions(dbapi_connection, connection_record):
+        # pysqlite's own BEGIN handling breaks SAVEPOINT; let SQLAlchemy emit BEGIN
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def begin(conn):
+        conn.exec_driver_sql("BEGIN")
 
+    sql_profiler.attach(engine)
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+    async def create_schema():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    asyncio.run(create_schema())
+    yield engine
+    asyncio.run(engine.dispose())
 
 
 @pytest.fixture(scope="module")
-def session():
-    # Create the database
+def connection(db_engine):
+    # Everything a test module writes happens in this transaction and is rolled
+    # back after the module; each test adds a SAVEPOINT of its own (see rollback_test).
+    async def open_connection():
+        conn = await db_engine.connect()
+        await conn.begin()
+        return conn
 
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    conn = asyncio.run(open_connection())
+    yield conn
 
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    async def close_connection():
+        await conn.rollback()
+        await conn.close()
+
+    asyncio.run(close_connection())
+
+
+@pytest.fixture(autouse=True)
+def rollback_test(request):
+    """
+    Roll back the database changes of every test that uses the connection.
+
+    Module-scoped fixtures are set up before this one, so the data they write
+    (a user to log in as, ...) stays for the whole module.
+    """
+    if "connection" not in request.fixturenames:
+        yield
+        return
+    conn = request.getfixturevalue("connection")
+
+    async def begin_nested():
+        return await conn.begin_nested()
+
+    savepoint = asyncio.run(begin_nested())
+    yield
+    asyncio.run(savepoint.rollback())
+    user_cache.clear()
 
 
 @pytest.fixture(scope="module")
-def client(session):
-    # Dependency override
+def factory(connection):
+    return DataFactory(connection)
+
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+@pytest.fixture(scope="module")
+def client(connection):
+    # Dependency override: app sessions join the test transaction, and their
+    # commits only release a SAVEPOINT.
+    session_factory = async_sessionmaker(bind=connection, autoflush=False, expire_on_commit=False,
+                                         join_transaction_mode="create_savepoint")
 
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    redis = auth_service.refresh_tokens.redis
     app.dependency_overrides[get_db] = override_get_db
+    user_cache.clear()
+    auth_service.refresh_tokens.redis = LoopLocalFakeRedis()
 
     yield TestClient(app)
 
+    app.dependency_overrides.pop(get_db, None)
+    auth_service.refresh_tokens.redis = redis
+
 
 @pytest.fixture(scope="module")
 def user():
-    return {"username": "deadpool", "email": "deadpool@example.com", "password": "123456789"}
\ No newline at end of file
+    return {"username": "deadpool", "email": "deadpool@example.com", "password": "123456789"}
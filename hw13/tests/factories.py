@@ -0,0 +1,89 @@
+import asyncio
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from hw11.database.models import Contact, User, month_day
+
+CHUNK = 10_000
+
+
+class DataFactory:
+    """
+    Test data written through the test connection, so it is rolled back with the
+    test (or with the module, when a module-scoped fixture writes it).
+
+    The methods are synchronous, for use in fixtures and in tests driving the
+    TestClient; each one runs on its own short-lived event loop.
+    """
+
+    def __init__(self, connection: AsyncConnection):
+        self.connection = connection
+
+    def run(self, coro):
+        return asyncio.run(coro)
+
+    def user(self, email: str, username: str | None = None, password: str = "x", confirmed: bool = True) -> User:
+        """
+        Insert a user.
+
+        Parameters:
+        - email (str): The email of the user.
+        - username (str, optional): The username. Defaults to the local part of the email.
+        - password (str, optional): The stored password hash. Defaults to "x".
+        - confirmed (bool, optional): Whether the email is confirmed. Defaults to True.
+
+        Returns:
+        - User: The user, detached but loaded.
+        """
+        async def create():
+            async with AsyncSession(bind=self.connection, expire_on_commit=False,
+                                    join_transaction_mode="create_savepoint") as db:
+                user = User(username=username or email.split("@")[0], email=email, password=password,
+                            confirmed=confirmed)
+                db.add(user)
+                await db.commit()
+                return user
+        return self.run(create())
+
+    def contacts(self, user: User, count: int) -> int:
+        """
+        Insert many contacts for a user with executemany INSERTs of CHUNK rows.
+
+        Contact i is First<i> Last<i> <contact<i>@example.com>, born on day i % 365 of 1990.
+
+        Parameters:
+        - user (User): The owner of the contacts.
+        - count (int): How many contacts to insert.
+
+        Returns:
+        - int: The number of contacts inserted.
+        """
+        async def create():
+            birthday = date(1990, 1, 1)
+            for offset in range(0, count, CHUNK):
+                rows = []
+                for i in range(offset, min(offset + CHUNK, count)):
+                    day = birthday + timedelta(days=i % 365)
+                    rows.append({"first_name": f"First{i}", "last_name": f"Last{i}",
+                                 "email": f"contact{i}@example.com", "phone": f"{i:010d}", "birthday": day,
+                                 "birthday_md": month_day(day), "user_id": user.id})
+                await self.connection.execute(insert(Contact.__table__), rows)
+            return count
+        return self.run(create())
+
+    def execute(self, statement):
+        """
+        Run a Core statement, e.g. update(User).values(confirmed=True).
+
+        Parameters:
+        - statement: The statement.
+
+        Returns:
+        - list | int: The rows, or the number of rows affected by a statement that returns none.
+        """
+        async def execute():
+            result = await self.connection.execute(statement)
+            return result.all() if result.returns_rows else result.rowcount
+        return self.run(execute())
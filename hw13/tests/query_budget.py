@@ -0,0 +1,92 @@
+"""
+pytest plugin failing any test whose requests send more SQL statements than
+their endpoint's budget.
+
+The SQL profiler is enabled for the test session; every request a test makes
+through the client is checked against BUDGETS when the test finishes. A
+budget counts every statement of a request, including the user lookup of the
+auth dependency on a cache miss, but not the BEGIN and SAVEPOINT statements of
+the test transaction (see rollback_test in conftest.py). Raise a budget only together with the change
+that needs it; endpoints without one are not checked.
+
+    python -m pytest -q -p no:tests.query_budget   # run without the budgets
+    QUERY_BUDGET_REPORT=1 python -m pytest -q -s   # print the counts of every endpoint
+"""
+import os
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import pytest
+
+from hw11.services.sql_profiler import RequestProfile, sql_profiler
+
+BUDGETS: Dict[str, int] = {
+    "POST /api/auth/signup": 1,
+    "POST /api/auth/login": 1,
+    "GET /api/auth/refresh_token": 0,
+    "POST /api/auth/logout": 0,
+    "GET /api/contacts/": 2,
+    "GET /api/contacts/changes": 2,
+    "GET /api/contacts/{contact_id}": 2,
+    "POST /api/contacts/": 3,
+    "PUT /api/contacts/{contact_id}": 3,
+    "DELETE /api/contacts/{contact_id}": 3,
+    "PATCH /api/users/avatar": 3,
+    "GET /metrics": 0,
+}
+
+# Sent by the test transaction around every request, not by the app.
+FIXTURE_STATEMENTS = ("BEGIN", "SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+_profiles: List[RequestProfile] = []
+_report: Dict[str, int] = defaultdict(int)
+
+
+def app_statements(profile: RequestProfile) -> List[str]:
+    return [statement for statement, _, _, _ in profile.statements
+            if not statement.lstrip().upper().startswith(FIXTURE_STATEMENTS)]
+
+
+def over_budget(profiles: List[RequestProfile]) -> List[Tuple[RequestProfile, int]]:
+    """
+    Find the requests that sent more statements than their endpoint's budget.
+
+    Parameters:
+    - profiles (List[RequestProfile]): The requests of one test.
+
+    Returns:
+    - List[Tuple[RequestProfile, int]]: The offending requests with their budgets.
+    """
+    return [(profile, BUDGETS[profile.endpoint]) for profile in profiles
+            if profile.endpoint in BUDGETS and len(app_statements(profile)) > BUDGETS[profile.endpoint]]
+
+
+def pytest_configure(config):
+    sql_profiler.enabled = True
+    sql_profiler.listeners.append(_profiles.append)
+
+
+def pytest_unconfigure(config):
+    sql_profiler.listeners.remove(_profiles.append)
+    sql_profiler.enabled = False
+    if os.environ.get("QUERY_BUDGET_REPORT"):
+        for endpoint, count in sorted(_report.items()):
+            print(f"{count:4d}  {endpoint}")
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    _profiles.clear()
+    result = yield
+    profiles = list(_profiles)
+    _profiles.clear()
+    for profile in profiles:
+        _report[profile.endpoint] = max(_report[profile.endpoint], len(app_statements(profile)))
+    offending = over_budget(profiles)
+    if offending:
+        pytest.fail("\n".join(
+            f"{profile.endpoint} ({profile.path}) sent {len(app_statements(profile))} SQL statements, "
+            f"budget {budget}:\n    " + "\n    ".join(" ".join(statement.split())
+                                                     for statement in app_statements(profile))
+            for profile, budget in offending), pytrace=False)
+    return result
@@ -0,0 +1,31 @@
+import logging
+from unittest.mock import AsyncMock
+
+import fakeredis
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import main
+from hw11.services import rate_limit
+from hw11.services.cache import user_cache
+from hw11.services.response_cache import contact_cache
+
+
+def test_lifespan(monkeypatch, caplog):
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(main.redis, "Redis", lambda **kwargs: fake)
+    monkeypatch.setattr(fake, "aclose", AsyncMock(wraps=fake.aclose))
+    for target in (rate_limit.backend, user_cache, contact_cache, main.replicas, main.auth_service.refresh_tokens):
+        monkeypatch.setattr(target, "redis", target.redis)
+    # the database is unreachable: startup goes on and leaves it to the first request
+    monkeypatch.setattr(main, "engine", create_async_engine("sqlite+aiosqlite:////nonexistent/app.db"))
+
+    with caplog.at_level(logging.WARNING, "main"):
+        with TestClient(main.app) as client:
+            assert client.get("/").status_code == 200
+            assert user_cache.redis is fake
+            assert rate_limit.backend.redis is fake
+            fake.aclose.assert_not_awaited()
+    fake.aclose.assert_awaited_once()
+    assert [record.getMessage().split(":")[0] for record in caplog.records] == \
+        ["Warming up the database connection failed"]
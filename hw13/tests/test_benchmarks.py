@@ -0,0 +1,45 @@
+import inspect
+import unittest
+
+from benchmarks import bench_startup
+from benchmarks.bench_repository import run
+from benchmarks.common import create_schema, regressions
+from hw11.repository import contacts as repository_contacts
+from hw11.repository import users as repository_users
+
+
+def public_functions(module) -> set:
+    return {name for name, value in vars(module).items()
+            if (inspect.iscoroutinefunction(value) or inspect.isasyncgenfunction(value)) and not name.startswith("_")
+            and value.__module__ == module.__name__}
+
+
+class TestRepositoryBenchmark(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = await create_schema("sqlite+aiosqlite://")
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_every_repository_function_is_measured(self):
+        results = await run(self.engine, users=2, contacts=50, repeat=2, batch=3)
+        expected = {f"contacts.{name}" for name in public_functions(repository_contacts)} | \
+            {f"users.{name}" for name in public_functions(repository_users)}
+        self.assertEqual(set(results), expected)
+        self.assertTrue(all(result["requests"] == 2 for result in results.values()))
+
+
+def test_regressions():
+    baseline = {"results": {"me": {"10": {"rps": 100, "p50_ms": 2.0, "p95_ms": 5.0, "p99_ms": 9.0}}}}
+    current = {"results": {"me": {"10": {"rps": 85, "p50_ms": 2.2, "p95_ms": 7.0, "p99_ms": 90.0}},
+                           "new": {"1": {"rps": 1}}}}
+    assert regressions(baseline, current, 0.2) == ["results.me.10.p95_ms: 5.0 -> 7.0 ms"]
+    assert regressions(baseline, current, 0.1) == ["results.me.10.rps: 100 -> 85 rps",
+                                                   "results.me.10.p95_ms: 5.0 -> 7.0 ms"]
+
+
+def test_startup_leaves_lazy_modules_alone():
+    result = bench_startup.measure(runs=1, top=3)
+    assert result["lazy_modules_imported"] == []
+    assert "fastapi" in result["slowest_imports_ms"]
@@ -0,0 +1,21 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from hw11.database.models import Contact, User
+from hw11.services.auth import auth_service
+
+
+def test_bulk_data(client, factory):
+    owner = factory.user("bulk@example.com")
+    assert factory.contacts(owner, 5_000) == 5_000
+    token = asyncio.run(auth_service.create_access_token(data={"sub": owner.email}))
+    response = client.get("/api/contacts/", params={"skip": 4_950}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 50
+
+
+def test_each_test_is_rolled_back(factory):
+    # runs after test_bulk_data
+    assert factory.execute(select(func.count()).select_from(Contact)) == [(0,)]
+    assert factory.execute(select(User.email)) == []
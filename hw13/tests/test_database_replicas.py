@@ -0,0 +1,130 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import fakeredis
+from redis.exceptions import RedisError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from starlette.requests import Request
+
+from hw11.database import db
+from hw11.database.models import Base, User
+from hw11.database.replicas import ReplicaSet
+from hw11.services.auth import auth_service
+
+
+class BrokenRedis:
+
+    def __getattr__(self, name):
+        raise RedisError("down")
+
+
+def make_request(token):
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "method": "GET", "path": "/api/contacts/", "headers": headers})
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestReplicaSet(unittest.IsolatedAsyncioTestCase):
+    """
+    Two SQLite files stand in for the replicas. Each database holds one user
+    named after it, so a query shows which database answered.
+    """
+
+    async def asyncSetUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        urls = {}
+        for name in ("primary", "replica1", "replica2"):
+            urls[name] = f"sqlite+aiosqlite:///{Path(self.dir.name) / name}.db"
+            engine = create_async_engine(urls[name])
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(insert(User.__table__).values(username=name, email="reader@example.com",
+                                                                 password="x"))
+            await engine.dispose()
+        self.primary_engine = create_async_engine(urls["primary"])
+        self.primary = async_sessionmaker(self.primary_engine)()
+        self.clock = Clock()
+        self.replicas = ReplicaSet([urls["replica1"], urls["replica2"]], sticky_seconds=5, clock=self.clock)
+
+    async def asyncTearDown(self):
+        await self.primary.close()
+        await self.primary_engine.dispose()
+        await self.replicas.dispose()
+        self.dir.cleanup()
+
+    async def read(self, client=None):
+        async with self.replicas.session(client, self.primary) as db:
+            return await db.scalar(select(User.username))
+
+    async def test_round_robin(self):
+        self.assertEqual([await self.read() for _ in range(3)], ["replica1", "replica2", "replica1"])
+
+    async def test_least_connections(self):
+        self.replicas.strategy = "least_connections"
+        async with self.replicas.session(None, self.primary):
+            self.assertEqual([await self.read() for _ in range(2)], ["replica2", "replica2"])
+        self.assertEqual(self.replicas.in_flight, [0, 0])
+
+    async def test_health_checks(self):
+        await self.replicas.engines[0].dispose()
+        self.replicas.engines[0] = create_async_engine("sqlite+aiosqlite:////nonexistent/replica1.db")
+        self.assertEqual(await self.replicas.check(), [False, True])
+        self.assertEqual([await self.read() for _ in range(2)], ["replica2", "replica2"])
+        self.replicas.healthy = [False, False]
+        self.assertEqual(await self.read(), "primary")
+
+    async def test_read_your_writes(self):
+        self.replicas.redis = fakeredis.FakeAsyncRedis()
+        await self.replicas.mark_write("writer@example.com")
+        self.assertEqual(await self.read("writer@example.com"), "primary")
+        self.assertEqual(await self.read("reader@example.com"), "replica1")
+        self.replicas._writers.clear()
+        self.assertEqual(await self.read("writer@example.com"), "primary", "another worker marked the write")
+        await self.replicas.redis.flushall()
+        self.clock.now = 6
+        self.assertEqual(await self.read("writer@example.com"), "replica2")
+
+    async def test_no_redis_round_trip_without_a_replica(self):
+        self.replicas.redis = BrokenRedis()
+        self.replicas.healthy = [False, False]
+        self.assertEqual(await self.read("writer@example.com"), "primary")
+        self.replicas.healthy = [True, True]
+        self.assertEqual(await self.read("writer@example.com"), "primary", "fails safe to the primary")
+
+    async def test_stickiness_follows_the_user_across_tokens(self):
+        laptop, phone = [await auth_service.create_access_token(data={"sub": "writer@example.com"}, expires_delta=delta)
+                         for delta in (60, 120)]
+        with patch.object(db, "replicas", self.replicas):
+            async for session in db.get_write_db(make_request(laptop), self.primary):
+                self.assertIs(session, self.primary)
+            async for session in db.get_read_db(make_request(phone), self.primary):
+                self.assertIs(session, self.primary)
+            async for session in db.get_read_db(make_request(None), self.primary):
+                self.assertIsNot(session, self.primary)
+
+    async def test_sticky_window_starts_at_the_commit(self):
+        token = await auth_service.create_access_token(data={"sub": "writer@example.com"})
+        with patch.object(db, "replicas", self.replicas):
+            write = db.get_write_db(make_request(token), self.primary)
+            await anext(write)
+            self.clock.now = 6
+            with self.assertRaises(StopAsyncIteration):
+                await anext(write)
+            self.clock.now = 10
+            async for session in db.get_read_db(make_request(token), self.primary):
+                self.assertIs(session, self.primary, "the list read after a slow write")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from sqlalchemy import text
+
+from benchmarks.check_indexes import check, seed
+from benchmarks.common import create_schema
+
+
+class TestIndexCheck(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = await create_schema("sqlite+aiosqlite://")
+        self.user = await seed(self.engine, users=4, contacts=5000)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_hot_paths_use_indexes(self):
+        self.assertEqual(await check(self.engine, self.user), [])
+
+    async def test_missing_index_is_reported(self):
+        async with self.engine.begin() as conn:
+            await conn.execute(text("DROP INDEX ix_users_email_lower"))
+        findings = await check(self.engine, self.user)
+        self.assertEqual([finding["call"] for finding in findings], ["users.get_user_by_email"])
+        self.assertEqual(findings[0]["scans"], ["SCAN users"])
@@ -0,0 +1,261 @@
+import unittest
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from hw11.database.models import Base, Contact, User
+from hw11.schemas import ContactModel, ContactUpdateItem
+from hw11.repository.contacts import (
+    search_contacts,
+    create_contact,
+    update_contact,
+    remove_contact,
+    upcoming_birthdays,
+    create_contacts,
+    update_contacts,
+    remove_contacts,
+    get_contact,
+    get_contacts,
+    get_changes,
+    purge_tombstones,
+    StaleSyncToken,
+    StaleVersion,
+)
+
+
+class SQLiteTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)()
+        self.user = User(email="owner@example.com", password="x")
+        self.other = User(email="other@example.com", password="x")
+        self.session.add_all([self.user, self.other])
+        await self.session.commit()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+
+class TestContactsSearch(SQLiteTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        for first_name, last_name, owner in [("John", "Smith", self.user), ("Johnny", "Walker", self.user),
+                                             ("Jane", "Doe", self.user), ("John", "Other", self.other)]:
+            self.session.add(Contact(first_name=first_name, last_name=last_name, email=f"{last_name}@example.com",
+                                     phone="0000000000", birthday=date(1990, 1, 1), user_id=owner.id))
+        await self.session.commit()
+
+    async def test_search_scoped_to_user(self):
+        result = await search_contacts("john", self.user, self.session)
+        self.assertEqual({c.last_name for c in result}, {"Smith", "Walker"})
+
+    async def test_search_all_words(self):
+        result = await search_contacts("john smi", self.user, self.session)
+        self.assertEqual([c.last_name for c in result], ["Smith"])
+
+    async def test_search_no_words(self):
+        self.assertEqual(await search_contacts("!!", self.user, self.session), [])
+
+    async def test_search_follows_writes(self):
+        body = ContactModel(first_name="Zed", last_name="Zulu", email="zed@example.com", phone="1",
+                            birthday=date(1990, 1, 1))
+        contact = await create_contact(body, self.user, self.session)
+        self.assertEqual(len(await search_contacts("zed", self.user, self.session)), 1)
+        body.first_name, body.email = "Yan", "yan@example.com"
+        await update_contact(contact.id, body, self.user, self.session)
+        self.assertEqual(await search_contacts("zed", self.user, self.session), [])
+        await remove_contact(contact.id, self.user, self.session)
+        self.assertEqual(await search_contacts("yan", self.user, self.session), [])
+
+
+class TestUpcomingBirthdays(SQLiteTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        for name, birthday, owner in [("Dec30", date(1980, 12, 30), self.user), ("Jan02", date(1995, 1, 2), self.user),
+                                      ("Feb29", date(1996, 2, 29), self.user), ("Mar01", date(1990, 3, 1), self.user),
+                                      ("Other", date(1990, 12, 31), self.other)]:
+            self.session.add(Contact(first_name=name, last_name=name, email=f"{name}@example.com",
+                                     phone="0000000000", birthday=birthday, user_id=owner.id))
+        await self.session.commit()
+
+    async def names(self, today, days):
+        return [c.first_name for c in await upcoming_birthdays(self.user, self.session, days, today)]
+
+    async def test_ignores_birth_year(self):
+        self.assertEqual(await self.names(date(2026, 12, 28), 3), ["Dec30"])
+
+    async def test_wraps_year_in_order(self):
+        self.assertEqual(await self.names(date(2026, 12, 29), 7), ["Dec30", "Jan02"])
+
+    async def test_feb29_in_non_leap_year(self):
+        self.assertEqual(await self.names(date(2027, 2, 21), 7), ["Feb29"])
+        self.assertEqual(await self.names(date(2027, 3, 1), 7), ["Mar01"])
+
+    async def test_feb29_in_leap_year(self):
+        self.assertEqual(await self.names(date(2028, 2, 22), 8), ["Feb29", "Mar01"])
+        self.assertEqual(await self.names(date(2028, 2, 22), 6), [])
+
+
+class TestContactsBatch(SQLiteTestCase):
+
+    def body(self, i):
+        return ContactModel(first_name=f"First{i}", last_name=f"Last{i}", email=f"c{i}@example.com",
+                            phone=str(i), birthday=date(1990, 1, 1 + i))
+
+    async def test_create_contacts(self):
+        result = await create_contacts([self.body(i) for i in range(3)], self.user, self.session)
+        self.assertEqual([r["status"] for r in result], ["created"] * 3)
+        self.assertEqual([r["contact"].first_name for r in result], ["First0", "First1", "First2"])
+        self.assertEqual(result[2]["contact"].birthday_md, 103)
+        self.assertEqual(len(await get_contacts(0, 10, self.user, self.session)), 3)
+
+    async def test_update_contacts(self):
+        created = await create_contacts([self.body(i) for i in range(2)], self.user, self.session)
+        foreign = await create_contacts([self.body(9)], self.other, self.session)
+        ids = [created[0]["contact"].id, foreign[0]["contact"].id]
+        untouched = created[1]["contact"].id
+        items = [ContactUpdateItem(id=contact_id, **self.body(5).model_dump()) for contact_id in ids]
+        result = await update_contacts(items, self.user, self.session)
+        self.assertEqual([r["status"] for r in result], ["updated", "not_found"])
+        self.assertEqual(result[0]["contact"].id, ids[0])
+        self.assertEqual(result[0]["contact"].first_name, "First5")
+        self.assertEqual(result[0]["contact"].version, 2)
+        self.session.expunge_all()
+        contacts = {c.id: c for c in await get_contacts(0, 10, self.user, self.session)}
+        self.assertEqual(contacts[ids[0]].first_name, "First5")
+        self.assertEqual(contacts[ids[0]].birthday_md, 106)
+        self.assertEqual(contacts[untouched].first_name, "First1")
+
+    async def test_get_contact_by_id(self):
+        mine = await create_contact(self.body(0), self.user, self.session)
+        foreign = await create_contact(self.body(1), self.other, self.session)
+        self.assertEqual((await get_contact(self.session, self.user, contact_id=mine.id)).id, mine.id)
+        self.assertIsNone(await get_contact(self.session, self.user, contact_id=foreign.id))
+        self.assertIsNone(await get_contact(self.session, self.user, email="nobody", contact_id=mine.id))
+
+    async def test_remove_contacts(self):
+        created = await create_contacts([self.body(i) for i in range(2)], self.user, self.session)
+        foreign = await create_contacts([self.body(9)], self.other, self.session)
+        ids = [created[1]["contact"].id, foreign[0]["contact"].id]
+        result = await remove_contacts(ids, self.user, self.session)
+        self.assertEqual([r["status"] for r in result], ["deleted", "not_found"])
+        self.assertEqual(result[0]["contact"].first_name, "First1")
+        self.assertEqual(len(await get_contacts(0, 10, self.user, self.session)), 1)
+        self.assertEqual(len(await get_contacts(0, 10, self.other, self.session)), 1)
+
+
+class TestContactChanges(SQLiteTestCase):
+
+    def body(self, i):
+        return ContactModel(first_name=f"First{i}", last_name=f"Last{i}", email=f"c{i}@example.com",
+                            phone=str(i), birthday=date(1990, 1, 1 + i))
+
+    async def test_delta_sync(self):
+        first = await create_contact(self.body(0), self.user, self.session)
+        second = await create_contact(self.body(1), self.user, self.session)
+        await create_contact(self.body(2), self.other, self.session)
+        full = await get_changes(self.user, self.session)
+        self.assertEqual([c.id for c in full["changed"]], [first.id, second.id])
+        self.assertFalse(full["has_more"])
+
+        await update_contact(first.id, self.body(5), self.user, self.session)
+        await remove_contact(second.id, self.user, self.session)
+        created = await create_contacts([self.body(3), self.body(4)], self.user, self.session)
+        delta = await get_changes(self.user, self.session, full["token"])
+        self.assertEqual([c.first_name for c in delta["changed"]], ["First5", "First3", "First4"])
+        self.assertEqual(delta["deleted"], [second.id])
+        self.assertEqual(await get_changes(self.user, self.session, delta["token"]),
+                         {"changed": [], "deleted": [], "token": delta["token"], "has_more": False})
+        self.assertNotIn(second.id, [c.id for c in await get_contacts(0, 10, self.user, self.session)])
+
+        page = await get_changes(self.user, self.session, full["token"], limit=3)
+        self.assertTrue(page["has_more"])
+        rest = await get_changes(self.user, self.session, page["token"], limit=3)
+        self.assertEqual([c.id for c in rest["changed"]], [created[1]["contact"].id])
+
+    async def test_purged_tombstones_expire_tokens(self):
+        contact = await create_contact(self.body(0), self.user, self.session)
+        token = (await get_changes(self.user, self.session))["token"]
+        await remove_contact(contact.id, self.user, self.session)
+        self.assertEqual(await purge_tombstones(datetime.now() + timedelta(days=1), self.session), 1)
+        with self.assertRaises(StaleSyncToken):
+            await get_changes(self.user, self.session, token)
+        fresh = await get_changes(self.user, self.session)
+        self.assertEqual(fresh["changed"], [])
+        self.assertEqual((await get_changes(self.user, self.session, fresh["token"]))["deleted"], [])
+
+    async def test_full_sync_pages_through_legacy_rows(self):
+        # rows written before delta sync keep change_seq 0 (see migration d8a3f5c1e7b2)
+        created = await create_contacts([self.body(i) for i in range(5)], self.user, self.session)
+        await self.session.execute(update(Contact).values(change_seq=0))
+        await self.session.commit()
+        ids, token, has_more = [], "", True
+        while has_more:
+            page = await get_changes(self.user, self.session, token, limit=2)
+            ids += [c.id for c in page["changed"]]
+            token, has_more = page["token"], page["has_more"]
+        self.assertEqual(ids, [r["contact"].id for r in created])
+        await remove_contact(ids[0], self.user, self.session)
+        self.assertEqual((await get_changes(self.user, self.session, token))["deleted"], [ids[0]])
+
+    async def test_purge_does_not_expire_a_full_sync(self):
+        removed = await create_contact(self.body(0), self.user, self.session)
+        await create_contacts([self.body(i) for i in range(1, 4)], self.user, self.session)
+        await self.session.execute(update(Contact).values(change_seq=0))
+        await self.session.commit()
+        await remove_contact(removed.id, self.user, self.session)
+        await purge_tombstones(datetime.now() + timedelta(days=1), self.session)
+        page = await get_changes(self.user, self.session, limit=2)
+        rest = await get_changes(self.user, self.session, page["token"], limit=2)
+        self.assertEqual(len(page["changed"]) + len(rest["changed"]), 3)
+        self.assertFalse(rest["has_more"])
+
+    async def test_empty_full_sync_after_purge(self):
+        contact = await create_contact(self.body(0), self.user, self.session)
+        await remove_contact(contact.id, self.user, self.session)
+        await purge_tombstones(datetime.now() + timedelta(days=1), self.session)
+        token = (await get_changes(self.user, self.session))["token"]
+        created = await create_contact(self.body(1), self.user, self.session)
+        delta = await get_changes(self.user, self.session, token)
+        self.assertEqual([c.id for c in delta["changed"]], [created.id])
+
+
+class TestContactVersions(SQLiteTestCase):
+
+    def body(self, i):
+        return ContactModel(first_name=f"First{i}", last_name=f"Last{i}", email=f"c{i}@example.com",
+                            phone=str(i), birthday=date(1990, 1, 1 + i))
+
+    async def test_conditional_update(self):
+        contact = await create_contact(self.body(0), self.user, self.session)
+        self.assertEqual(contact.version, 1)
+        updated = await update_contact(contact.id, self.body(1), self.user, self.session, expected_versions=[1])
+        self.assertEqual((updated.version, updated.first_name, updated.birthday_md), (2, "First1", 102))
+        with self.assertRaises(StaleVersion):
+            await update_contact(contact.id, self.body(2), self.user, self.session, expected_versions=[1])
+        with self.assertRaises(StaleVersion):
+            await remove_contact(contact.id, self.user, self.session, expected_versions=[])
+        self.assertEqual((await get_contacts(0, 10, self.user, self.session))[0].first_name, "First1")
+        self.assertIsNotNone(await remove_contact(contact.id, self.user, self.session, expected_versions=[1, 2]))
+
+    async def test_missing_contact_is_not_stale(self):
+        contact = await create_contact(self.body(0), self.other, self.session)
+        self.assertIsNone(await update_contact(contact.id, self.body(1), self.user, self.session, expected_versions=[1]))
+        self.assertIsNone(await remove_contact(contact.id, self.user, self.session, expected_versions=[1]))
+
+    async def test_batch_update_bumps_version(self):
+        contact = await create_contact(self.body(0), self.user, self.session)
+        await update_contacts([ContactUpdateItem(id=contact.id, **self.body(1).model_dump())], self.user, self.session)
+        with self.assertRaises(StaleVersion):
+            await update_contact(contact.id, self.body(2), self.user, self.session, expected_versions=[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,22 +1,40 @@
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import update
 
 from hw11.database.models import User
 
 
-def test_create_user(client, user, monkeypatch):
+@pytest.fixture(scope="module")
+def signed_up(client, user):
+    # signed up for the whole module; tests that need the email confirmed ask for `confirmed`
+    with patch("hw11.routes.auth.send_email"):
+        response = client.post("/api/auth/signup", json=user)
+    assert response.status_code == 201, response.text
+    return response.json()["user"]
+
+
+@pytest.fixture()
+def confirmed(factory, signed_up):
+    factory.execute(update(User).filter(User.id == signed_up["id"]).values(confirmed=True))
+
+
+def test_create_user(client, monkeypatch):
     mock_send_email = MagicMock()
     monkeypatch.setattr("hw11.routes.auth.send_email", mock_send_email)
+    newcomer = {"username": "wadewilson", "email": "wade@example.com", "password": "123456789"}
     response = client.post(
         "/api/auth/signup",
-        json=user,
+        json=newcomer,
     )
     assert response.status_code == 201, response.text
     data = response.json()
-    assert data["user"]["email"] == user.get("email")
+    assert data["user"]["email"] == newcomer.get("email")
     assert "id" in data["user"]
 
 
-def test_repeat_create_user(client, user):
+def test_repeat_create_user(client, user, signed_up):
     response = client.post(
         "/api/auth/signup",
         json=user,
@@ -26,7 +44,7 @@ def test_repeat_create_user(client, user):
     assert data["detail"] == "Account already exists"
 
 
-def test_login_user_not_confirmed(client, user):
+def test_login_user_not_confirmed(client, user, signed_up):
     response = client.post(
         "/api/auth/login",
         data={"username": user.get('email'), "password": user.get('password')},
@@ -36,10 +54,7 @@ def test_login_user_not_confirmed(client, user):
     assert data["detail"] == "Email not confirmed"
 
 
-def test_login_user(client, session, user):
-    current_user: User = session.query(User).filter(User.email == user.get('email')).first()
-    current_user.confirmed = True
-    session.commit()
+def test_login_user(client, user, confirmed):
     response = client.post(
         "/api/auth/login",
         data={"username": user.get('email'), "password": user.get('password')},
@@ -49,7 +64,15 @@ def test_login_user(client, session, user):
     assert data["token_type"] == "bearer"
 
 
-def test_login_wrong_password(client, user):
+def test_login_email_ignores_case(client, user, confirmed):
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email').upper(), "password": user.get('password')},
+    )
+    assert response.status_code == 200, response.text
+
+
+def test_login_wrong_password(client, user, confirmed):
     response = client.post(
         "/api/auth/login",
         data={"username": user.get('email'), "password": 'password'},
@@ -66,4 +89,40 @@ def test_login_wrong_email(client, user):
     )
     assert response.status_code == 401, response.text
     data = response.json()
-    assert data["detail"] == "Invalid email"
\ No newline at end of file
+    assert data["detail"] == "Invalid email"
+
+
+def test_refresh_token_rotation(client, user, confirmed):
+    login = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    ).json()
+    response = client.get("/api/auth/refresh_token",
+                          headers={"Authorization": f"Bearer {login['refresh_token']}"})
+    assert response.status_code == 200, response.text
+    rotated = response.json()["refresh_token"]
+    assert rotated != login["refresh_token"]
+
+    # replaying the old token revokes the family, so the new one stops working too
+    response = client.get("/api/auth/refresh_token",
+                          headers={"Authorization": f"Bearer {login['refresh_token']}"})
+    assert response.status_code == 401, response.text
+    assert response.json()["detail"] == "Invalid refresh token"
+    response = client.get("/api/auth/refresh_token", headers={"Authorization": f"Bearer {rotated}"})
+    assert response.status_code == 401, response.text
+
+
+def test_logout_everywhere(client, user, confirmed):
+    form = {"username": user.get('email'), "password": user.get('password')}
+    phone, laptop = client.post("/api/auth/login", data=form).json(), client.post("/api/auth/login", data=form).json()
+    response = client.post("/api/auth/logout", headers={"Authorization": f"Bearer {phone['refresh_token']}"})
+    assert response.status_code == 200, response.text
+    assert client.get("/api/auth/refresh_token",
+                      headers={"Authorization": f"Bearer {phone['refresh_token']}"}).status_code == 401
+    assert client.get("/api/auth/refresh_token",
+                      headers={"Authorization": f"Bearer {laptop['refresh_token']}"}).status_code == 200
+    response = client.post("/api/auth/logout", params={"everywhere": True},
+                           headers={"Authorization": f"Bearer {phone['refresh_token']}"})
+    assert response.status_code == 200, response.text
+    assert client.get("/api/auth/refresh_token",
+                      headers={"Authorization": f"Bearer {laptop['refresh_token']}"}).status_code == 401
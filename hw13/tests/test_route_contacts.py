@@ -0,0 +1,115 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+from hw11.services.auth import auth_service
+
+CONTACT = {"first_name": "Peter", "last_name": "Parker", "email": "peter@example.com", "phone": "+380501112233",
+           "birthday": "2001-08-10"}
+
+
+@pytest.fixture(scope="module")
+def headers(factory):
+    user = factory.user("spiderman@example.com")
+    token = asyncio.run(auth_service.create_access_token(data={"sub": user.email}))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_read_contacts_conditional(client, headers):
+    first = client.get("/api/contacts/", headers=headers)
+    assert first.status_code == 200, first.text
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    unchanged = client.get("/api/contacts/", headers={**headers, "If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+
+    created = client.post("/api/contacts/", json=CONTACT, headers=headers)
+    assert created.status_code == 201, created.text
+    changed = client.get("/api/contacts/", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert [contact["email"] for contact in changed.json()] == [CONTACT["email"]]
+
+
+def test_read_contacts_rejects_invalid_paging(client, factory):
+    # a user of its own: the list endpoint allows five requests a minute per user
+    user = factory.user("paging@example.com")
+    headers = {"Authorization": f"Bearer {asyncio.run(auth_service.create_access_token(data={'sub': user.email}))}"}
+    assert client.get("/api/contacts/", params={"limit": -1}, headers=headers).status_code == 422
+    assert client.get("/api/contacts/", params={"skip": -1}, headers=headers).status_code == 422
+    assert client.get("/api/contacts/", params={"limit": 0, "cursor": ""}, headers=headers).status_code == 422
+    crafted = base64.urlsafe_b64encode(json.dumps({"o": "id", "k": [[1]]}).encode()).decode()
+    assert client.get("/api/contacts/", params={"cursor": crafted}, headers=headers).status_code == 400
+
+
+def test_search_rejects_negative_skip(client, headers):
+    assert client.get("/api/contacts/search", params={"q": "Parker", "skip": -1}, headers=headers).status_code == 422
+
+
+def test_find_contact_not_found_has_no_etag(client, headers):
+    response = client.get("/api/contacts/0", params={"email": "nobody@"}, headers=headers)
+    assert response.status_code == 404
+    assert "etag" not in response.headers
+
+
+def test_changes(client, headers):
+    contact_id = client.post("/api/contacts/", json=CONTACT, headers=headers).json()["id"]
+    full = client.get("/api/contacts/changes", headers=headers)
+    assert full.status_code == 200, full.text
+    assert [contact["id"] for contact in full.json()["changed"]] == [contact_id]
+    assert client.delete(f"/api/contacts/{contact_id}", headers=headers).status_code == 200
+
+    delta = client.get("/api/contacts/changes", params={"since": full.json()["token"]}, headers=headers)
+    assert delta.json()["changed"] == []
+    assert delta.json()["deleted"] == [contact_id]
+    assert delta.json()["token"] != full.json()["token"]
+    invalid = client.get("/api/contacts/changes", params={"since": "garbage"}, headers=headers)
+    assert invalid.status_code == 400
+
+
+def test_if_match(client, headers):
+    created = client.post("/api/contacts/", json=CONTACT, headers=headers)
+    contact_id = created.json()["id"]
+    assert created.headers["etag"] == f'"{contact_id}-1"'
+    url = f"/api/contacts/{contact_id}"
+
+    updated = client.put(url, json={**CONTACT, "first_name": "Pete"},
+                         headers={**headers, "If-Match": f'"{contact_id}-1"'})
+    assert updated.status_code == 200, updated.text
+    assert updated.headers["etag"] == f'"{contact_id}-2"'
+    assert updated.json()["version"] == 2
+    stale = client.put(url, json=CONTACT, headers={**headers, "If-Match": f'"{contact_id}-1"'})
+    assert stale.status_code == 412
+    assert client.delete(url, headers={**headers, "If-Match": f'W/"{contact_id}-2"'}).status_code == 412
+    assert client.delete(url, headers={**headers, "If-Match": f'"{contact_id}-2"'}).status_code == 200
+    assert client.put(url, json=CONTACT, headers={**headers, "If-Match": f'"{contact_id}-2"'}).status_code == 404
+
+
+def test_if_match_with_the_etag_of_a_read(client, factory):
+    user = factory.user("ironman@example.com")
+    headers = {"Authorization": f"Bearer {asyncio.run(auth_service.create_access_token(data={'sub': user.email}))}"}
+    contact_id = client.post("/api/contacts/", json=CONTACT, headers=headers).json()["id"]
+    other_id = client.post("/api/contacts/", json={**CONTACT, "email": "mj@example.com"}, headers=headers).json()["id"]
+    url = f"/api/contacts/{contact_id}"
+    read = client.get(url, headers=headers)
+    assert read.status_code == 200, read.text
+    assert read.json()["id"] == contact_id
+    etag = read.headers["etag"]
+    assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    # both contacts are at version 1; the tag of one must not stand for the other
+    other_etag = f'"{other_id}-1"'
+    assert client.get(url, headers={**headers, "If-None-Match": other_etag}).status_code == 200
+    assert client.put(url, json=CONTACT, headers={**headers, "If-Match": other_etag}).status_code == 412
+
+    updated = client.put(url, json={**CONTACT, "first_name": "Pete"}, headers={**headers, "If-Match": etag})
+    assert updated.status_code == 200, updated.text
+    stale = client.put(url, json=CONTACT, headers={**headers, "If-Match": etag})
+    assert stale.status_code == 412
+    reread = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert reread.status_code == 200
+    assert reread.headers["etag"] == updated.headers["etag"] == f'"{contact_id}-2"'
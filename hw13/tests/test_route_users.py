@@ -0,0 +1,71 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from hw11.services import avatars
+from hw11.services.auth import auth_service
+
+
+def make_image(color="red", size=(800, 600), fmt="PNG"):
+    out = io.BytesIO()
+    Image.new("RGB", size, color).save(out, fmt)
+    return out.getvalue()
+
+
+@pytest.fixture(scope="module")
+def token(factory):
+    user = factory.user("wolverine@example.com")
+    return asyncio.run(auth_service.create_access_token(data={"sub": user.email}))
+
+
+@pytest.fixture()
+def storage(tmp_path, monkeypatch):
+    storage = avatars.LocalStorage(str(tmp_path), "/media/avatars")
+    monkeypatch.setattr(avatars, "storage", storage)
+    return storage
+
+
+def test_update_avatar(client, token, storage):
+    response = client.patch("/api/users/avatar", headers={"Authorization": f"Bearer {token}"},
+                            files={"file": ("me.png", make_image(), "image/png")})
+    assert response.status_code == 200, response.text
+    avatar = response.json()["avatar"]
+    assert avatar.startswith("/media/avatars/") and avatar.endswith("_250.webp")
+    files = sorted(path.name for path in storage.root.iterdir())
+    assert len(files) == 2
+    with Image.open(storage.root / avatar.rsplit("/", 1)[1]) as image:
+        assert image.size == (250, 250)
+
+
+def test_update_avatar_dedup(client, token, storage, monkeypatch):
+    headers = {"Authorization": f"Bearer {token}"}
+    first = client.patch("/api/users/avatar", headers=headers, files={"file": ("me.png", make_image("blue"))})
+    monkeypatch.setattr(avatars, "render_sizes", None)  # must not be called again
+    second = client.patch("/api/users/avatar", headers=headers, files={"file": ("me.png", make_image("blue"))})
+    assert second.status_code == 200, second.text
+    assert first.json()["avatar"] == second.json()["avatar"]
+
+
+def test_update_avatar_too_large(client, token, storage, monkeypatch):
+    monkeypatch.setattr(avatars.settings, "avatar_max_bytes", 1000)
+    response = client.patch("/api/users/avatar", headers={"Authorization": f"Bearer {token}"},
+                            files={"file": ("me.bmp", make_image(fmt="BMP"))})
+    assert response.status_code == 413, response.text
+    assert list(storage.root.iterdir()) == []
+
+
+def test_update_avatar_not_an_image(client, token, storage):
+    response = client.patch("/api/users/avatar", headers={"Authorization": f"Bearer {token}"},
+                            files={"file": ("me.png", b"not an image")})
+    assert response.status_code == 400, response.text
+
+
+def test_avatar_cache_headers(tmp_path):
+    from fastapi.testclient import TestClient
+    (tmp_path / "abc_250.webp").write_bytes(b"webp")
+    files = TestClient(avatars.ImmutableStaticFiles(directory=tmp_path))
+    response = files.get("/abc_250.webp")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
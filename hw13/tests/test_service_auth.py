@@ -0,0 +1,49 @@
+import asyncio
+import threading
+import unittest
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from hw11.services.auth import Auth
+from hw11.services.hashing import HashingPool
+
+
+class TestPasswordHashing(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.auth = Auth()
+        self.auth.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4)
+        self.auth.hash_pool = HashingPool(workers=2, max_queue=0)
+
+    async def test_hash_and_verify(self):
+        hashed = await self.auth.get_password_hash("123456789")
+        self.assertTrue(await self.auth.verify_password("123456789", hashed))
+        self.assertFalse(await self.auth.verify_password("wrong", hashed))
+        self.assertEqual(self.auth.hash_pool.stats()["jobs"], 3)
+
+    async def test_rehash_when_rounds_change(self):
+        hashed = await self.auth.get_password_hash("123456789")
+        self.assertEqual(await self.auth.verify_and_update_password("123456789", hashed), (True, None))
+        self.auth.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5)
+        valid, new_hash = await self.auth.verify_and_update_password("123456789", hashed)
+        self.assertTrue(valid)
+        self.assertTrue(new_hash.startswith("$2b$05$"))
+
+    async def test_pool_rejects_when_full(self):
+        release = threading.Event()
+        pool = HashingPool(workers=1, max_queue=1)
+        running = [asyncio.create_task(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with self.assertRaises(HTTPException) as e:
+            await pool.run(release.wait)
+        self.assertEqual(e.exception.status_code, 503)
+        release.set()
+        await asyncio.gather(*running)
+        stats = pool.stats()
+        self.assertEqual((stats["jobs"], stats["rejected"], stats["pending"]), (2, 1, 0))
+        self.assertGreaterEqual(stats["max_queue_seconds"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from datetime import datetime
+
+from redis.exceptions import ConnectionError
+
+from hw11.database.models import User
+from hw11.services.cache import UserCache
+
+
+class FakeRedis:
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+class BrokenRedis:
+
+    async def get(self, key):
+        raise ConnectionError()
+
+    async def set(self, key, value, ex=None):
+        raise ConnectionError()
+
+    async def delete(self, key):
+        raise ConnectionError()
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = UserCache(maxsize=2, ttl=10, clock=lambda: self.now)
+        self.user = User(id=1, username="deadpool", email="deadpool@example.com", password="hash",
+                         created_at=datetime(2024, 5, 1, 12, 0), avatar="url", confirmed=True)
+
+    async def test_miss_then_hit(self):
+        self.assertIsNone(await self.cache.get(self.user.email))
+        await self.cache.set(self.user)
+        cached = await self.cache.get(self.user.email)
+        self.assertEqual((cached.id, cached.email, cached.created_at), (1, self.user.email, self.user.created_at))
+        self.assertIsNone(cached.password)
+        self.assertEqual(self.cache.stats()["local_hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    async def test_ttl(self):
+        await self.cache.set(self.user)
+        self.now = 11
+        self.assertIsNone(await self.cache.get(self.user.email))
+
+    async def test_lru_eviction(self):
+        for i in range(3):
+            await self.cache.set(User(id=i, email=f"{i}@example.com", created_at=None))
+        self.assertIsNone(await self.cache.get("0@example.com"))
+        self.assertIsNotNone(await self.cache.get("2@example.com"))
+
+    async def test_redis_tier_and_invalidate(self):
+        redis = FakeRedis()
+        self.cache.redis = redis
+        await self.cache.set(self.user)
+        other_worker = UserCache(clock=lambda: self.now)
+        other_worker.redis = redis
+        self.assertEqual((await other_worker.get(self.user.email)).id, 1)
+        self.assertEqual(other_worker.stats()["redis_hits"], 1)
+        await self.cache.invalidate(self.user.email)
+        self.assertIsNone(await self.cache.get(self.user.email))
+        self.assertEqual(redis.data, {})
+
+    async def test_redis_errors_fall_through(self):
+        self.cache.redis = BrokenRedis()
+        await self.cache.set(self.user)
+        self.assertIsNotNone(await self.cache.get(self.user.email))
+        await self.cache.invalidate(self.user.email)
+        self.assertIsNone(await self.cache.get(self.user.email))
+        self.assertEqual(self.cache.stats()["redis_errors"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import socket
+import unittest
+
+import fakeredis
+from aiosmtpd.controller import Controller
+
+from hw11.services.email import render_message, send_email
+from hw11.services.mailer import MailWorker, MemoryMailQueue, RedisMailQueue, SMTPPool
+
+
+def job(i, to="deadpool@example.com"):
+    return json.dumps({"id": str(i), "to": to, "subject": "Confirm your email", "template": "email_template.html",
+                       "attempts": 0, "body": {"host": "http://test/", "username": f"<user{i}>", "token": "t"}})
+
+
+class Inbox:
+
+    def __init__(self, refuse=False):
+        self.messages = []
+        self.refuse = refuse
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.refuse:
+            return "451 Try again later"
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class TestMailDelivery(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.inbox = Inbox()
+        self.server = Controller(self.inbox, hostname="127.0.0.1", port=free_port())
+        self.server.start()
+        self.queue = MemoryMailQueue()
+        self.pool = SMTPPool(2, hostname="127.0.0.1", port=self.server.port, local_hostname="localhost",
+                             start_tls=False)
+        self.worker = MailWorker(self.queue, self.pool, render_message, batch_size=10, max_attempts=2,
+                                 retry_base=0.01)
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+        self.server.stop()
+
+    def test_render(self):
+        message = render_message(json.loads(job(1)))
+        self.assertEqual(message["Subject"], "Confirm your email")
+        self.assertIn("&lt;user1&gt;", message.get_content())
+        self.assertIn("http://test/api/auth/confirmed_email/t", message.get_content())
+
+    async def test_batches_reuse_connections(self):
+        for i in range(25):
+            await self.queue.push(job(i))
+        while await self.queue.size():
+            await self.worker.run_once(timeout=0)
+        self.assertEqual(len(self.inbox.messages), 25)
+        self.assertEqual(self.worker.stats(), {"sent": 25, "retried": 0, "failed": 0, "connects": 2})
+
+    async def test_retry_then_dead_letter(self):
+        self.inbox.refuse = True
+        await self.queue.push(job(1))
+        await self.worker.run_once(timeout=0)
+        self.assertEqual(self.worker.retried, 1)
+        self.assertEqual(await self.worker.run_once(timeout=1), 1)
+        self.assertEqual(self.worker.failed, 1)
+        self.assertEqual(json.loads(self.queue.dead[0])["attempts"], 2)
+        self.assertEqual(self.inbox.messages, [])
+
+    async def test_server_dropped_connection(self):
+        await self.queue.push(job(1))
+        await self.worker.run_once(timeout=0)
+        for smtp in self.pool._clients:
+            smtp.close()
+        await self.queue.push(job(2))
+        await self.worker.run_once(timeout=0)
+        self.assertEqual(len(self.inbox.messages), 2)
+
+
+class TestRedisMailQueue(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.queue = RedisMailQueue()
+        self.queue.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def test_pop_ack_recover(self):
+        for i in range(3):
+            await self.queue.push(job(i))
+        jobs = await self.queue.pop(2, timeout=0.1)
+        self.assertEqual([json.loads(j)["id"] for j in jobs], ["0", "1"])
+        await self.queue.ack(jobs[:1])
+        self.assertEqual(await self.queue.recover(), 1)
+        self.assertEqual(len(await self.queue.pop(10, timeout=0.1)), 2)
+
+    async def test_delayed(self):
+        await self.queue.push(job(1), delay=0.05)
+        self.assertEqual(await self.queue.pop(10, timeout=0.01), [])
+        await asyncio.sleep(0.06)
+        self.assertEqual(len(await self.queue.pop(10, timeout=0.01)), 1)
+
+    async def test_send_email_only_queues(self):
+        from hw11.services import email
+        queue, email.mail_queue = email.mail_queue, self.queue
+        try:
+            await send_email("deadpool@example.com", "deadpool", "http://test/")
+        finally:
+            email.mail_queue = queue
+        self.assertEqual(await self.queue.size(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import io
+import json
+import unittest
+
+from hw11.services.exporter import export_contacts
+from hw11.services.importer import import_contacts
+from tests.test_repository_contacts_sqlite import SQLiteTestCase
+from tests.test_service_importer import CSV
+
+
+class TestExport(SQLiteTestCase):
+
+    async def export(self, fmt, batch_size=1):
+        chunks = [chunk async for chunk in export_contacts(fmt, self.user, self.engine, batch_size)]
+        return b"".join(chunks).decode()
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await import_contacts(io.StringIO(CSV), "csv", self.user, self.session)
+        await import_contacts(io.StringIO(CSV), "csv", self.other, self.session)
+
+    async def test_ndjson(self):
+        lines = (await self.export("ndjson")).splitlines()
+        self.assertEqual([json.loads(line)["last_name"] for line in lines], ["Smith", "Doe"])
+        self.assertEqual(json.loads(lines[0])["birthday"], "1990-11-21")
+
+    async def test_csv_roundtrip(self):
+        exported = await self.export("csv", batch_size=100)
+        self.assertTrue(exported.startswith("id,first_name,last_name,email,phone,birthday\n"))
+        report = await import_contacts(io.StringIO(exported), "csv", self.other, self.session)
+        self.assertEqual((report.imported, report.rejected), (2, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
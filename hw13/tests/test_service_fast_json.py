@@ -0,0 +1,87 @@
+import unittest
+from datetime import date, datetime, timezone
+from typing import List
+
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from hw11.database.models import Contact, User
+from hw11.schemas import BatchItemResult, ContactResponse, UserDb
+from hw11.services.fast_json import FastJSONRoute, build_encoder
+
+
+def contact(contact_id: int) -> Contact:
+    return Contact(id=contact_id, first_name="Wade", last_name="Wilson", email=f"wade{contact_id}@example.com",
+                   phone="+380501234567", birthday=date(1990, 2, 28), version=1)
+
+
+class TestBuildEncoder(unittest.TestCase):
+
+    def test_plain_models_match_pydantic(self):
+        rows = [contact(i) for i in range(3)]
+        self.assertEqual(build_encoder(List[ContactResponse])(rows),
+                         b"[" + b",".join(ContactResponse.model_validate(r, from_attributes=True)
+                                          .model_dump_json().encode() for r in rows) + b"]")
+        self.assertEqual(build_encoder(ContactResponse)(rows[0]),
+                         ContactResponse.model_validate(rows[0], from_attributes=True).model_dump_json().encode())
+
+    def test_aware_datetimes_match_pydantic(self):
+        user = User(id=1, username="deadpool", email="deadpool@example.com", avatar="a.webp",
+                    created_at=datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+        self.assertEqual(build_encoder(UserDb)(user),
+                         UserDb.model_validate(user, from_attributes=True).model_dump_json().encode())
+
+    def test_validated_models(self):
+        user = User(id=1, username="deadpool", email="deadpool@example.com", avatar=None,
+                    created_at=datetime(2024, 1, 2))
+        self.assertIn(b"gravatar", build_encoder(UserDb)(user))
+        result = build_encoder(List[BatchItemResult])([{"index": 0, "status": "created", "contact": contact(1)}])
+        self.assertIn(b'"first_name":"Wade"', result)
+
+
+class TestFastJSONRoute(unittest.TestCase):
+
+    def setUp(self):
+        router = APIRouter(route_class=FastJSONRoute)
+
+        @router.get("/contacts", response_model=List[ContactResponse], status_code=203)
+        async def contacts(response: Response):
+            response.headers["X-Next-Cursor"] = "abc"
+            response.set_cookie("a", "1")
+            response.set_cookie("b", "2")
+            return [contact(1), contact(2)]
+
+        @router.get("/contact", response_model=ContactResponse)
+        async def one():
+            return contact(1)
+
+        @router.get("/text", response_model=ContactResponse)
+        async def text():
+            return PlainTextResponse("hello")
+
+        app = FastAPI()
+        app.include_router(router, prefix="/api")
+        self.client = TestClient(app)
+
+    def test_headers_and_status(self):
+        response = self.client.get("/api/contacts")
+        self.assertEqual(response.status_code, 203)
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertEqual(response.headers["x-next-cursor"], "abc")
+        self.assertEqual(len(response.headers.get_list("set-cookie")), 2)
+        self.assertEqual([c["id"] for c in response.json()], [1, 2])
+
+    def test_without_response_parameter(self):
+        response = self.client.get("/api/contact")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["birthday"], "1990-02-28")
+
+    def test_response_passthrough(self):
+        self.assertEqual(self.client.get("/api/text").text, "hello")
+
+    def test_openapi_unchanged(self):
+        operation = self.client.get("/openapi.json").json()["paths"]["/api/contact"]["get"]
+        self.assertEqual(operation["responses"]["200"]["content"]["application/json"]["schema"],
+                         {"$ref": "#/components/schemas/ContactResponse"})
+        self.assertNotIn("parameters", operation)
@@ -0,0 +1,79 @@
+import io
+import unittest
+
+from hw11.repository.contacts import get_contacts
+from hw11.services.importer import iter_csv, iter_vcard, import_contacts, detect_format
+from tests.test_repository_contacts_sqlite import SQLiteTestCase
+
+CSV = """first_name,last_name,email,phone,birthday
+John,Smith,john@example.com,0501234567,1990-11-21
+"Multi
+line",Doe,jane@example.com,0507654321,1985-02-28
+Bad,Date,bad@example.com,0500000000,not-a-date
+"""
+
+VCARD = """BEGIN:VCARD
+VERSION:3.0
+N:Smith;John;;;
+FN:John Smith
+EMAIL;TYPE=INTERNET:john@example.com
+EMAIL:second@example.com
+TEL;TYPE=CELL:0501234567
+BDAY:19901121
+END:VCARD
+BEGIN:VCARD
+VERSION:4.0
+FN:Jane
+  Doe
+item1.EMAIL:jane@exam
+ ple.com
+TEL:0507654321
+BDAY:1985-02-28
+END:VCARD
+"""
+
+
+class TestParsers(unittest.TestCase):
+
+    def test_csv(self):
+        rows = list(iter_csv(io.StringIO(CSV)))
+        self.assertEqual([line for line, _ in rows], [2, 3, 5])
+        self.assertEqual(rows[0][1]["email"], "john@example.com")
+        self.assertEqual(rows[1][1]["first_name"], "Multi\nline")
+
+    def test_vcard(self):
+        rows = list(iter_vcard(io.StringIO(VCARD)))
+        self.assertEqual([line for line, _ in rows], [1, 10])
+        self.assertEqual(rows[0][1], {"first_name": "John", "last_name": "Smith", "email": "john@example.com",
+                                      "phone": "0501234567", "birthday": "1990-11-21"})
+        self.assertEqual(rows[1][1]["first_name"], "Jane")
+        self.assertEqual(rows[1][1]["last_name"], "Doe")
+        self.assertEqual(rows[1][1]["email"], "jane@example.com")
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format("book.VCF"), "vcard")
+        self.assertEqual(detect_format("upload", "text/vcard"), "vcard")
+        self.assertEqual(detect_format("book.csv", "text/csv"), "csv")
+
+
+class TestImport(SQLiteTestCase):
+
+    async def test_import_csv(self):
+        rejected, progress = [], []
+        report = await import_contacts(io.StringIO(CSV), "csv", self.user, self.session, chunk_size=2,
+                                       on_progress=progress.append, on_reject=lambda *args: rejected.append(args))
+        self.assertEqual((report.total, report.imported, report.rejected), (3, 2, 1))
+        self.assertEqual(report.rejects[0].line, 5)
+        self.assertIn("birthday", report.rejects[0].error)
+        self.assertEqual(rejected[0][2]["last_name"], "Date")
+        self.assertEqual(len(progress), 2)
+        contacts = await get_contacts(0, 10, self.user, self.session)
+        self.assertEqual(sorted(c.birthday_md for c in contacts), [228, 1121])
+
+    async def test_import_vcard(self):
+        report = await import_contacts(io.StringIO(VCARD), "vcard", self.user, self.session)
+        self.assertEqual((report.total, report.imported, report.rejected), (2, 2, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from hw11.services import metrics
+from hw11.services.metrics import Counter, Histogram, MetricsMiddleware, Registry, instrument_engine
+
+
+def test_render():
+    registry = Registry()
+    counter = Counter("jobs_total", "Jobs.", ("queue",), registry=registry)
+    histogram = Histogram("job_seconds", "Job time.", buckets=(0.1, 1), registry=registry)
+    counter.inc('a "b"')
+    counter.inc('a "b"', amount=2)
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    assert registry.render().splitlines() == [
+        "# HELP jobs_total Jobs.",
+        "# TYPE jobs_total counter",
+        'jobs_total{queue="a \\"b\\""} 3',
+        "# HELP job_seconds Job time.",
+        "# TYPE job_seconds histogram",
+        'job_seconds_bucket{le="0.1"} 2',
+        'job_seconds_bucket{le="1"} 3',
+        'job_seconds_bucket{le="+Inf"} 4',
+        "job_seconds_sum 3.65",
+        "job_seconds_count 4",
+    ]
+
+
+def test_middleware_charges_queries_to_the_route():
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        instrument_engine(engine)
+
+        async def app(scope, receive, send):
+            scope["route"] = SimpleNamespace(path="/things/{id}")
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                await conn.execute(text("SELECT 2"))
+            await send({"type": "http.response.start", "status": 204, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def send(message):
+            pass
+
+        await MetricsMiddleware(app)({"type": "http", "method": "GET", "path": "/things/1"}, None, send)
+        await engine.dispose()
+
+    queries_before = metrics.db_query_seconds.values.get((), [0])[:-1]
+    asyncio.run(run())
+    assert sum(metrics.db_query_seconds.values[()][:-1]) - sum(queries_before) == 2
+    assert sum(metrics.http_request_seconds.values[("GET", "/things/{id}", 204)][:-1]) == 1
+    per_request = metrics.http_request_queries.values[("/things/{id}",)]
+    assert per_request[metrics.http_request_queries.buckets.index(2)] == 1
+
+
+def test_metrics_endpoint(client):
+    client.get("/api/contacts/0", headers={"Authorization": "Bearer not-a-token"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == metrics.CONTENT_TYPE
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/contacts/{contact_id}",status="401"}' \
+        in response.text
+    assert 'auth_failures_total{reason="invalid_token"}' in response.text
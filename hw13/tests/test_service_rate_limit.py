@@ -0,0 +1,139 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+import fakeredis
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+
+from hw11.services import rate_limit
+from hw11.services.auth import auth_service
+from hw11.services.rate_limit import LocalBackend, RedisBackend, RateLimit, user_identifier
+
+
+def make_request(headers=None, path="/api/contacts/{contact_id}"):
+    raw = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/api/contacts/1", "headers": raw,
+                    "client": ("10.0.0.1", 1234), "route": SimpleNamespace(path=path)})
+
+
+def broken_redis():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    return fakeredis.FakeAsyncRedis(server=server)
+
+
+class TestLocalBackend(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.backend = LocalBackend(sync_interval=1, clock=lambda: self.now)
+
+    async def test_burst_then_refill(self):
+        for _ in range(5):
+            self.assertEqual(await self.backend.acquire("k", 5, 60), 0)
+        self.assertAlmostEqual(await self.backend.acquire("k", 5, 60), 12)
+        self.now += 12
+        self.assertEqual(await self.backend.acquire("k", 5, 60), 0)
+        self.assertGreater(await self.backend.acquire("k", 5, 60), 0)
+
+    async def test_cost(self):
+        self.assertEqual(await self.backend.acquire("k", 1000, 60, cost=600), 0)
+        self.assertGreater(await self.backend.acquire("k", 1000, 60, cost=500), 0)
+        self.assertEqual(await self.backend.acquire("k", 1000, 60, cost=400), 0)
+
+    async def test_idle_buckets_are_pruned_without_redis(self):
+        for i in range(100):
+            await self.backend.acquire(f"client{i}", 5, 60)
+        self.now += 61
+        await self.backend.acquire("k", 5, 60)
+        self.assertEqual(list(self.backend._tat), ["k"])
+        self.assertEqual(self.backend._pending, {})
+
+    async def test_workers_reconcile_through_redis(self):
+        redis = fakeredis.FakeAsyncRedis()
+        other = LocalBackend(sync_interval=1, clock=lambda: self.now)
+        self.backend.redis = other.redis = redis
+        for _ in range(4):
+            await other.acquire("k", 5, 60)
+        await other.sync()
+        await self.backend.acquire("k", 5, 60)
+        await self.backend.sync()
+        self.assertEqual(self.backend.syncs, 1)
+        # four requests admitted by the other worker are charged here as well
+        self.assertGreater(await self.backend.acquire("k", 5, 60), 0)
+
+    async def test_sync_runs_in_background(self):
+        self.backend.redis = fakeredis.FakeAsyncRedis()
+        await self.backend.acquire("k", 5, 60)
+        self.now += 2
+        await self.backend.acquire("k", 5, 60)
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.backend.syncs, 1)
+        self.assertEqual(int(await self.backend.redis.get(f"rate-limit:k:{int(self.now // 60)}")), 2)
+
+    async def test_fail_open_and_closed(self):
+        self.backend.redis = broken_redis()
+        await self.backend.acquire("k", 5, 60)
+        await self.backend.sync()
+        self.assertFalse(self.backend.redis_ok)
+        self.assertEqual(await self.backend.acquire("k", 5, 60), 0)
+        self.backend.fail_open = False
+        with self.assertRaises(HTTPException) as e:
+            await self.backend.acquire("k", 5, 60)
+        self.assertEqual(e.exception.status_code, 503)
+        # unreported units are kept for the next sync
+        self.assertEqual(self.backend._pending["k"][0], 2)
+        self.backend.redis = fakeredis.FakeAsyncRedis()
+        await self.backend.sync()
+        self.assertEqual(await self.backend.acquire("k", 5, 60), 0)
+
+
+class TestRedisBackend(unittest.IsolatedAsyncioTestCase):
+
+    async def test_window(self):
+        backend = RedisBackend()
+        backend.redis = fakeredis.FakeAsyncRedis()
+        self.assertEqual(await backend.acquire("k", 2, 60), 0)
+        self.assertEqual(await backend.acquire("k", 2, 60), 0)
+        self.assertGreater(await backend.acquire("k", 2, 60), 59)
+
+    async def test_redis_down(self):
+        backend = RedisBackend()
+        backend.redis = broken_redis()
+        self.assertEqual(await backend.acquire("k", 2, 60), 0)
+        backend.fail_open = False
+        with self.assertRaises(HTTPException):
+            await backend.acquire("k", 2, 60)
+        self.assertEqual(backend.failures, 2)
+
+
+class TestRateLimit(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.backend = rate_limit.backend
+        rate_limit.backend = LocalBackend()
+
+    def tearDown(self):
+        rate_limit.backend = self.backend
+
+    async def test_identifier(self):
+        token = await auth_service.create_access_token(data={"sub": "deadpool@example.com"})
+        self.assertEqual(await user_identifier(make_request({"Authorization": f"Bearer {token}"})),
+                         "user:deadpool@example.com")
+        self.assertEqual(await user_identifier(make_request({"Authorization": "Bearer junk"})), "ip:10.0.0.1")
+        self.assertEqual(await user_identifier(make_request({"X-Forwarded-For": "1.2.3.4, 10.0.0.1"})), "ip:1.2.3.4")
+
+    async def test_limit_per_route_template(self):
+        limiter = RateLimit(times=1, seconds=60)
+        await limiter(make_request(), Response())
+        await limiter(make_request(path="/api/contacts/"), Response())
+        with self.assertRaises(HTTPException) as e:
+            await limiter(make_request(), Response())
+        self.assertEqual(e.exception.status_code, 429)
+        self.assertEqual(e.exception.headers["Retry-After"], "60")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+
+import fakeredis
+from redis.exceptions import ConnectionError
+from starlette.requests import Request
+from starlette.responses import Response
+
+from hw11.database.models import User
+from hw11.services.response_cache import ResponseCache, etag_matches
+
+
+def make_request(if_none_match: str = None, query: str = "") -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/api/contacts/", "query_string": query.encode(),
+                    "headers": headers})
+
+
+class BrokenRedis:
+
+    def __getattr__(self, name):
+        raise ConnectionError("down")
+
+
+class TestResponseCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache("contacts", enabled=True, ttl=60)
+        self.cache.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        self.user = User(id=1)
+        self.loads = 0
+
+    async def load(self):
+        self.loads += 1
+        return [{"id": 1}]
+
+    async def respond(self, request: Request, response: Response = None) -> Response:
+        return await self.cache.respond(request, response or Response(), self.user, self.load,
+                                        lambda value: str(value).encode(), headers=("X-Next-Cursor",))
+
+    async def test_not_modified(self):
+        first = await self.respond(make_request())
+        etag = first.headers["etag"]
+        second = await self.respond(make_request(f'W/"other", {etag}'))
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.body, b"")
+        self.assertEqual(second.headers["etag"], etag)
+        self.assertEqual(self.loads, 1)
+
+    async def test_bump_changes_etag(self):
+        etag = (await self.respond(make_request())).headers["etag"]
+        await self.cache.bump(self.user.id)
+        response = await self.respond(make_request(etag))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["etag"], etag)
+        self.assertEqual(self.loads, 2)
+
+    async def test_cached_body_and_headers(self):
+        sub_response = Response()
+        sub_response.headers["X-Next-Cursor"] = "abc"
+        first = await self.respond(make_request(), sub_response)
+        second = await self.respond(make_request())
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(second.body, first.body)
+        self.assertEqual(second.headers["x-next-cursor"], "abc")
+        await self.respond(make_request(query="skip=10"))
+        self.assertEqual(self.loads, 2)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 2, "not_modified": 0})
+
+    async def test_entity_tag(self):
+        async def respond(if_none_match=None):
+            return await self.cache.respond(make_request(if_none_match), Response(), self.user, self.load,
+                                            lambda value: str(value).encode(), entity_tag=lambda value: '"7"')
+        first = await respond()
+        self.assertEqual(first.headers["etag"], '"7"')
+        cached = await respond('"7"')
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.headers["etag"], '"7"')
+        self.assertEqual(self.loads, 1)
+        self.cache.redis = None
+        self.assertEqual((await respond('"7"')).status_code, 304)
+        self.assertEqual(self.loads, 2)
+
+    async def test_version_survives_flush(self):
+        etag = (await self.respond(make_request())).headers["etag"]
+        await self.cache.redis.flushall()
+        self.assertNotEqual((await self.respond(make_request())).headers["etag"], etag)
+
+    async def test_redis_down(self):
+        self.cache.redis = BrokenRedis()
+        response = await self.respond(make_request('"anything"'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("etag", response.headers)
+        await self.cache.bump(self.user.id)
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches("*", '"a"'))
+        self.assertTrue(etag_matches('"b", W/"a"', '"a"'))
+        self.assertFalse(etag_matches('"b"', '"a"'))
+        self.assertFalse(etag_matches("", '"a"'))
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from hw11.services.sql_profiler import ProfilerMiddleware, RequestProfile, SQLProfiler, statement_shape
+from tests.query_budget import BUDGETS, over_budget
+
+
+def test_statement_shape():
+    assert statement_shape("SELECT * FROM contacts WHERE id = 7 AND name = 'O''Hara'") == \
+        "SELECT * FROM contacts WHERE id = ? AND name = ?"
+    assert statement_shape("SELECT id FROM contacts\n  WHERE id IN (?, ?, ?)") == \
+        statement_shape("SELECT id FROM contacts WHERE id IN ($1, $2)")
+
+
+def test_profiler_reports_n_plus_one_and_slow_queries(caplog):
+    profiler = SQLProfiler(enabled=True, slow_seconds=0, n_plus_one=3)
+    profiles = []
+    profiler.listeners.append(profiles.append)
+
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        profiler.attach(engine)
+
+        async def app(scope, receive, send):
+            async with engine.connect() as conn:
+                for contact_id in range(3):
+                    await conn.execute(text("SELECT :id AS id"), {"id": contact_id})
+
+        await ProfilerMiddleware(app, profiler)({"type": "http", "method": "GET", "path": "/things"}, None, None)
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        await engine.dispose()
+
+    with caplog.at_level(logging.WARNING, "hw11.services.sql_profiler"):
+        asyncio.run(run())
+    assert [len(profile.statements) for profile in profiles] == [3], "statements outside requests are not recorded"
+    assert profiles[0].repeated(3) == [("SELECT ? AS id", 3)]
+    assert "GET /things sent 3 times (N+1?): SELECT ? AS id" in caplog.text
+    assert caplog.text.count("slow query") == 3
+    assert "SCAN CONSTANT ROW" in caplog.text
+
+
+def test_over_budget():
+    profile = RequestProfile("GET", "/api/contacts/1")
+    profile.route = "/api/contacts/{contact_id}"
+    profile.statements = [("SELECT 1", (), 0.0, None)] * BUDGETS[profile.endpoint]
+    assert over_budget([profile]) == []
+    profile.statements.append(("SELECT 1", (), 0.0, None))
+    assert over_budget([profile]) == [(profile, BUDGETS[profile.endpoint])]
+
@@ -0,0 +1,69 @@
+import unittest
+
+import fakeredis
+from fastapi import HTTPException
+from redis.crc import key_slot
+
+from hw11.services.tokens import RefreshTokenStore, Rotation
+
+
+class TestRefreshTokenStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        self.store = RefreshTokenStore(ttl=3600)
+        self.store.redis = self.redis
+        self.email = "deadpool@example.com"
+
+    async def test_rotation(self):
+        family, jti = await self.store.create_family(self.email)
+        self.assertEqual(await self.store.rotate(self.email, family, jti, "second"), Rotation.ROTATED)
+        self.assertEqual(await self.store.rotate(self.email, family, "second", "third"), Rotation.ROTATED)
+        for key in self.store._keys(self.email):
+            self.assertLessEqual(await self.redis.ttl(key), 3600)
+
+    async def test_reuse_revokes_family(self):
+        family, jti = await self.store.create_family(self.email)
+        other, _ = await self.store.create_family(self.email)
+        await self.store.rotate(self.email, family, jti, "second")
+        self.assertEqual(await self.store.rotate(self.email, family, jti, "third"), Rotation.REUSED)
+        self.assertEqual(await self.store.rotate(self.email, family, "second", "third"), Rotation.UNKNOWN)
+        self.assertEqual(await self.store.families(self.email), {other})
+
+    async def test_revoke_all(self):
+        families = {(await self.store.create_family(self.email))[0] for _ in range(3)}
+        self.assertEqual(await self.store.families(self.email), families)
+        await self.store.revoke(self.email, families.pop())
+        self.assertEqual(await self.store.revoke_all(self.email), 2)
+        self.assertEqual(await self.store.families(self.email), set())
+        self.assertEqual(await self.redis.keys("*"), [])
+
+    async def test_expired_families_are_pruned(self):
+        family, _ = await self.store.create_family(self.email)
+        jtis, expiry = self.store._keys(self.email)
+        await self.redis.zadd(expiry, {family: 0})
+        self.assertEqual(await self.store.families(self.email), set())
+        fresh, _ = await self.store.create_family(self.email)
+        self.assertEqual(await self.redis.hkeys(jtis), [fresh])
+        self.assertEqual(await self.redis.zrange(expiry, 0, -1), [fresh])
+
+    async def test_expired_family_is_unknown(self):
+        family, jti = await self.store.create_family(self.email)
+        await self.redis.zadd(self.store._keys(self.email)[1], {family: 0})
+        self.assertEqual(await self.store.rotate(self.email, family, jti, "second"), Rotation.UNKNOWN)
+
+    async def test_keys_share_a_slot(self):
+        slots = {key_slot(key.encode()) for key in self.store._keys(self.email)}
+        self.assertEqual(len(slots), 1)
+
+    async def test_redis_down(self):
+        server = fakeredis.FakeServer()
+        server.connected = False
+        self.store.redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        with self.assertRaises(HTTPException) as e:
+            await self.store.create_family(self.email)
+        self.assertEqual(e.exception.status_code, 503)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,48 +1,86 @@
+import base64
+import json
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock
 
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date, timedelta, datetime
 
 from hw11.database.models import Contact, User
 from hw11.schemas import ContactModel
 from hw11.repository.contacts import (
     get_contacts,
+    get_contacts_page,
+    decode_cursor,
     get_contact,
     create_contact,
     update_contact,
     remove_contact,
     upcoming_birthdays,
+    _change_seq_value,
 )
 
 
 class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = AsyncMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
         self.user = User(id=1)
         self.birthday = datetime.strptime("21.11.1999", "%d.%m.%Y")
 
     async def test_get_contacts(self):
         contacts = [Contact(), Contact(), Contact()]
-        self.session.query().filter().offset().limit().all.return_value = contacts
+        self.result.scalars().all.return_value = contacts
         result = await get_contacts(skip=0, limit=10, user=self.user, db=self.session)
         self.assertEqual(result, contacts)
 
+    async def test_get_contacts_page_has_next(self):
+        contacts = [Contact(id=1, last_name="a"), Contact(id=2, last_name="b"), Contact(id=3, last_name="c")]
+        self.result.scalars().all.return_value = contacts
+        result, next_cursor = await get_contacts_page(limit=2, user=self.user, db=self.session, order_by="last_name")
+        self.assertEqual(result, contacts[:2])
+        self.assertEqual(decode_cursor(next_cursor, "last_name"), ["b", 2])
+
+    async def test_get_contacts_page_last(self):
+        contacts = [Contact(id=1), Contact(id=2)]
+        self.result.scalars().all.return_value = contacts
+        result, next_cursor = await get_contacts_page(limit=2, user=self.user, db=self.session, cursor="")
+        self.assertEqual(result, contacts)
+        self.assertIsNone(next_cursor)
+
+    async def test_get_contacts_page_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            await get_contacts_page(limit=2, user=self.user, db=self.session, cursor="not-a-cursor")
+        self.session.execute.assert_not_called()
+
+    def test_decode_cursor_rejects_key_values_of_the_wrong_type(self):
+        for key in ([{"a": 1}], ["1"], [True], [1.5]):
+            cursor = base64.urlsafe_b64encode(json.dumps({"o": "id", "k": key}).encode()).decode()
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor, "id")
+        cursor = base64.urlsafe_b64encode(json.dumps({"o": "last_name", "k": [["b"], 2]}).encode()).decode()
+        with self.assertRaises(ValueError):
+            decode_cursor(cursor, "last_name")
+
     async def test_get_contact_firstname_found(self):
         contact = Contact(first_name="test", last_name="test", email="test@email.com", phone="0000000000", birthday=self.birthday, user=self.user)
-        self.session.query().filter().first.return_value = contact
+        self.result.scalars().first.return_value = contact
         result = await get_contact(user=self.user, db=self.session, first_name=contact.first_name)
         self.assertEqual(result, contact)
 
     async def test_get_contact_not_found(self):
         contact = Contact(first_name="test", last_name="test", email="test@email.com", phone="0000000000", birthday=self.birthday, user=self.user)
-        self.session.query().filter().first.return_value = None
+        self.result.scalars().first.return_value = None
         result = await get_contact(user=self.user, db=self.session, first_name=contact.first_name)
         self.assertIsNone(result)
 
     async def test_create_contact(self):
         body = ContactModel(first_name="test", last_name="test", email="test@email.com", phone="0000000000", birthday=self.birthday)
+        self.result.scalar_one.return_value = Contact(id=1, **body.model_dump())
         result = await create_contact(body=body, user=self.user, db=self.session)
         self.assertEqual(result.first_name, body.first_name)
         self.assertEqual(result.last_name, body.last_name)
@@ -53,25 +91,25 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     async def test_remove_contact_found(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.scalar_one_or_none.return_value = contact
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_remove_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.result.scalar_one_or_none.return_value = None
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertIsNone(result)
 
     async def test_update_contact_found(self):
         body = ContactModel(first_name="test", last_name="test", email="test@email.com", phone="0000000000", birthday=self.birthday)
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.scalar_one_or_none.return_value = contact
         result = await update_contact(contact_id=1, body=body, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_update_contact_not_found(self):
         body = ContactModel(first_name="test", last_name="test", email="test@email.com", phone="0000000000", birthday=self.birthday)
-        self.session.query().filter().first.return_value = None
+        self.result.scalar_one_or_none.return_value = None
         self.session.commit.return_value = None
         result = await update_contact(contact_id=1, body=body, user=self.user, db=self.session)
         self.assertIsNone(result)
@@ -81,12 +119,20 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         upcoming_birthday_contacts = [
             Contact(birthday=today + timedelta(days=i)) for i in range(5)
         ]
-        self.session.query().filter().all.return_value = upcoming_birthday_contacts
+        self.result.scalars().all.return_value = upcoming_birthday_contacts
         result = await upcoming_birthdays(user=self.user, db=self.session)
         self.assertEqual(len(result), 5)
         for contact in result:
             self.assertTrue(contact.birthday >= today)
             self.assertTrue(contact.birthday <= today + timedelta(days=7))
 
+    async def test_change_seq_in_same_statement_on_postgres(self):
+        self.session.get_bind.return_value.dialect.name = "postgresql"
+        stmt = update(Contact).values(change_seq=await _change_seq_value(self.user, self.session))
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        self.assertTrue(sql.startswith("WITH next_seq AS"))
+        self.session.execute.assert_not_called()
+
+
 if __name__ == '__main__':
     unittest.main()